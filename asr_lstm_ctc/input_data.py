@@ -1,7 +1,7 @@
 
 import re
 import numpy as np
-from librosa.feature import mfcc
+from deep_speech2.data_utils.featurizer.mfcc import mfcc_librosa
 from scipy.io import wavfile
 from typing import List
 
@@ -21,7 +21,7 @@ def _get_audio_feature(audio_file: str) -> np.ndarray:
     :return: [n_mfcc, time]
     """
     sample_rate, audio = wavfile.read(audio_file)
-    feature = mfcc(y=audio.astype(np.float32), sr=sample_rate, n_mfcc=N_FEATURES)  # [n_mfcc, time]
+    feature = mfcc_librosa(audio.astype(np.float32), sample_rate, n_mfcc=N_FEATURES)  # [n_mfcc, time]
     feature = (feature - np.mean(feature)) / np.std(feature)  # normalize
     return feature
 
@@ -8,7 +8,7 @@ from random import Random
 from tensorflow.python.keras.utils import Sequence
 from .featurizer import AudioFeaturizer, TextFeaturizer
 from ..config import MODELKEYS
-from typing import List, Tuple, Dict, Union
+from typing import List, Tuple, Dict, Union, Optional
 
 
 class AudioConfig(object):
@@ -32,7 +32,8 @@ class AudioConfig(object):
 class DatasetConfig(object):
     """Config class for generating the DeepSpeechDataset."""
 
-    def __init__(self, audio_config: AudioConfig, data_path: str, vocab_file_path: str, sortagrad: bool, batch_size: int):
+    def __init__(self, audio_config: AudioConfig, data_path: str, vocab_file_path: str, sortagrad: bool, batch_size: int,
+                 feature_store_path: Optional[str] = None):
         """Initialize the configs for deep speech dataset.
 
         :param audio_config: AudioConfig object specifying the audio-related configs.
@@ -41,6 +42,7 @@ class DatasetConfig(object):
         :param sortagrad: a boolean, if set to true, audio sequences will be fed by increasing length
                           in the first training epoch, which will expedite network convergence.
         :param batch_size: The batch size.
+        :param feature_store_path: The directory of a `FeatureStore` keeping the features across epochs and runs.
 
         Raises:
           IOError: file path not exist.
@@ -55,6 +57,7 @@ class DatasetConfig(object):
         self.data_path = data_path
         self.sortagrad = sortagrad
         self.batch_size = batch_size
+        self.feature_store_path = feature_store_path
 
 
 class DataGenerator(Sequence):
@@ -66,6 +69,10 @@ class DataGenerator(Sequence):
             normalize=config.audio_config.normalize
         )
         self.text_featurizer = TextFeaturizer.from_file(config.vocab_file)
+        self.feature_store = None
+        if config.feature_store_path:
+            from utils.feature_store import FeatureStore
+            self.feature_store = FeatureStore(config.feature_store_path, self.audio_featurizer.config)
         self.n_features = self.audio_featurizer.n_features
         self.n_labels = self.text_featurizer.n_labels
         self.batch_size = config.batch_size
@@ -113,8 +120,8 @@ class DataGenerator(Sequence):
     def process_on_batch(self, batch_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         wav_data_list, label_data_list, input_length, label_length = [], [], [], []
         for src, transcript in batch_data:
-            fs, samples = read_audio(src)
-            feature = self.audio_featurizer.transform(samples)
+            feature = self.feature_store.get_or_compute(src, self._featurize_file) if self.feature_store\
+                else self._featurize_file(src)
             remain = len(feature) % 8
             pad_num = 8 - remain if remain > 0 else 0
             if pad_num:  # pad features with 8X -> fit model's requirement
@@ -135,6 +142,10 @@ class DataGenerator(Sequence):
             np.array(input_length).reshape(-1, 1), \
             np.array(label_length).reshape(-1, 1)
 
+    def _featurize_file(self, audio_file: str) -> np.ndarray:
+        fs, samples = read_audio(audio_file)
+        return self.audio_featurizer.transform(samples)
+
     @staticmethod
     def _ctc_len(label: List[int]) -> int:
         add_len = 0
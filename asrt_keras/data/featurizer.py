@@ -1,7 +1,8 @@
 """Featurize the audio and text"""
 
 import numpy as np
-from typing import Dict, List, Union
+from utils import stft
+from typing import Any, Dict, List, Union
 
 
 class AudioFeaturizer(object):
@@ -32,6 +33,12 @@ class AudioFeaturizer(object):
         feature = np.expand_dims(feature, axis=2)
         return feature
 
+    @property
+    def config(self) -> Dict[str, Any]:
+        """The params the features depend on, e.g. to key them in a `FeatureStore`."""
+        return {"featurizer": "%s.%s" % (type(self).__module__, type(self).__name__), "sample_rate": self.sample_rate,
+                "window_ms": self.window_ms, "stride_ms": self.stride_ms, "normalize": self.normalize}
+
     @staticmethod
     def compute_fbank(samples: np.ndarray, fs: int, time_window_ms: int = 25, time_stride_ms: int = 10):
         """Compute FBank feature of audio.
@@ -43,20 +50,9 @@ class AudioFeaturizer(object):
         """
         window_size = int(fs * time_window_ms / 1000)
         stride_size = int(fs * time_stride_ms / 1000)
-        w = np.hamming(window_size)
-
-        truncate_size = (len(samples) - window_size) % stride_size
-        samples = samples[: (len(samples) - truncate_size)]
-        n_windows = (len(samples) - window_size) // stride_size + 1
-        nbytes = samples.strides[0]
-
-        data = np.lib.stride_tricks.as_strided(samples,
-                                               shape=(n_windows, window_size),
-                                               strides=(stride_size * nbytes, nbytes))
-
-        data_input = np.abs(np.fft.fft(data * w, axis=1))
-        data_input = data_input[:, :window_size // 2]
-        return np.log(data_input + 1)
+        # the first half of the magnitude spectrum of the hamming windowed frames, by the real FFT
+        return stft.spectrogram(samples, window_size, stride_size, window_name="hamming", scaling="magnitude",
+                                n_bins=window_size // 2, log_offset=1.)
 
     @staticmethod
     def _normalize_audio_feature(audio_feature: np.ndarray):
@@ -19,6 +19,7 @@ if __name__ == '__main__':
     parser.add_argument("--window_ms", type=int, default=20, help="The frame length for spectrogram.")
     parser.add_argument("--stride_ms", type=int, default=10, help="The frame step for spectrogram.")
     parser.add_argument("--is_normalize", type=bool, default=True, help="whether normalize the audio feature.")
+    parser.add_argument("--feature_store_path", type=str, default=None, help="The directory of the feature store.")
     parser.add_argument("--seed", type=int, default=1, help="The random seed.")
     parser.add_argument("--batch_size", type=int, default=1, help="The data feed batch size.")
     parser.add_argument("--learning_rate", type=float, default=1e-4, help="The learning rate.")
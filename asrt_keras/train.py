@@ -18,7 +18,7 @@ def get_dataset_config(args: argparse.Namespace):
         sample_rate=args.sample_rate, window_ms=args.window_ms, stride_ms=args.stride_ms, normalize=args.is_normalize)
     return DatasetConfig(
         audio_config=audio_config, data_path=args.data_file, vocab_file_path=args.vocab_file,
-        sortagrad=args.sortagrad, batch_size=args.batch_size)
+        sortagrad=args.sortagrad, batch_size=args.batch_size, feature_store_path=args.feature_store_path)
 
 
 def get_callbacks(args: argparse.Namespace) -> List[tf.keras.callbacks.Callback]:
@@ -39,6 +39,7 @@ if __name__ == '__main__':
     parser.add_argument("--window_ms", type=int, default=20, help="The frame length for spectrogram.")
     parser.add_argument("--stride_ms", type=int, default=10, help="The frame step for spectrogram.")
     parser.add_argument("--is_normalize", type=bool, default=True, help="whether normalize the audio feature.")
+    parser.add_argument("--feature_store_path", type=str, default=None, help="The directory of the feature store.")
     parser.add_argument("--seed", type=int, default=1, help="The random seed.")
     parser.add_argument("--batch_size", type=int, default=4, help="The data feed batch size.")
     parser.add_argument("--learning_rate", type=float, default=1e-4, help="The learning rate.")
@@ -1,10 +1,15 @@
 
 import random
 import json
+import multiprocessing
+import numpy as np
+from scipy import fft
+from collections import OrderedDict
 from deep_speech2.data_utils.utility import read_data
-from deep_speech2.data_utils.segments import AudioSegment, SpeechSegment
+from deep_speech2.data_utils.segments import AudioSegment, SpeechSegment, AudioBatch
+from deep_speech2.data_utils.noise_bank import NoiseBank
 from abc import ABCMeta, abstractmethod
-from typing import Union, Dict, List, Type
+from typing import Union, Dict, List, Optional, Tuple, Type, Iterable, Iterator, Any
 
 
 class AugmentorBase(metaclass=ABCMeta):
@@ -25,6 +30,22 @@ class AugmentorBase(metaclass=ABCMeta):
         """
         pass
 
+    def transform_batch(self, batch: AudioBatch, rows: np.ndarray) -> None:
+        """
+        Adds the effects to the given rows of the audio batch.
+        By default each row is transformed alone by `transform_audio`, the augmentors having a vectorized equivalent
+        override it to transform the rows at once.
+
+        Note that this is an in-place transformation.
+
+        :param batch: Audio batch to add effects to.
+        :param rows: The indices of the rows to transform.
+        """
+        for i in rows:
+            segment = batch.get_segment(i)
+            self.transform_audio(segment)
+            batch.set_segment(i, segment)
+
 
 class VolumePerturbAugmentor(AugmentorBase):
     """
@@ -50,6 +71,12 @@ class VolumePerturbAugmentor(AugmentorBase):
         gain = self._rng.uniform(self._min_gain_dBFS, self._max_gain_dBFS)
         segment.gain_db(gain)
 
+    def transform_batch(self, batch: AudioBatch, rows: np.ndarray) -> None:
+        """Change loadness of the rows at once, each by its own gain."""
+        gains = np.zeros(len(batch))
+        gains[rows] = [self._rng.uniform(self._min_gain_dBFS, self._max_gain_dBFS) for _ in rows]
+        batch.gain_db(gains)
+
 
 class SpeedPertubAugmentor(AugmentorBase):
     """
@@ -60,8 +87,12 @@ class SpeedPertubAugmentor(AugmentorBase):
     :param rng: Random generator object.
     :param min_speed_rate: Lower bound of new speed rate to sample and should not be smaller than 0.9.
     :param max_speed_rate: Upper bound of new speed rate to sample and should not be larger than 1.1.
+    :param rate_step: The sampled speed rate is rounded to a multiple of it, so the resampling filter of each rate
+                      is designed once. If None, the exact rate is applied by linear interpolation.
+    :param quality: The resampling filter quality, one of {'best', 'fast'}.
     """
-    def __init__(self, rng: random.Random, min_speed_rate: float, max_speed_rate: float):
+    def __init__(self, rng: random.Random, min_speed_rate: float, max_speed_rate: float,
+                 rate_step: Optional[float]=0.01, quality: str="fast"):
         if min_speed_rate < 0.9:
             raise ValueError("Sampling speed below 0.9 can cause unnatural effects.")
         if max_speed_rate > 1.1:
@@ -72,6 +103,8 @@ class SpeedPertubAugmentor(AugmentorBase):
         self._rng = rng
         self._min_speed_rate = min_speed_rate
         self._max_speed_rate = max_speed_rate
+        self._rate_step = rate_step
+        self._quality = quality
 
     def transform_audio(self, segment: Union[AudioSegment, SpeechSegment]) -> None:
         """
@@ -79,7 +112,7 @@ class SpeedPertubAugmentor(AugmentorBase):
         Note that this is an in-place transformation.
         """
         sampled_speed = self._rng.uniform(self._min_speed_rate, self._max_speed_rate)
-        segment.change_speed(sampled_speed)
+        segment.change_speed(sampled_speed, rate_step=self._rate_step, quality=self._quality)
 
 
 class ShiftPertubAugmentor(AugmentorBase):
@@ -102,6 +135,12 @@ class ShiftPertubAugmentor(AugmentorBase):
         shift_ms = self._rng.uniform(self._min_shift_ms, self._max_shift_ms)
         segment.shift(shift_ms)
 
+    def transform_batch(self, batch: AudioBatch, rows: np.ndarray) -> None:
+        """Shift the rows at once, each by its own shift time."""
+        shifts_ms = np.zeros(len(batch))
+        shifts_ms[rows] = [self._rng.uniform(self._min_shift_ms, self._max_shift_ms) for _ in rows]
+        batch.shift(shifts_ms)
+
 
 class ResampleAugmentor(AugmentorBase):
     """
@@ -109,14 +148,16 @@ class ResampleAugmentor(AugmentorBase):
 
     :param rng: Random generator object.
     :param new_sample_rate: New sample rate in Hz.
+    :param quality: The resampling filter quality, one of {'best', 'fast'}.
     """
-    def __init__(self, rng: random.Random, new_sample_rate: int):
+    def __init__(self, rng: random.Random, new_sample_rate: int, quality: str="best"):
         self._rng = rng
         self._new_sample_rate = new_sample_rate
+        self._quality = quality
 
     def transform_audio(self, segment: Union[AudioSegment, SpeechSegment]) -> None:
         """Resamples the input audio to a target sample rate"""
-        segment.resample(self._new_sample_rate)
+        segment.resample(self._new_sample_rate, filter=self._quality)
 
 
 class OnlineBayesianNormalizationAugmentor(AugmentorBase):
@@ -146,56 +187,260 @@ class NoisePerturbAugmentor(AugmentorBase):
     """
     Augmentation model for adding background noise.
 
+    The noises are sliced from the noise audio files, or from a noise bank built by `build_noise_bank` if
+    `noise_bank_path` is given, which draws them from memory without file reading nor energy computing.
+
     :param rng: Random generator object.
     :param min_snr_dB: Minimal signal noise ratio, in decibels.
     :param max_snr_dB: Maximal signal noise ratio, in decibels.
     :param noise_file_path: file path for noise audio data.
+    :param noise_bank_path: The path prefix of a noise bank, used instead of `noise_file_path`.
+    :raises ValueError: If neither `noise_file_path` nor `noise_bank_path` is given.
     """
-    def __init__(self, rng: random.Random, min_snr_dB: float, max_snr_dB: float, noise_file_path: str):
+    def __init__(self, rng: random.Random, min_snr_dB: float, max_snr_dB: float,
+                 noise_file_path: Optional[str]=None, noise_bank_path: Optional[str]=None):
         self._min_snr_dB = min_snr_dB
         self._max_snr_dB = max_snr_dB
         self._rng = rng
-        self._noise_data = read_data(noise_file_path, data_tag="noise", to_dict=True)
+        if noise_bank_path:
+            self._noise_bank: Optional[NoiseBank] = NoiseBank(noise_bank_path)
+        elif noise_file_path:
+            self._noise_bank = None
+            self._noise_data = read_data(noise_file_path, data_tag="noise", to_dict=True)
+        else:
+            raise ValueError("Either noise_file_path or noise_bank_path should be given.")
+
+    def _sample_noise(self, duration: float, sample_rate: int) -> Tuple[AudioSegment, Optional[float]]:
+        """Draw a noise segment of the duration for audio of the sample rate, with its RMS energy in dB if known."""
+        if self._noise_bank is not None:
+            length = int(np.ceil(duration * self._noise_bank.sample_rate))
+            samples, rms_db = self._noise_bank.sample(length, self._rng)
+            return AudioSegment(samples, self._noise_bank.sample_rate), rms_db
+        noise_data = self._rng.sample(self._noise_data, 1)[0]
+        if noise_data["duration"] < duration:
+            raise RuntimeError("The duration of sampled noise audio is smaller than the audio segment.")
+        start = self._rng.uniform(0, noise_data["duration"] - duration)
+        # one more sample against rounding the slice bounds
+        end = min(start + duration + 1. / sample_rate, noise_data["duration"])
+        return AudioSegment.from_slice_file(noise_data["src"], start=start, end=end), None
 
     def transform_audio(self, segment: Union[AudioSegment, SpeechSegment]) -> None:
         """Add background noise audio."""
-        noise_data = self._rng.sample(self._noise_data, 1)[0]
-        if noise_data["duration"] < segment.duration:
-            raise RuntimeError("The duration of sampled noise audio is smaller than the audio segment.")
-        diff_duration = noise_data["duration"] - segment.duration
-        start = self._rng.uniform(0, diff_duration)
-        end = start + segment.duration
-        noise_seg = AudioSegment.from_slice_file(noise_data["src"], start=start, end=end)
+        noise_seg, noise_rms_db = self._sample_noise(segment.duration, segment.sample_rate)
         snr_dB = self._rng.uniform(self._min_snr_dB, self._max_snr_dB)
-        segment.add_noise(noise_seg, snr_dB=snr_dB, allow_downsampling=True, rng=self._rng)
+        segment.add_noise(noise_seg, snr_dB=snr_dB, allow_downsampling=True, rng=self._rng,
+                          noise_rms_db=noise_rms_db)
+
+    def transform_batch(self, batch: AudioBatch, rows: np.ndarray) -> None:
+        """Add background noise to the rows at once, each one with its own noise and signal noise ratio."""
+        noise_segs, noise_rms_dbs, snrs_dB = [], [], []
+        for i in rows:
+            noise_seg, noise_rms_db = self._sample_noise(batch.lengths[i] / batch.sample_rate, batch.sample_rate)
+            if noise_seg.sample_rate > batch.sample_rate:
+                noise_seg.resample(batch.sample_rate)
+            noise_segs.append(noise_seg)
+            noise_rms_dbs.append(noise_rms_db)
+            snrs_dB.append(self._rng.uniform(self._min_snr_dB, self._max_snr_dB))
+        noise_rms_db = np.array(noise_rms_dbs) if self._noise_bank is not None else None
+        batch.add_noise(AudioBatch.from_segments(noise_segs), np.array(snrs_dB), rows=rows, rng=self._rng,
+                        noise_rms_db=noise_rms_db)
+
+
+def _overlap_add(samples: np.ndarray, impulse_spectrum: np.ndarray, impulse_length: int, fft_size: int) -> np.ndarray:
+    """
+    Full convolution of the samples with an impulse, given its rfft of `fft_size`, by overlap-add.
+    The samples are cut into blocks of `fft_size - impulse_length + 1`, which are transformed by one batched rfft.
+    Several blocks need `fft_size` of at least twice the impulse length, so that a tail overlaps the next block only.
+    """
+    hop = fft_size - impulse_length + 1
+    n_blocks = -(-len(samples) // hop)
+    blocks = np.zeros((n_blocks, hop), dtype=np.float32)
+    blocks.ravel()[:len(samples)] = samples
+    outputs = fft.irfft(fft.rfft(blocks, n=fft_size, axis=1) * impulse_spectrum, n=fft_size, axis=1)
+    if n_blocks == 1:
+        return outputs[0, :len(samples) + impulse_length - 1].astype(np.float32)
+    # the tail of each block, no longer than a hop, overlaps the head of the next one
+    convolved = np.zeros((n_blocks + 1, hop), dtype=np.float32)
+    convolved[:-1] = outputs[:, :hop]
+    convolved[1:, :impulse_length - 1] += outputs[:, hop:]
+    return convolved.ravel()[:len(samples) + impulse_length - 1]
 
 
 class ImpulseResponseAugmentor(AugmentorBase):
     """
     Augmentation model for adding impulse response effect.
 
+    The impulses of the manifest are loaded once, resampled to `target_sample_rate`. The convolution is done by
+    overlap-add with blocks of a few impulse lengths, so the rfft of an impulse at each block size is reused across
+    the segments, in an LRU cache bounded by `max_cache_mb`.
+
     :param rng: Random generator object.
     :param impulse_file_path: file path for impulse audio data.
+    :param target_sample_rate: The sample rate of the segments to transform, the impulses are preloaded at it.
+    :param max_cache_mb: Memory budget in MB of the cached impulse spectra.
     """
-    def __init__(self, rng: random.Random, impulse_file_path: str):
+    def __init__(self, rng: random.Random, impulse_file_path: str, target_sample_rate: int=16000,
+                 max_cache_mb: float=64.):
         self._rng = rng
         self._impulse_data = read_data(impulse_file_path, data_tag="impulse", to_dict=True)
+        self._impulses: Dict[Tuple[int, int], np.ndarray] = {}
+        for index, impulse_data in enumerate(self._impulse_data):
+            self._load_impulse(index, impulse_data["src"], target_sample_rate)
+        self._spectra: "OrderedDict[Tuple[int, int, int], np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+        self._max_cache_bytes = int(max_cache_mb * (1 << 20))
+
+    def _load_impulse(self, index: int, src: str, sample_rate: int) -> np.ndarray:
+        impulse_segment = AudioSegment.from_file(src)
+        if impulse_segment.sample_rate != sample_rate:
+            impulse_segment.resample(sample_rate)
+        self._impulses[(index, sample_rate)] = impulse_segment.samples
+        return impulse_segment.samples
+
+    def _get_spectrum(self, index: int, sample_rate: int, fft_size: int) -> np.ndarray:
+        """Return the rfft of the impulse at the block size, cached with least recently used eviction."""
+        key = (index, sample_rate, fft_size)
+        spectrum = self._spectra.get(key)
+        if spectrum is not None:
+            self._spectra.move_to_end(key)
+            return spectrum
+        spectrum = fft.rfft(self._impulses[(index, sample_rate)], n=fft_size)
+        self._spectra[key] = spectrum
+        self._cache_bytes += spectrum.nbytes
+        while self._cache_bytes > self._max_cache_bytes and len(self._spectra) > 1:
+            self._cache_bytes -= self._spectra.popitem(last=False)[1].nbytes
+        return spectrum
 
     def transform_audio(self, segment: Union[AudioSegment, SpeechSegment]) -> None:
         """Add impulse response effect."""
-        impulse_data = self._rng.sample(self._impulse_data, 1)[0]
-        impulse_segment = AudioSegment.from_file(impulse_data["src"])
-        segment.convolve(impulse_segment=impulse_segment, allow_resample=True)
+        index = self._rng.randrange(len(self._impulse_data))
+        impulse = self._impulses.get((index, segment.sample_rate))
+        if impulse is None:
+            impulse = self._load_impulse(index, self._impulse_data[index]["src"], segment.sample_rate)
+        # a single block for short segments, else blocks of about 4 impulse lengths
+        fft_size = 1 << int(min(len(segment.samples) + len(impulse) - 1, 4 * len(impulse)) - 1).bit_length()
+        spectrum = self._get_spectrum(index, segment.sample_rate, fft_size)
+        segment.samples = _overlap_add(segment.samples, spectrum, len(impulse), fft_size)
+
 
+class FeatureAugmentorBase(metaclass=ABCMeta):
+    """
+    Abstract base class for augmentation model of features, the spectrogram returned by `AudioFeaturizer.featurize`.
+    Such augmentors are far cheaper than the audio ones, no resampling, convolution nor mixing is involved.
+    All feature augmentor classes should inherit from this class, and implement the following abstract methods.
+    """
+    @abstractmethod
+    def transform_feature(self, features: np.ndarray) -> None:
+        """
+        Adds various effects to the features of an audio.
+
+        Note that this is an in-place transformation.
+
+        :param features: Features of shape [n_frames, n_features].
+        """
+        pass
+
+
+class FrequencyMaskAugmentor(FeatureAugmentorBase):
+    """
+    Augmentation model for masking bands of feature channels, the frequency masking of SpecAugment.
+    See reference paper here: https://arxiv.org/abs/1904.08779
+
+    :param rng: Random generator object.
+    :param max_width: Maximal number of consecutive channels of a mask.
+    :param num_masks: Number of masks.
+    :param mask_value: Value of the masked features, 0. is the mean of the normalized features.
+    """
+    def __init__(self, rng: random.Random, max_width: int, num_masks: int=1, mask_value: float=0.):
+        if max_width < 0:
+            raise ValueError("The max width must not be negative.")
+        self._rng = rng
+        self._max_width = max_width
+        self._num_masks = num_masks
+        self._mask_value = mask_value
+
+    def transform_feature(self, features: np.ndarray) -> None:
+        """Mask random bands of channels."""
+        n_features = features.shape[1]
+        for _ in range(self._num_masks):
+            width = self._rng.randint(0, min(self._max_width, n_features))
+            start = self._rng.randint(0, n_features - width)
+            features[:, start: start + width] = self._mask_value
+
+
+class TimeMaskAugmentor(FeatureAugmentorBase):
+    """
+    Augmentation model for masking spans of frames, the time masking of SpecAugment.
+    See reference paper here: https://arxiv.org/abs/1904.08779
+
+    :param rng: Random generator object.
+    :param max_width: Maximal number of consecutive frames of a mask.
+    :param num_masks: Number of masks.
+    :param max_ratio: Upper bound of the width of a mask as a ratio of the number of frames.
+    :param mask_value: Value of the masked features, 0. is the mean of the normalized features.
+    """
+    def __init__(self, rng: random.Random, max_width: int, num_masks: int=1, max_ratio: float=1.,
+                 mask_value: float=0.):
+        if max_width < 0:
+            raise ValueError("The max width must not be negative.")
+        self._rng = rng
+        self._max_width = max_width
+        self._num_masks = num_masks
+        self._max_ratio = max_ratio
+        self._mask_value = mask_value
+
+    def transform_feature(self, features: np.ndarray) -> None:
+        """Mask random spans of frames."""
+        n_frames = len(features)
+        max_width = min(self._max_width, int(self._max_ratio * n_frames))
+        for _ in range(self._num_masks):
+            width = self._rng.randint(0, max_width)
+            start = self._rng.randint(0, n_frames - width)
+            features[start: start + width] = self._mask_value
+
+
+class TimeWarpAugmentor(FeatureAugmentorBase):
+    """
+    Augmentation model for warping the features in time, the time warping of SpecAugment.
+    A random frame away from the bounds is moved by up to `max_warp` frames, the frames before and after it are
+    stretched or squeezed linearly to follow, the number of frames is unchanged.
+    See reference paper here: https://arxiv.org/abs/1904.08779
 
-_AUGMENT_TYPE_ALIAS: Dict[str, Type[AugmentorBase]] = {
+    :param rng: Random generator object.
+    :param max_warp: Maximal number of frames the warp center is moved by.
+    """
+    def __init__(self, rng: random.Random, max_warp: int):
+        if max_warp < 0:
+            raise ValueError("The max warp must not be negative.")
+        self._rng = rng
+        self._max_warp = max_warp
+
+    def transform_feature(self, features: np.ndarray) -> None:
+        """Warp the frames, by linear interpolation between the neighbour frames."""
+        n_frames = len(features)
+        if self._max_warp == 0 or n_frames <= 2 * self._max_warp + 2:
+            return
+        center = self._rng.randint(self._max_warp + 1, n_frames - self._max_warp - 2)
+        warped = center + self._rng.randint(-self._max_warp, self._max_warp)
+        # the source position of each frame, the warped frame takes the center one
+        source = np.interp(np.arange(n_frames), [0, warped, n_frames - 1], [0, center, n_frames - 1])
+        lower = source.astype(np.int64)
+        upper = np.minimum(lower + 1, n_frames - 1)
+        weight = (source - lower).astype(features.dtype)[:, None]
+        features[:] = features[lower] * (1 - weight) + features[upper] * weight
+
+
+_AUGMENT_TYPE_ALIAS: Dict[str, Type[Union[AugmentorBase, FeatureAugmentorBase]]] = {
     "volume": VolumePerturbAugmentor,
     "shift": ShiftPertubAugmentor,
     "speed": SpeedPertubAugmentor,
     "resample": ResampleAugmentor,
     "bayesian_normal": OnlineBayesianNormalizationAugmentor,
     "noise": NoisePerturbAugmentor,
-    "impulse": ImpulseResponseAugmentor
+    "impulse": ImpulseResponseAugmentor,
+    "time_mask": TimeMaskAugmentor,
+    "freq_mask": FrequencyMaskAugmentor,
+    "time_warp": TimeWarpAugmentor
 }
 
 
@@ -248,20 +493,65 @@ class AugmentationPipeline(object):
     `prob` indicates the probability of the current augmentor to take effect.
     If "prob" is zero, the augmentor does not take effect.
 
+    The feature augmentors, "time_mask", "freq_mask" and "time_warp", are configured alike,
+    e.g. `{"type": "time_mask", "params": {"max_width": 40, "num_masks": 2}, "prob": 1.0}`.
+    They are run by `transform_feature` on the features, and skipped by `transform_audio`.
+
     :param augmentation_config: Augmentation configuration in json string.
     :param random_seed: Random seed.
     :raises ValueError: If the augmentation json config is in incorrect format".
     """
     def __init__(self, augmentation_config: str, random_seed: int=0):
+        self._random_seed = random_seed
         self._rng = random.Random(random_seed)
         self._augmentors, self._rates = self._parse_pipeline_from(augmentation_config)
 
-    def transform_audio(self, segment: Union[AudioSegment, SpeechSegment]) -> None:
-        """Run the pre-processing pipeline for data augmentation."""
+    @property
+    def transforms_audio(self) -> bool:
+        """Whether the pipeline has audio augmentors, else the features of an utterance don't depend on the epoch."""
+        return any(isinstance(augmentor, AugmentorBase) for augmentor in self._augmentors)
+
+    def seed_utterance(self, epoch: int, index: int) -> None:
+        """
+        Reseed the random generator shared by the augmentors from (random seed, epoch, utterance index),
+        so the augmentation of an utterance doesn't depend on the ones transformed before it.
+        """
+        self._rng.seed("%d:%d:%d" % (self._random_seed, epoch, index))
+
+    def transform_audio(self, segment: Union[AudioSegment, SpeechSegment],
+                        epoch: int=0, index: Optional[int]=None) -> None:
+        """
+        Run the pre-processing pipeline for data augmentation.
+        If the utterance `index` is given, the augmentation is seeded by `seed_utterance` and is reproducible
+        whatever the order the utterances are transformed in.
+        """
+        if index is not None:
+            self.seed_utterance(epoch, index)
         for augmentor, rate in zip(self._augmentors, self._rates):
-            if self._rng.uniform(0., 1.) < rate:
+            if isinstance(augmentor, AugmentorBase) and self._rng.uniform(0., 1.) < rate:
                 augmentor.transform_audio(segment)
 
+    def transform_feature(self, features: np.ndarray) -> None:
+        """
+        Run the feature augmentors of the pipeline on the features [n_frames, n_features], e.g. after normalization.
+        Note that this is an in-place transformation.
+        """
+        for augmentor, rate in zip(self._augmentors, self._rates):
+            if isinstance(augmentor, FeatureAugmentorBase) and self._rng.uniform(0., 1.) < rate:
+                augmentor.transform_feature(features)
+
+    def transform_batch(self, batch: AudioBatch) -> None:
+        """
+        Run the pre-processing pipeline over a batch of audio at once. Each augmentor takes effect on the rows
+        sampled by its `prob`, and transforms them together if it is vectorized.
+        """
+        for augmentor, rate in zip(self._augmentors, self._rates):
+            if not isinstance(augmentor, AugmentorBase):
+                continue
+            rows = np.flatnonzero([self._rng.uniform(0., 1.) < rate for _ in range(len(batch))])
+            if len(rows) > 0:
+                augmentor.transform_batch(batch, rows)
+
     def _parse_pipeline_from(self, config_json: str):
         """Parse the config json to build a augmentation pipelien."""
         try:
@@ -281,3 +571,70 @@ class AugmentationPipeline(object):
         if augmentor_type not in _AUGMENT_TYPE_ALIAS:
             raise ValueError("Unknown augumentor type [%s]" % augmentor_type)
         return _AUGMENT_TYPE_ALIAS[augmentor_type](**params)
+
+
+# the augmentation pipeline of each `AugmentationPool` worker
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(augmentation_config: str, random_seed: int):
+    """Build the augmentation pipeline once per worker process."""
+    _worker_state["pipeline"] = AugmentationPipeline(augmentation_config, random_seed=random_seed)
+
+
+def _transform_task(task: Tuple[Union[AudioSegment, SpeechSegment], int, int]) -> Union[AudioSegment, SpeechSegment]:
+    segment, epoch, index = task
+    _worker_state["pipeline"].transform_audio(segment, epoch=epoch, index=index)
+    return segment
+
+
+class AugmentationPool(object):
+    """
+    Pool of processes applying an augmentation pipeline to a stream of segments.
+
+    Each utterance is augmented with the random generator seeded by (random seed, epoch, utterance index), see
+    `AugmentationPipeline.seed_utterance`, so the outputs are the same bit for bit whatever the number of processes,
+    and the same as `AugmentationPipeline.transform_audio` with the utterance index in a single process.
+
+    :param augmentation_config: Augmentation configuration in json string. Details see AugmentationPipeline.__doc__.
+    :param random_seed: Random seed.
+    :param num_processes: Number of parallel processes.
+    :param start_method: The start method of the worker processes, default the platform default.
+    """
+    def __init__(self, augmentation_config: str, random_seed: int=0, num_processes: int=4,
+                 start_method: Optional[str]=None):
+        if num_processes <= 0:
+            raise ValueError("num_processes must be positive, got %d" % num_processes)
+        AugmentationPipeline(augmentation_config, random_seed)  # fail early on a bad config
+        context = multiprocessing.get_context(start_method)
+        self._pool = context.Pool(processes=num_processes, initializer=_init_worker,
+                                  initargs=(augmentation_config, random_seed))
+
+    def transform(self, segments: Iterable[Union[AudioSegment, SpeechSegment]], epoch: int=0, start_index: int=0,
+                  chunksize: int=4) -> Iterator[Union[AudioSegment, SpeechSegment]]:
+        """
+        Augment the segments in parallel.
+
+        :param segments: The segments to augment, the i-th one is the utterance of index `start_index + i`.
+        :param epoch: The epoch of the augmentation.
+        :param start_index: The utterance index of the first segment.
+        :param chunksize: Number of segments sent to a worker at once.
+        :return: Iterator of the augmented segments, in the same order as `segments`.
+        """
+        if self._pool is None:
+            raise RuntimeError("The augmentation pool is closed.")
+        tasks = ((segment, epoch, index) for index, segment in enumerate(segments, start_index))
+        return self._pool.imap(_transform_task, tasks, chunksize=chunksize)
+
+    def close(self) -> None:
+        """Stop the workers."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "AugmentationPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -10,7 +10,7 @@ from deep_speech2.tools.build_vocab import get_vocab_column
 from deep_speech2.data_utils.utility import read_data
 from deep_speech2.data_utils.augmentor import AugmentationPipeline
 from deep_speech2.data_utils.featurizer.speech_featurizer import SpeechFeaturizer
-from deep_speech2.data_utils.segments import SpeechSegment
+from deep_speech2.data_utils.segments import AudioSegment, SpeechSegment
 from deep_speech2.data_utils.normalizer import FeatureNormalizer
 from collections import namedtuple
 from typing import Optional, List, Tuple
@@ -41,18 +41,23 @@ class DataGenerator(object):
     :param keep_transcription_text: If set to True, transcription text will be passed forward directly without
                                     converting to index sequence.
     :type keep_transcription_text: bool
+    :param dtype: The dtype of the features, 'float32', 'float64' or 'float16'.
+    :param feature_store_path: The directory of a `FeatureStore` keeping the features of the utterances across
+                               epochs and runs, before normalization. Unused if the audio is augmented.
+    :param feature_store_max_gb: The bound of the size of the feature store in GB, None for no bound.
     """
     def __init__(self, data_file: str, partition: str, vocab_file: str, vocab_type: str,
                  mean_std_file: str, augmentation_config: str = "{}", max_duration: float = float("inf"),
                  min_duration: float = 0., stride_ms: float = 10., window_ms: float = 20., max_freq: Optional[float]=None,
                  sample_rate: int = 16000, specgram_type: str = "linear", use_dB_normalization: bool = True, random_seed: int=0,
-                 keep_transcription_text: bool = False):
+                 keep_transcription_text: bool = False, dtype: str = "float32", feature_store_path: Optional[str]=None,
+                 feature_store_max_gb: Optional[float]=None):
 
         self._augmentation_pipeline = \
             AugmentationPipeline(augmentation_config=augmentation_config, random_seed=random_seed)
         self._max_duration = max_duration
         self._min_duration = min_duration
-        self._normalizer = FeatureNormalizer(mean_std_file)
+        self._normalizer = FeatureNormalizer(mean_std_file, dtype=dtype)
 
         self._speech_featurizer = SpeechFeaturizer(
             vocab_filepath=vocab_file,
@@ -61,9 +66,17 @@ class DataGenerator(object):
             window_ms=window_ms,
             max_freq=max_freq,
             target_sample_rate=sample_rate,
-            use_dB_normalization=use_dB_normalization
+            use_dB_normalization=use_dB_normalization,
+            dtype="float64" if dtype == "float64" else "float32"  # rounded to float16 after normalization
         )
 
+        self._feature_store = None
+        if feature_store_path and not self._augmentation_pipeline.transforms_audio:
+            from utils.feature_store import FeatureStore
+            self._feature_store = FeatureStore(
+                feature_store_path, self._speech_featurizer.audio_featurizer.config,
+                max_bytes=None if feature_store_max_gb is None else int(feature_store_max_gb * (1 << 30)))
+
         self._rng = random.Random(random_seed)
         self._sep = "-" if vocab_type == "pny" else None
         self._keep_transcription_text = keep_transcription_text
@@ -110,13 +123,13 @@ class DataGenerator(object):
 
         return data[["src", transcript_column]].values
 
-    def write_to_record(self, file: str):
-        """Write the data into tf record"""
+    def write_to_record(self, file: str, epoch: int=0):
+        """Write the data into tf record, the augmentation of each utterance is seeded by the epoch and its index."""
 
         # The processing func on each element of data, which is also the important parameter of saver.
         def _gen_data(element: Tuple):
-            src, transcript = element
-            specgram, tokens = self.process_utterance(src, transcript, self._sep)
+            index, (src, transcript) = element
+            specgram, tokens = self.process_utterance(src, transcript, self._sep, epoch=epoch, index=index)
             true_length = len(specgram)  # original spectrum length without padding, needed by calculating ctc loss
             label_length = len(tokens)  # the label length without padding
             features = np.expand_dims(specgram, 2)  # shape: [n_frames, n_features, 1]
@@ -124,25 +137,42 @@ class DataGenerator(object):
 
         print("Saving {partition} file as record into {file}".format(partition=self.partition, file=file))
         saver = utf.record.RecordSaver(file)
-        saver.save(self._data, length=len(self._data), desc="{} Saving".format(self.partition.upper()),
+        saver.save(list(enumerate(self._data)), length=len(self._data),
+                   desc="{} Saving".format(self.partition.upper()),
                    keys=["features", "labels", "true_length", "label_length"], element_func=_gen_data)
         print("Saved successfully!")
 
-    def process_utterance(self, audio_file: str, transcript: str, text_sep: Optional[str]=None) -> (np.ndarray, List):
+    def process_utterance(self, audio_file: str, transcript: str, text_sep: Optional[str]=None,
+                          epoch: int=0, index: Optional[int]=None) -> (np.ndarray, List):
         """
-        Load, augment, featurize and normalize for speech data.
+        Load, augment, featurize and normalize for speech data, then augment the features.
 
         :param audio_file: File path of audio file.
         :param transcript: Transcription text.
         :param text_sep: The sep string of text. if `None`, use `list` to convert text to list.
+        :param epoch: The epoch of the augmentation.
+        :param index: The index of the utterance in the data. If given, the augmentation is seeded by
+                      (random seed, epoch, index), so it is the same whatever the utterances processed before.
         :return: Tuple of audio feature tensor and data of transcription part,
                  where transcription part could be token ids or text.
                  If `keep_transcription_text` is True: the transcription part is text
                  else(which is default) the transcription part is token ids.
         """
-        speech_segment = SpeechSegment.from_file(audio_file, transcript)
-        self._augmentation_pipeline.transform_audio(speech_segment)
-        specgram, transcript_part =\
-            self._speech_featurizer.featurize(speech_segment, self._keep_transcription_text, text_sep)
+        if index is not None:
+            self._augmentation_pipeline.seed_utterance(epoch, index)
+        if self._feature_store is not None:
+            specgram = self._feature_store.get_or_compute(audio_file, self._featurize_file)
+            transcript_part = self._speech_featurizer.featurize_transcript(
+                transcript, self._keep_transcription_text, text_sep)
+        else:
+            speech_segment = SpeechSegment.from_file(audio_file, transcript)
+            self._augmentation_pipeline.transform_audio(speech_segment)
+            specgram, transcript_part =\
+                self._speech_featurizer.featurize(speech_segment, self._keep_transcription_text, text_sep)
         specgram = self._normalizer.apply(specgram)
+        self._augmentation_pipeline.transform_feature(specgram)
         return specgram, transcript_part
+
+    def _featurize_file(self, audio_file: str) -> np.ndarray:
+        """The audio features of the file, not augmented nor normalized, as the feature store keeps them."""
+        return self._speech_featurizer.audio_featurizer.featurize(AudioSegment.from_file(audio_file))
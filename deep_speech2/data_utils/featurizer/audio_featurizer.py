@@ -1,8 +1,14 @@
 
 import numpy as np
 from deep_speech2.data_utils.segments import AudioSegment, SpeechSegment
-from python_speech_features import mfcc, delta
-from typing import Optional, Union
+from deep_speech2.data_utils.featurizer import mfcc
+from utils import stft
+from typing import Any, Dict, Optional, Union, List
+
+# the feature dtypes, the float16 features are computed in float32 and only stored in float16
+_FEATURE_DTYPES = {"float16": np.float32, "float32": np.float32, "float64": np.float64}
+# the number of windows `featurize_batch` transforms at once, their spectra stay in cache
+_BATCH_BLOCK_STEPS = 2048
 
 
 class AudioFeaturizer(object):
@@ -19,6 +25,9 @@ class AudioFeaturizer(object):
     :param target_sample_rate: Audio are resampled (if upsampling or downsampling is allowed) to this before extracting spectrogram features.
     :param use_dB_normalization: Whether to normalize the audio to a certain dB before extracting the features.
     :param target_dB: Target audio decibels for normalization.
+    :param dtype: The dtype of the features, 'float32', 'float64' or 'float16'.
+                  The samples, windows and spectra are computed in float32 unless it is 'float64',
+                  and 'float16' features are only rounded at the end, for storage.
     """
     def __init__(self,
                  specgram_type: str="linear",
@@ -27,7 +36,8 @@ class AudioFeaturizer(object):
                  max_freq: Optional[float]=None,
                  target_sample_rate: int=16000,
                  use_dB_normalization: bool=True,
-                 target_dB: int=-20):
+                 target_dB: int=-20,
+                 dtype: str="float32"):
 
         if stride_ms > window_ms:
             raise ValueError("Stride must be not be greater than window.")
@@ -35,6 +45,8 @@ class AudioFeaturizer(object):
             max_freq = target_sample_rate / 2
         if max_freq > target_sample_rate / 2:
             raise ValueError("max freq must not be greater than half of sample rate e.g.(<= %f)" % (target_sample_rate / 2))
+        if dtype not in _FEATURE_DTYPES:
+            raise ValueError("Unsupported feature dtype %s, possible choices are %s" % (dtype, list(_FEATURE_DTYPES)))
 
         self._specgram_type = specgram_type
         self._stride_ms = stride_ms
@@ -43,12 +55,23 @@ class AudioFeaturizer(object):
         self._target_sample_rate = target_sample_rate
         self._use_dB_normalization = use_dB_normalization
         self._target_dB = target_dB
+        self._dtype = np.dtype(dtype)
+        self._compute_dtype = np.dtype(_FEATURE_DTYPES[dtype])
 
     @property
     def n_features(self):
         """The expected `n_features` of the featurized audio specgram"""
         return (self._window_ms / 1000 * self._target_sample_rate) // 2 + 1
 
+    @property
+    def config(self) -> Dict[str, Any]:
+        """The params the features depend on, e.g. to key them in a `FeatureStore`."""
+        return {"featurizer": "%s.%s" % (type(self).__module__, type(self).__name__),
+                "specgram_type": self._specgram_type, "stride_ms": self._stride_ms, "window_ms": self._window_ms,
+                "max_freq": self._max_freq, "target_sample_rate": self._target_sample_rate,
+                "use_dB_normalization": self._use_dB_normalization, "target_dB": self._target_dB,
+                "dtype": self._dtype.name}
+
     def featurize(self, segment: Union[AudioSegment, SpeechSegment],
                   allow_downsampling: bool=True, allow_upsampling: bool=True) -> np.ndarray:
         """
@@ -59,6 +82,66 @@ class AudioFeaturizer(object):
         :return: Spectrogram audio feature in 2d array.
         :raises ValueError: If audio sample rate is not supported.
         """
+        self._prepare_segment(segment, allow_downsampling, allow_upsampling)
+        return self._compute_specgram(segment.samples, segment.sample_rate)
+
+    def featurize_batch(self, segments: List[Union[AudioSegment, SpeechSegment]],
+                        allow_downsampling: bool=True, allow_upsampling: bool=True) -> List[np.ndarray]:
+        """
+        Extract audio features from a batch of AudioSegment or SpeechSegment at once.
+        For the `linear` spectrogram, the windows of all the segments are stacked into blocks of one matrix, weighted
+        and transformed by the `stft` kernel per block, then split back per segment.
+        The `mfcc` features of all the segments are computed by one call of the mfcc engine.
+        :param segments: Audio/speech segments to extract features from.
+        :param allow_downsampling: Whether to allow audio downsampling before featurizing.
+        :param allow_upsampling: Whether to allow audio upsampling before featurizing.
+        :return: List of spectrogram audio features in 2d array, the same as `featurize` of each segment.
+        :raises ValueError: If audio sample rate is not supported.
+        """
+        for segment in segments:
+            self._prepare_segment(segment, allow_downsampling, allow_upsampling)
+        if self._specgram_type == "mfcc" and segments:
+            features = self._compute_mfcc([segment.samples for segment in segments], self._target_sample_rate,
+                                          self._stride_ms, self._window_ms, self._max_freq, self._compute_dtype.name)
+            return [f.astype(self._dtype, copy=False) for f in features]
+        if self._specgram_type != "linear" or not segments:
+            return [self._compute_specgram(segment.samples, segment.sample_rate) for segment in segments]
+
+        sample_rate = self._target_sample_rate
+        stride_size = int(0.001 * self._stride_ms * sample_rate)
+        window_size = int(0.001 * self._window_ms * sample_rate)
+        frames = [stft.frame(segment.samples.astype(self._compute_dtype, copy=False), window_size, stride_size)
+                  for segment in segments]
+        n_bins = stft.num_bins(window_size, sample_rate, self._max_freq)
+
+        # the windows of the segments are copied back to back into a block of a cache-friendly number of steps,
+        # each full block costs one rfft and its features are written into the rows of the batch features
+        counts = [len(f) for f in frames]
+        specgram = np.empty((sum(counts), n_bins), dtype=self._compute_dtype)
+        block = np.empty((min(_BATCH_BLOCK_STEPS, max(len(specgram), 1)), window_size), dtype=self._compute_dtype)
+        filled, written = 0, 0
+        for f in frames:
+            start = 0
+            while start < len(f):
+                n = min(len(f) - start, len(block) - filled)
+                block[filled: filled + n] = f[start: start + n]
+                filled, start = filled + n, start + n
+                if filled == len(block):
+                    specgram[written: written + filled] = self._log_specgram(block, sample_rate, n_bins)
+                    filled, written = 0, written + filled
+        if filled:
+            specgram[written: written + filled] = self._log_specgram(block[:filled], sample_rate, n_bins)
+        return np.split(specgram.astype(self._dtype, copy=False), np.cumsum(counts)[:-1])
+
+    @staticmethod
+    def _log_specgram(frames: np.ndarray, sample_rate: int, n_bins: int, eps: float=1e-14) -> np.ndarray:
+        """The log power spectral density of the frames with the hanning window, [n_frames, n_bins]."""
+        return stft.spectrum(frames, window_name="hanning", scaling="density", sample_rate=sample_rate,
+                             n_bins=n_bins, log_offset=eps)
+
+    def _prepare_segment(self, segment: Union[AudioSegment, SpeechSegment],
+                         allow_downsampling: bool, allow_upsampling: bool) -> None:
+        """Resample and normalize the segment in place before extracting features."""
         if (segment.sample_rate > self._target_sample_rate and allow_downsampling) or \
                 (segment.sample_rate < self._target_sample_rate and allow_upsampling):
             # resample the base signal to the target sample rate.
@@ -70,21 +153,28 @@ class AudioFeaturizer(object):
                              (segment.sample_rate, self._target_sample_rate))
         if self._use_dB_normalization:
             segment.normalize(target_db=self._target_dB)
-        return self._compute_specgram(segment.samples, segment.sample_rate)
 
     def _compute_specgram(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
         """Extract various audio features."""
         if self._specgram_type == "linear":
-            return self._compute_linear_specgram(samples, sample_rate, self._stride_ms, self._window_ms, self._max_freq)
+            specgram = self._compute_linear_specgram(
+                samples.astype(self._compute_dtype, copy=False), sample_rate, self._stride_ms, self._window_ms,
+                self._max_freq)
         elif self._specgram_type == "mfcc":
-            return self._compute_mfcc(samples, sample_rate, self._stride_ms, self._window_ms, self._max_freq)
+            specgram = self._compute_mfcc(samples, sample_rate, self._stride_ms, self._window_ms, self._max_freq,
+                                          self._compute_dtype.name)
         else:
             raise ValueError("Unknown specgram_type %s" % self._specgram_type)
+        return specgram.astype(self._dtype, copy=False)
 
     @staticmethod
-    def _compute_mfcc(samples: np.ndarray, sample_rate: int, stride_ms: float=10.,
-                      window_ms: float=20., max_freq: Optional[float]=None) -> np.ndarray:
-        """Compute mfcc features from samples."""
+    def _compute_mfcc(samples: Union[np.ndarray, List[np.ndarray]], sample_rate: int, stride_ms: float=10.,
+                      window_ms: float=20., max_freq: Optional[float]=None,
+                      dtype: str="float64") -> Union[np.ndarray, List[np.ndarray]]:
+        """
+        Compute mfcc features from samples, or from a list of them, followed by their 1st and 2nd order deltas.
+        The features are those of `python_speech_features`, with the filterbank and DCT matrices cached.
+        """
         if max_freq is None:
             max_freq = sample_rate / 2
         if max_freq > sample_rate / 2:
@@ -92,49 +182,13 @@ class AudioFeaturizer(object):
         if stride_ms > window_ms:
             raise ValueError("Stride must be not be greater than window.")
 
-        mfcc_feat = mfcc(signal=samples, samplerate=sample_rate, winlen=0.001 * window_ms,
-                         winstep=0.001 * stride_ms, highfreq=max_freq)  # n_frames * n_features
-        # deltas
-        d1_mfcc_feat = delta(mfcc_feat, 2)  # n_frames * n_features
-        d2_mfcc_feat = delta(d1_mfcc_feat, 2)  # n_frames * n_features
-
-        concat_mfcc_feat = np.concatenate([np.transpose(feat) for feat in [mfcc_feat, d1_mfcc_feat, d2_mfcc_feat]])
-
-        # in original script, no transpose, e.g. the shape is: [3 * n_features, n_frames]
-        # here the shape is: [n_frames, 3 * n_features]
-        return np.transpose(concat_mfcc_feat, (1, 0))
-
-    @staticmethod
-    def _specgram_real(samples: np.ndarray, stride_size: int, window_size: int, sample_rate: int):
-        """Compute the spectrogram for samples from a real signal."""
-        # length = stride_size * K + window_size + truncate_size (K is as max as possible, truncate_size < stride_size)
-        truncate_size = (len(samples) - window_size) % stride_size  # length of samples to truncate from the tail
-        samples = samples[: (len(samples) - truncate_size)]  # len(samples) = length - truncate_size
-        nbytes = samples.strides[0]  # bytes between each and next by each axis.
-
-        nshape = (window_size, (len(samples) - window_size) // stride_size + 1)  # (window_size, step_num)
-        nstrides = (nbytes, stride_size * nbytes)  # Row by 1 element, col by `stride_size` element
-
-        windows = np.lib.stride_tricks.as_strided(samples, shape=nshape, strides=nstrides)
-
-        # check the 2nd stride step
-        assert np.all(np.equal(windows[:, 1], samples[stride_size: (stride_size + window_size)]))
-
-        # window weighting, squared FFT, scaling
-        weighting = np.hanning(window_size)[:, np.newaxis]
-        fft = np.abs(np.fft.rfft(windows * weighting, axis=0)) ** 2  # shape: (window_size // 2 + 1, step_num)
-        scale = np.sum(weighting ** 2) * sample_rate
-        fft[1: -1, :] /= (scale / 2.)
-        fft[(0, -1), :] /= scale
-
-        # length: window_size // 2 + 1
-        # max element is sample_rate / 2
-        freqs = float(sample_rate) / window_size * np.arange(fft.shape[0])
-        return fft, freqs
+        # the shape is: [n_frames, 3 * n_features], the original script had [3 * n_features, n_frames]
+        return mfcc.mfcc(samples, sample_rate, window_ms=window_ms, stride_ms=stride_ms, fmax=max_freq,
+                         num_deltas=2, dtype=dtype)
 
     def _compute_linear_specgram(self, samples: np.ndarray, sample_rate: int, stride_ms: float = 10.,
                                  window_ms: float = 20., max_freq: Optional[float] = None, eps: float = 1e-14) -> np.ndarray:
-        """Compute the linear spectrogram from FFT energy."""
+        """Compute the linear spectrogram from FFT energy, [step_num, n_bins], float32 for float32 samples."""
         if max_freq is not None and max_freq > sample_rate / 2:
             raise ValueError("max freq must not be greater than half of sample rate e.g.(<= %f)" % (sample_rate / 2))
         if stride_ms > window_ms:
@@ -142,24 +196,101 @@ class AudioFeaturizer(object):
 
         stride_size = int(0.001 * stride_ms * sample_rate)
         window_size = int(0.001 * window_ms * sample_rate)
-        spectrum, freqs = self._specgram_real(
-            samples,
-            stride_size=stride_size,
-            window_size=window_size,
-            sample_rate=sample_rate)
-
-        if max_freq is not None:
-            ind = np.where(freqs <= max_freq)[0][-1] + 1
-            specgram = np.log(spectrum[: ind, :] + eps)
-        else:
-            # default `max_freq = sample_rate / 2`
-            # which is the max of freqs, the ind is precisely the length of fft(spectrum)
-            # in original scripts, due to the floating-error,
-            # the ind could be smaller than the length of fft, often `length - 1`
-            # for which the features should be padded to same in the batch generator.
-            # The method here solves the problem to free from padding.
-            specgram = np.log(spectrum + eps)
-
-        # in original script, no transpose, e.g. the shape is same as fft result: [window_size // 2 + 1, step_num]
-        # here the shape is: [step_num, window_size // 2 + 1]
-        return np.transpose(specgram, (1, 0))
+        # the bins of freqs in [0, max_freq], all of them by default `max_freq = sample_rate / 2`, so no padding
+        return self._log_specgram(stft.frame(samples, window_size, stride_size), sample_rate,
+                                  stft.num_bins(window_size, sample_rate, max_freq), eps=eps)
+
+
+class StreamingAudioFeaturizer(AudioFeaturizer):
+    """
+    Streaming version of the `linear` spectrogram of `AudioFeaturizer`, for audio arriving in chunks of any length.
+    The samples not yet covered by a complete window, less than a window, are carried in a buffer between the chunks,
+    and each call emits only the frames completed by its chunk, so the concatenated outputs are exactly the
+    spectrogram `featurize` gives for the concatenated chunks without dB normalization.
+    The whole audio isn't known in advance to normalize its dB, an `OnlineBayesianNormalizer` may process the chunks
+    before instead.
+
+    If `normalize`, each frame is normalized by the running mean and stddev of the frames up to it, starting from the
+    ones of `mean_std_filepath` weighted as `prior_frames` frames if given, e.g. those of the training data.
+
+    :param stride_ms: Striding size (in milliseconds) for generating frames.
+    :param window_ms: Window size (in milliseconds) for generating frames.
+    :param max_freq: Only FFT bins corresponding to frequencies between [0, max_freq] are returned.
+    :param sample_rate: The sample rate of the chunks.
+    :param dtype: The dtype of the features, 'float32', 'float64' or 'float16'.
+    :param normalize: Whether to normalize the frames by their running mean and stddev.
+    :param mean_std_filepath: File of `FeatureNormalizer` with the prior mean and stddev of the running statistics.
+    :param prior_frames: Prior strength of the mean and stddev of `mean_std_filepath` in number of frames.
+    """
+    def __init__(self,
+                 stride_ms: float=10.,
+                 window_ms: float=20.,
+                 max_freq: Optional[float]=None,
+                 sample_rate: int=16000,
+                 dtype: str="float32",
+                 normalize: bool=False,
+                 mean_std_filepath: Optional[str]=None,
+                 prior_frames: float=100.):
+        super(StreamingAudioFeaturizer, self).__init__(
+            specgram_type="linear", stride_ms=stride_ms, window_ms=window_ms, max_freq=max_freq,
+            target_sample_rate=sample_rate, use_dB_normalization=False, dtype=dtype)
+        self._stride_size = int(0.001 * stride_ms * sample_rate)
+        self._window_size = int(0.001 * window_ms * sample_rate)
+        self._num_bins = stft.num_bins(self._window_size, sample_rate, self._max_freq)
+        self._normalize = normalize
+        self._prior_sum = np.zeros(self._num_bins)
+        self._prior_sum_of_squares = np.zeros(self._num_bins)
+        self._prior_frames = 0.
+        if mean_std_filepath:
+            npzfile = np.load(mean_std_filepath)
+            mean, std = npzfile["mean"].reshape(-1), npzfile["std"].reshape(-1)
+            self._prior_sum = mean * prior_frames
+            self._prior_sum_of_squares = (std ** 2 + mean ** 2) * prior_frames
+            self._prior_frames = prior_frames
+        self._buffer = np.zeros(2 * self._window_size, dtype=self._compute_dtype)
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new audio, the samples carried of the former one are dropped as `featurize` truncates them."""
+        self._num_buffered = 0
+        self._sum = self._prior_sum.copy()
+        self._sum_of_squares = self._prior_sum_of_squares.copy()
+        self._num_frames = self._prior_frames
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        Featurize the next chunk of float samples, as `AudioSegment.samples`.
+
+        :return: The frames completed by the chunk, [n_frames, n_features], n_frames is 0 if none.
+        """
+        end = self._num_buffered + len(chunk)
+        if end > len(self._buffer):
+            buffer = np.empty(max(end, 2 * len(self._buffer)), dtype=self._compute_dtype)
+            buffer[:self._num_buffered] = self._buffer[:self._num_buffered]
+            self._buffer = buffer
+        self._buffer[self._num_buffered: end] = chunk
+        self._num_buffered = end
+        if end < self._window_size:
+            return np.zeros((0, self._num_bins), dtype=self._dtype)
+
+        # the spectrogram of the buffer, computed as `featurize` does, the samples after its last frame are kept
+        specgram = self._compute_linear_specgram(self._buffer[:end], self._target_sample_rate, self._stride_ms,
+                                                 self._window_ms, self._max_freq)
+        consumed = len(specgram) * self._stride_size
+        self._num_buffered = end - consumed
+        self._buffer[:self._num_buffered] = self._buffer[consumed: end]
+        if self._normalize:
+            specgram = self._normalize_frames(specgram)
+        return specgram.astype(self._dtype, copy=False)
+
+    def _normalize_frames(self, specgram: np.ndarray, eps: float=1e-14) -> np.ndarray:
+        # the statistics of each frame accumulate from the carried ones, in float64
+        frames = specgram.astype(np.float64)
+        cumsum = np.cumsum(frames, axis=0) + self._sum
+        cumsum_of_squares = np.cumsum(frames ** 2, axis=0) + self._sum_of_squares
+        count = (self._num_frames + np.arange(1, len(frames) + 1))[:, np.newaxis]
+        self._sum, self._sum_of_squares = cumsum[-1], cumsum_of_squares[-1]
+        self._num_frames = count[-1, 0]
+        mean = cumsum / count
+        std = np.sqrt(np.maximum(cumsum_of_squares / count - mean ** 2, 0.))
+        return ((frames - mean) / (std + eps)).astype(self._compute_dtype)
@@ -0,0 +1,256 @@
+"""
+Contains the mel filterbank and MFCC features, with the filterbank and DCT matrices computed once per config.
+
+Two conventions are reproduced:
+    `log_fbank` and `mfcc` follow `python_speech_features`, which `AudioFeaturizer` used to call, e.g. pre-emphasis,
+    rectangular frames zero padded to `n_fft`, triangular filters on floored fft bins and the liftered cepstra;
+    `log_mel_librosa` and `mfcc_librosa` follow the defaults of `librosa.feature.mfcc`, e.g. centered hann frames,
+    slaney mel scale and norm, and the power in dB clipped to `top_db` below the max of the utterance.
+Each one takes the samples of an utterance, or a list of them to transform all their frames at once.
+"""
+
+import decimal
+import functools
+import numpy as np
+from scipy import fft as sp_fft
+from scipy.ndimage import correlate1d
+from typing import List, Optional, Tuple, Union
+
+Samples = Union[np.ndarray, List[np.ndarray]]
+# the number of frames transformed at once, their spectra stay in cache
+_BLOCK_FRAMES = 512
+
+
+def _round_half_up(number: float) -> int:
+    return int(decimal.Decimal(number).quantize(decimal.Decimal("1"), rounding=decimal.ROUND_HALF_UP))
+
+
+def _hz_to_mel(hz: np.ndarray, scale: str) -> np.ndarray:
+    if scale == "htk":
+        return 2595 * np.log10(1 + hz / 700.)
+    # slaney: linear below 1 kHz, logarithmic above
+    mel = hz / (200. / 3)
+    log_region = hz >= 1000.
+    mel[log_region] = 15. + np.log(hz[log_region] / 1000.) / (np.log(6.4) / 27.)
+    return mel
+
+
+def _mel_to_hz(mel: np.ndarray, scale: str) -> np.ndarray:
+    if scale == "htk":
+        return 700 * (10 ** (mel / 2595.) - 1)
+    hz = mel * (200. / 3)
+    log_region = mel >= 15.
+    hz[log_region] = 1000. * np.exp(np.log(6.4) / 27. * (mel[log_region] - 15.))
+    return hz
+
+
+@functools.lru_cache(maxsize=16)
+def mel_filterbank(sample_rate: int, n_fft: int, n_mels: int, fmax: Optional[float]=None, fmin: float=0.,
+                   style: str="psf") -> np.ndarray:
+    """
+    The mel filterbank, computed once per config and read-only.
+
+    :param style: 'psf' for the filters of `python_speech_features`, on the htk mel scale with edges floored to fft
+                  bins; 'librosa' for the filters of `librosa.filters.mel`, on the slaney mel scale and area normalized.
+    :return: The filters in rows, shape [n_mels, n_fft // 2 + 1], float64.
+    """
+    if fmax is None:
+        fmax = sample_rate / 2
+    if fmax > sample_rate / 2:
+        raise ValueError("max freq must not be greater than half of sample rate e.g.(<= %f)" % (sample_rate / 2))
+    scale = {"psf": "htk", "librosa": "slaney"}.get(style)
+    if scale is None:
+        raise ValueError("Unknown filterbank style %s, possible choices are ['psf', 'librosa']" % style)
+
+    mel_points = _mel_to_hz(np.linspace(*_hz_to_mel(np.array([fmin, fmax], dtype=np.float64), scale), n_mels + 2),
+                            scale)
+    if style == "psf":
+        points = np.floor((n_fft + 1) * mel_points / sample_rate)
+        bins = np.arange(n_fft // 2 + 1, dtype=np.float64)
+    else:
+        points = mel_points
+        bins = np.linspace(0, sample_rate / 2, n_fft // 2 + 1)
+    lower, center, upper = points[:-2, None], points[1:-1, None], points[2:, None]
+    if style == "psf":
+        # each filter covers the bins [lower, upper), the empty slopes of coincident edges stay zero
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rising = np.where(bins < center, (bins - lower) / (center - lower), 0.)
+            falling = np.where(bins >= center, (upper - bins) / (upper - center), 0.)
+        filters = np.where((bins >= lower) & (bins < upper), rising + falling, 0.)
+    else:
+        filters = np.maximum(0., np.minimum((bins - lower) / (center - lower), (upper - bins) / (upper - center)))
+        filters *= 2. / (upper - lower)
+    filters.flags.writeable = False
+    return filters
+
+
+@functools.lru_cache(maxsize=16)
+def dct_matrix(n_mels: int, n_ceps: int, lifter: int=0) -> np.ndarray:
+    """
+    The orthonormal DCT-II of the log mel energies to the first `n_ceps` cepstra, the lifter folded in.
+    Computed once per config and read-only, `log_mel @ dct_matrix(...)` gives the cepstra.
+
+    :return: shape [n_mels, n_ceps], float64.
+    """
+    n = np.arange(n_mels)[:, None]
+    k = np.arange(n_ceps)[None, :]
+    matrix = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2. / n_mels)
+    matrix[:, 0] /= np.sqrt(2.)
+    if lifter > 0:
+        matrix *= 1 + (lifter / 2.) * np.sin(np.pi * np.arange(n_ceps) / lifter)
+    matrix.flags.writeable = False
+    return matrix
+
+
+def delta(features: np.ndarray, width: int=2, axis: int=0) -> np.ndarray:
+    """
+    The delta features by regression over `width` frames on each side, the edge frames repeated,
+    as `python_speech_features.delta` but as one convolution along the time axis.
+    """
+    if width < 1:
+        raise ValueError("The delta width must be an integer >= 1")
+    weights = np.arange(-width, width + 1, dtype=features.dtype)
+    weights /= 2 * np.sum(np.arange(1, width + 1) ** 2)
+    return correlate1d(features, weights, axis=axis, mode="nearest")
+
+
+def _append_deltas(features: np.ndarray, num_deltas: int, width: int) -> np.ndarray:
+    """[n_frames, n] features to [n_frames, n * (1 + num_deltas)], followed by their deltas of each order."""
+    orders = [features]
+    for _ in range(num_deltas):
+        orders.append(delta(orders[-1], width))
+    return np.concatenate(orders, axis=1) if num_deltas else features
+
+
+def _as_batch(samples: Samples) -> Tuple[List[np.ndarray], bool]:
+    if isinstance(samples, np.ndarray):
+        return [samples], False
+    return list(samples), True
+
+
+def _psf_frames(batch: List[np.ndarray], frame_len: int, frame_step: int, preemph: float,
+                dtype: np.dtype) -> Tuple[np.ndarray, List[int]]:
+    """The pre-emphasized frames of the utterances, zero padded at the tail, stacked in one array."""
+    counts = [1 if len(s) <= frame_len else 1 + -(-(len(s) - frame_len) // frame_step) for s in batch]
+    frames = np.empty((sum(counts), frame_len), dtype=dtype)
+    start = 0
+    for samples, count in zip(batch, counts):
+        padded = np.zeros((count - 1) * frame_step + frame_len, dtype=dtype)
+        padded[0] = samples[0]
+        padded[1:len(samples)] = samples[1:] - preemph * samples[:-1]
+        frames[start: start + count] = np.lib.stride_tricks.as_strided(
+            padded, shape=(count, frame_len), strides=(frame_step * padded.strides[0], padded.strides[0]))
+        start += count
+    return frames, counts
+
+
+def _psf_fbank(batch: List[np.ndarray], sample_rate: int, window_ms: float, stride_ms: float, n_mels: int,
+               n_fft: int, fmax: Optional[float], preemph: float,
+               dtype: np.dtype) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    frame_len = _round_half_up(0.001 * window_ms * sample_rate)
+    frame_step = _round_half_up(0.001 * stride_ms * sample_rate)
+    frames, counts = _psf_frames(batch, frame_len, frame_step, preemph, dtype)
+    filters = mel_filterbank(sample_rate, n_fft, n_mels, fmax).T.astype(dtype)
+    fbank = np.empty((len(frames), n_mels), dtype=dtype)
+    energy = np.empty(len(frames), dtype=dtype)
+    for start in range(0, len(frames), _BLOCK_FRAMES):
+        block = slice(start, start + _BLOCK_FRAMES)
+        power = np.square(np.abs(sp_fft.rfft(frames[block], n_fft, axis=1))) / n_fft
+        np.sum(power, axis=1, out=energy[block])
+        np.matmul(power, filters, out=fbank[block])
+    eps = np.finfo(np.float64).eps  # `python_speech_features` guards the log with the float64 eps in any dtype
+    energy[energy == 0] = eps
+    fbank[fbank == 0] = eps
+    return fbank, energy, counts
+
+
+def log_fbank(samples: Samples, sample_rate: int, window_ms: float=25., stride_ms: float=10., n_mels: int=26,
+              n_fft: int=512, fmax: Optional[float]=None, preemph: float=0.97,
+              dtype: str="float64") -> Union[np.ndarray, List[np.ndarray]]:
+    """
+    The log mel filterbank energies, as `python_speech_features.logfbank`.
+
+    :param samples: The samples of an utterance, or a list of them.
+    :param dtype: The dtype the features are computed in, 'float32' or 'float64'.
+    :return: The features of shape [n_frames, n_mels], or a list of them.
+    """
+    batch, is_batch = _as_batch(samples)
+    fbank, _, counts = _psf_fbank(batch, sample_rate, window_ms, stride_ms, n_mels, n_fft, fmax, preemph,
+                                  np.dtype(dtype))
+    features = np.split(np.log(fbank), np.cumsum(counts)[:-1])
+    return features if is_batch else features[0]
+
+
+def mfcc(samples: Samples, sample_rate: int, window_ms: float=25., stride_ms: float=10., n_mfcc: int=13,
+         n_mels: int=26, n_fft: int=512, fmax: Optional[float]=None, preemph: float=0.97, lifter: int=22,
+         append_energy: bool=True, num_deltas: int=0, delta_width: int=2,
+         dtype: str="float64") -> Union[np.ndarray, List[np.ndarray]]:
+    """
+    The mfcc features, as `python_speech_features.mfcc`, followed by their deltas up to `num_deltas` order,
+    as `python_speech_features.delta` applied repeatedly.
+
+    :param samples: The samples of an utterance, or a list of them.
+    :param append_energy: Whether the 0th cepstrum is replaced by the log energy of the frame.
+    :param dtype: The dtype the features are computed in, 'float32' or 'float64'.
+    :return: The features of shape [n_frames, n_mfcc * (1 + num_deltas)], or a list of them.
+    """
+    batch, is_batch = _as_batch(samples)
+    dtype = np.dtype(dtype)
+    fbank, energy, counts = _psf_fbank(batch, sample_rate, window_ms, stride_ms, n_mels, n_fft, fmax, preemph,
+                                       dtype)
+    cepstra = np.log(fbank) @ dct_matrix(n_mels, n_mfcc, lifter).astype(dtype)
+    if append_energy:
+        cepstra[:, 0] = np.log(energy)
+    features = [_append_deltas(c, num_deltas, delta_width) for c in np.split(cepstra, np.cumsum(counts)[:-1])]
+    return features if is_batch else features[0]
+
+
+def _librosa_power(batch: List[np.ndarray], n_fft: int, hop_length: int,
+                   pad_mode: str) -> Tuple[np.ndarray, List[int]]:
+    """The power spectra of the centered periodic hann frames of the utterances, [sum n_frames, n_fft // 2 + 1]."""
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+    frames = []
+    for samples in batch:
+        padded = np.pad(samples.astype(np.float32, copy=False), n_fft // 2, mode=pad_mode)
+        frames.append(np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length])
+    counts = [len(f) for f in frames]
+    return np.square(np.abs(sp_fft.rfft(np.concatenate(frames) * window, axis=1))), counts
+
+
+def log_mel_librosa(samples: Samples, sample_rate: int, n_mels: int=128, n_fft: int=2048, hop_length: int=512,
+                    fmax: Optional[float]=None, pad_mode: str="constant",
+                    top_db: Optional[float]=80.) -> Union[np.ndarray, List[np.ndarray]]:
+    """
+    The log mel spectrogram, as `librosa.power_to_db(librosa.feature.melspectrogram(...))` with their defaults.
+    librosa pads the frames with zeros since its 0.10 version, `pad_mode='reflect'` gives the former features.
+
+    :param samples: The samples of an utterance, or a list of them.
+    :param top_db: The dB below the max of each utterance the features are clipped to, None not to clip.
+    :return: The float32 features of shape [n_mels, n_frames], as librosa, or a list of them.
+    """
+    batch, is_batch = _as_batch(samples)
+    power, counts = _librosa_power(batch, n_fft, hop_length, pad_mode)
+    mel = power @ mel_filterbank(sample_rate, n_fft, n_mels, fmax, style="librosa").T.astype(np.float32)
+    log_mel = 10 * np.log10(np.maximum(mel, 1e-10))
+    features = []
+    for feature in np.split(log_mel, np.cumsum(counts)[:-1]):
+        if top_db is not None:
+            feature = np.maximum(feature, feature.max() - top_db)
+        features.append(feature.T)
+    return features if is_batch else features[0]
+
+
+def mfcc_librosa(samples: Samples, sample_rate: int, n_mfcc: int=20, n_mels: int=128, n_fft: int=2048,
+                 hop_length: int=512, fmax: Optional[float]=None, pad_mode: str="constant",
+                 top_db: Optional[float]=80.) -> Union[np.ndarray, List[np.ndarray]]:
+    """
+    The mfcc features, as `librosa.feature.mfcc` with its defaults, see `log_mel_librosa`.
+
+    :param samples: The samples of an utterance, or a list of them.
+    :return: The float32 features of shape [n_mfcc, n_frames], as librosa, or a list of them.
+    """
+    batch, is_batch = _as_batch(samples)
+    log_mels = log_mel_librosa(batch, sample_rate, n_mels, n_fft, hop_length, fmax, pad_mode, top_db)
+    matrix = dct_matrix(n_mels, n_mfcc).T.astype(np.float32)
+    features = [matrix @ log_mel for log_mel in log_mels]
+    return features if is_batch else features[0]
@@ -4,7 +4,7 @@ import numpy as np
 from deep_speech2.data_utils.featurizer.audio_featurizer import AudioFeaturizer
 from deep_speech2.data_utils.featurizer.text_featurizer import TextFeaturizer
 from deep_speech2.data_utils.segments import SpeechSegment
-from typing import Optional, List
+from typing import Optional, List, Union
 
 
 class SpeechFeaturizer(object):
@@ -24,6 +24,7 @@ class SpeechFeaturizer(object):
     :param target_sample_rate: Speech are resampled (if upsampling or downsampling is allowed) to this.
     :param use_dB_normalization: Whether to normalize the audio to a certain dB before extracting the features.
     :param target_dB: Target audio dB for normalization.
+    :param dtype: The dtype of the audio features, 'float32', 'float64' or 'float16'.
     """
     def __init__(self,
                  vocab_filepath: str,
@@ -33,7 +34,8 @@ class SpeechFeaturizer(object):
                  max_freq: Optional[float]=None,
                  target_sample_rate: int=16000,
                  use_dB_normalization: bool=True,
-                 target_dB: int=-20):
+                 target_dB: int=-20,
+                 dtype: str="float32"):
         self._audio_featurizer = AudioFeaturizer(
             specgram_type=specgram_type,
             stride_ms=stride_ms,
@@ -41,7 +43,8 @@ class SpeechFeaturizer(object):
             max_freq=max_freq,
             target_sample_rate=target_sample_rate,
             use_dB_normalization=use_dB_normalization,
-            target_dB=target_dB
+            target_dB=target_dB,
+            dtype=dtype
         )
         self._text_featurizer = TextFeaturizer(
             vocab_filepath=vocab_filepath
@@ -68,10 +71,22 @@ class SpeechFeaturizer(object):
                             If `keep_transcription_text = True`
         """
         audio_feature = self._audio_featurizer.featurize(speech_segment)
+        return audio_feature, self.featurize_transcript(speech_segment.transcript, keep_transcription_text, text_sep)
+
+    def featurize_transcript(self, transcript: str, keep_transcription_text: bool,
+                             text_sep: Optional[str]=None) -> Union[str, List[int]]:
+        """
+        Extract features for the transcript only, the transcript part of `featurize`.
+
+        :return: If `keep_transcription_text = False`: list of token indices, else the transcript.
+        """
         if keep_transcription_text:
-            return audio_feature, speech_segment.transcript
-        text_ids = self._text_featurizer.featurize(speech_segment.transcript, text_sep)
-        return audio_feature, text_ids
+            return transcript
+        return self._text_featurizer.featurize(transcript, text_sep)
+
+    @property
+    def audio_featurizer(self) -> AudioFeaturizer:
+        return self._audio_featurizer
 
     @property
     def vocab_size(self):
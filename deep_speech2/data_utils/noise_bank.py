@@ -0,0 +1,114 @@
+"""Contains the noise bank, all noise recordings packed into one memory mapped array."""
+
+import os
+import random
+import numpy as np
+from deep_speech2.data_utils.utility import read_data
+from deep_speech2.data_utils.segments import AudioSegment
+from typing import List, Tuple
+
+
+def build_noise_bank(noise_file_path: str, bank_path: str, sample_rate: int=16000, dtype: str="int16",
+                     window_ms: float=10.) -> None:
+    """
+    Pack the noise recordings of a noise data file into a noise bank.
+    The recordings are resampled to `sample_rate` and appended back to back into `<bank_path>.samples` as `dtype`.
+    Their offsets and lengths, and the cumulative sums of squares over windows of `window_ms` of each one, are written
+    to `<bank_path>.index.npz`.
+
+    :param noise_file_path: file path for noise audio data.
+    :param bank_path: The path prefix of the bank files.
+    :param sample_rate: The sample rate of the bank.
+    :param dtype: The sample type of the bank, 'int16' or 'float32'.
+    :param window_ms: The window size in milliseconds of the energy statistics.
+    """
+    if dtype not in ("int16", "float32"):
+        raise ValueError("Unsupported bank sample type: %s" % dtype)
+    window_size = max(int(window_ms * sample_rate / 1000), 1)
+    noise_data = read_data(noise_file_path, data_tag="noise", to_dict=True)
+    lengths, cumsums, sources = [], [], []
+    with open(bank_path + ".samples", "wb") as f:
+        for instance in noise_data:
+            segment = AudioSegment.from_file(instance["src"])
+            if segment.sample_rate != sample_rate:
+                segment.resample(sample_rate)
+            samples = AudioSegment._convert_samples_from_float32(segment.samples, dtype)
+            f.write(samples.tobytes())
+            # the statistics of the samples as read back
+            squares = np.square(AudioSegment._convert_samples_to_float32(samples), dtype=np.float64)
+            n_windows = -(-len(squares) // window_size)
+            window_sums = np.add.reduceat(squares, np.arange(n_windows) * window_size) if n_windows else squares
+            cumsums.append(np.concatenate([[0.], np.cumsum(window_sums)]))
+            lengths.append(len(samples))
+            sources.append(instance["src"])
+
+    lengths = np.array(lengths, dtype=np.int64)
+    window_counts = np.array([len(c) for c in cumsums], dtype=np.int64)
+    np.savez(bank_path + ".index.npz", offsets=np.cumsum(lengths) - lengths, lengths=lengths,
+             window_offsets=np.cumsum(window_counts) - window_counts,
+             cumsum_squares=np.concatenate(cumsums) if cumsums else np.zeros(0),
+             sources=np.array(sources, dtype=str), sample_rate=sample_rate, dtype=dtype, window_size=window_size)
+
+
+class NoiseBank(object):
+    """
+    Reader of the noise bank written by `build_noise_bank`.
+    The samples file is memory mapped, a noise window is a slice of it, and its energy comes from the precomputed
+    window statistics, so drawing a noise costs no file reading nor pass over the samples.
+
+    :param path: The path prefix of the bank files.
+    :raises IOError: If the bank files don't exist.
+    """
+    def __init__(self, path: str):
+        if not self.exists(path):
+            raise IOError("Invalid noise bank path: %s" % path)
+        with np.load(path + ".index.npz") as index:
+            self.offsets = index["offsets"]
+            self.lengths = index["lengths"]
+            self.sources: List[str] = index["sources"].tolist()
+            self.sample_rate = int(index["sample_rate"])
+            self.dtype = np.dtype(str(index["dtype"]))
+            self.window_size = int(index["window_size"])
+            self._window_offsets = index["window_offsets"]
+            self._cumsum_squares = index["cumsum_squares"]
+        total = int(self.lengths.sum())
+        self._samples = np.memmap(path + ".samples", dtype=self.dtype, mode="r", shape=(total,)) \
+            if total else np.zeros(0, dtype=self.dtype)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(path + ".samples") and os.path.isfile(path + ".index.npz")
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """The samples of the i-th recording, a read-only view into the mapped file."""
+        return self._samples[self.offsets[i]: self.offsets[i] + self.lengths[i]]
+
+    def window_rms_db(self, i: int, start: int, length: int) -> float:
+        """
+        The RMS energy in dB of samples [start, start + length) of the i-th recording.
+        It is exact if `start` and `start + length` are on the window grid, else the partial windows at the bounds
+        are counted in full.
+        """
+        first = start // self.window_size
+        last = min(-(-(start + length) // self.window_size), -(-self.lengths[i] // self.window_size))
+        cumsum = self._cumsum_squares[self._window_offsets[i]:]
+        count = min(last * self.window_size, self.lengths[i]) - first * self.window_size
+        return 10 * np.log10((cumsum[last] - cumsum[first]) / count)
+
+    def sample(self, length: int, rng: random.Random) -> Tuple[np.ndarray, float]:
+        """
+        Draw a random window of `length` samples, from a random recording long enough, starting on the window grid.
+
+        :return: The samples of the window, a read-only view into the mapped file, and its RMS energy in dB.
+        :raises RuntimeError: If no recording is long enough.
+        """
+        candidates = np.flatnonzero(self.lengths >= length)
+        if len(candidates) == 0:
+            raise RuntimeError("The duration of all noise audio is smaller than the audio segment.")
+        i = int(candidates[rng.randrange(len(candidates))])
+        start = rng.randint(0, (self.lengths[i] - length) // self.window_size) * self.window_size
+        offset = self.offsets[i] + start
+        return self._samples[offset: offset + length], self.window_rms_db(i, start, length)
@@ -1,10 +1,71 @@
 
 
+import os
+import hashlib
 import numpy as np
 import random
+import multiprocessing
 from deep_speech2.data_utils.utility import read_data
 from deep_speech2.data_utils.segments import AudioSegment
-from typing import Optional, Callable, List, Dict
+from typing import Optional, Callable, List, Dict, Any, Tuple
+
+
+class FeatureStatistics(object):
+    """
+    Running frame count, mean and sum of squared deviations of features, in float64.
+    Features are added by Welford / Chan updates, and the statistics of disjoint parts merge exactly the same way,
+    so the memory is O(n_features) however many frames are seen.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean: Optional[np.ndarray] = None  # [N_features]
+        self.m2: Optional[np.ndarray] = None  # [N_features]
+
+    def update(self, features: np.ndarray) -> None:
+        """Add the frames of the features [N_frames, N_features]."""
+        if len(features) == 0:
+            return
+        features = np.asarray(features, dtype=np.float64)
+        mean = features.mean(axis=0)
+        self._merge(len(features), mean, np.square(features - mean).sum(axis=0))
+
+    def merge(self, other: "FeatureStatistics") -> None:
+        """Add the frames of the statistics of another part."""
+        if other.count:
+            self._merge(other.count, other.mean, other.m2)
+
+    def _merge(self, count: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        if not self.count:
+            self.count, self.mean, self.m2 = count, mean.copy(), m2.copy()
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self.m2 += m2 + np.square(delta) * (self.count * count / total)
+        self.count = total
+
+    @property
+    def std(self) -> np.ndarray:
+        """The population stddev, as `np.std`."""
+        return np.sqrt(self.m2 / self.count)
+
+
+# the featurize function of each worker, pickled once per process by the initializer unless forked
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(featurize_func: Callable):
+    _worker_state["featurize_func"] = featurize_func
+
+
+def _statistics_task(task: Tuple[int, List[str]]) -> Tuple[int, FeatureStatistics]:
+    """Featurize the audio files of a chunk, return the chunk index and their statistics."""
+    i, audio_files = task
+    featurize_func = _worker_state["featurize_func"]
+    statistics = FeatureStatistics()
+    for audio_file in audio_files:
+        statistics.update(featurize_func(AudioSegment.from_file(audio_file)))  # [N_frames, N_features]
+    return i, statistics
 
 
 class FeatureNormalizer(object):
@@ -17,8 +78,19 @@ class FeatureNormalizer(object):
     :param mean_std_filepath: File containing the pre-computed mean and stddev.
     :param data_path: File of instances for computing mean and stddev.
     :param featurize_func: Function to extract features. It should be callable with `featurize_func(audio_segment)`.
-    :param num_samples: Number of random samples for computing mean and stddev.
+    :param num_samples: Number of random samples for computing mean and stddev, None for all instances.
     :param random_seed: Random seed for sampling instances.
+    :param num_processes: Number of processes featurizing the instances, the statistics of the chunks are merged
+                          in the order of the chunks, so the results are the same whatever the number of processes.
+    :param checkpoint_path: File (.npz) where the statistics of the chunks done are saved every
+                            `checkpoint_interval` chunks merged and at the end. If it exists, the computing resumes
+                            from it, the chunks done are not featurized again.
+    :param chunk_size: Number of instances of a chunk, the unit of work of the processes and of the checkpoints.
+    :param checkpoint_interval: Number of chunks merged between two writes of the checkpoint.
+    :param start_method: The start method of the worker processes, default the platform default. Unless 'fork',
+                         `featurize_func` must be picklable, e.g. a bound method or a `functools.partial`.
+    :param dtype: The dtype of the normalized features, 'float32', 'float64' or 'float16'. The mean and stddev are
+                  kept in float64, and applied in float32 unless it is 'float64'.
     :raises ValueError: When `mean_std_filepath`  is None e.g. not loading from the file,
                         `data_path` or and `featurize_func` which is necessary for computing is None.
     """
@@ -28,30 +100,95 @@ class FeatureNormalizer(object):
                  data_path: Optional[str]=None,
                  featurize_func: Optional[Callable]=None,
                  num_samples: int=500,
-                 random_seed: int=0):
+                 random_seed: int=0,
+                 dtype: str="float32",
+                 num_processes: int=1,
+                 checkpoint_path: Optional[str]=None,
+                 chunk_size: int=64,
+                 checkpoint_interval: int=16,
+                 start_method: Optional[str]=None):
+        self._dtype = np.dtype(dtype)
+        self._compute_dtype = np.float64 if self._dtype == np.float64 else np.float32
         if not mean_std_filepath:
             if not (data_path and featurize_func):
                 raise ValueError("If mean_std_filepath is None, data_path and featurize_func should not be None.")
             self._rng = random.Random(random_seed)
-            self._compute_mean_std(data_path, featurize_func, num_samples)
+            self._compute_mean_std(data_path, featurize_func, num_samples, num_processes, checkpoint_path, chunk_size,
+                                   checkpoint_interval, start_method)
         else:
             self._read_mean_std_from_file(mean_std_filepath)
 
     def apply(self, features: np.ndarray, eps: float=1e-14) -> np.ndarray:
         """Normalize features to be of zero mean and unit stddev."""
-        return (features - self._mean) / (self._std + eps)
+        mean = self._mean.astype(self._compute_dtype, copy=False)
+        std = self._std.astype(self._compute_dtype, copy=False)
+        normalized = (features.astype(self._compute_dtype, copy=False) - mean) / (std + eps)
+        return normalized.astype(self._dtype, copy=False)
 
-    def _compute_mean_std(self, data_path: str, featurize_func: Callable, num_samples: int):
-        """Compute mean and std from randomly sampled instances."""
+    def _compute_mean_std(self, data_path: str, featurize_func: Callable, num_samples: Optional[int],
+                          num_processes: int=1, checkpoint_path: Optional[str]=None, chunk_size: int=64,
+                          checkpoint_interval: int=16, start_method: Optional[str]=None):
+        """
+        Compute mean and std from randomly sampled instances, or all of them, in one streaming pass.
+        The sampled instances are split into chunks, featurized serially or by a pool of processes, and the
+        statistics of each chunk are merged, so no features are kept beyond the utterance being featurized.
+        The chunks are merged in order, the chunks done are always the first ones, and a resumed computing gives the
+        same statistics as an uninterrupted one.
+        """
+        if checkpoint_interval <= 0:
+            raise ValueError("checkpoint_interval must be positive, got %d" % checkpoint_interval)
         data: List[Dict] = read_data(data_path, data_tag="labeled_data", to_dict=True)
-        sampled_data = self._rng.sample(data, num_samples)
-        features = []
-        for instance in sampled_data:
-            feature = featurize_func(AudioSegment.from_file(instance["src"]))  # [N_frames, N_features]
-            features.append(feature)
-        features = np.vstack(features)  # [Total_frames, N_features]
-        self._mean = np.mean(features, axis=0, keepdims=True)  # [1, N_features]
-        self._std = np.std(features, axis=0, keepdims=True)  # [1, N_features]
+        sampled_data = data if num_samples is None else self._rng.sample(data, num_samples)
+        sources = [instance["src"] for instance in sampled_data]
+        chunks = [sources[i: i + chunk_size] for i in range(0, len(sources), chunk_size)]
+        # the checkpoint only resumes the computing over the same instances
+        sources_hash = hashlib.sha1("\n".join(sources).encode("utf-8")).hexdigest()
+
+        statistics = FeatureStatistics()
+        done = np.zeros(len(chunks), dtype=bool)
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            statistics, done = self._read_checkpoint(checkpoint_path, sources_hash, len(chunks))
+        tasks = [(i, chunk) for i, chunk in enumerate(chunks) if not done[i]]
+
+        def merge(results):
+            for n_merged, (i, chunk_statistics) in enumerate(results, 1):
+                statistics.merge(chunk_statistics)
+                done[i] = True
+                if checkpoint_path and (n_merged % checkpoint_interval == 0 or n_merged == len(tasks)):
+                    self._write_checkpoint(checkpoint_path, statistics, done, sources_hash)
+
+        if num_processes > 1 and len(tasks) > 1:
+            context = multiprocessing.get_context(start_method)
+            with context.Pool(min(num_processes, len(tasks)), initializer=_init_worker,
+                              initargs=(featurize_func,)) as pool:
+                merge(pool.imap(_statistics_task, tasks))
+        else:
+            _init_worker(featurize_func)
+            merge(map(_statistics_task, tasks))
+        if not statistics.count:
+            raise ValueError("No frames to compute mean and std from %s" % data_path)
+        self._mean = statistics.mean[np.newaxis, :]  # [1, N_features]
+        self._std = statistics.std[np.newaxis, :]  # [1, N_features]
+
+    @staticmethod
+    def _write_checkpoint(filepath: str, statistics: FeatureStatistics, done: np.ndarray, sources_hash: str):
+        """Write the partial statistics atomically, a checkpoint is never left half written."""
+        tmp_file = filepath + ".tmp.npz"
+        empty = np.zeros(0)
+        np.savez(tmp_file, count=statistics.count, mean=empty if statistics.mean is None else statistics.mean,
+                 m2=empty if statistics.m2 is None else statistics.m2, done=done, sources_hash=sources_hash)
+        os.replace(tmp_file, filepath)
+
+    @staticmethod
+    def _read_checkpoint(filepath: str, sources_hash: str, num_chunks: int) -> Tuple[FeatureStatistics, np.ndarray]:
+        npzfile = np.load(filepath)
+        if str(npzfile["sources_hash"]) != sources_hash or len(npzfile["done"]) != num_chunks:
+            raise ValueError("The checkpoint %s was computed over other instances or chunks." % filepath)
+        statistics = FeatureStatistics()
+        statistics.count = int(npzfile["count"])
+        if statistics.count:
+            statistics.mean, statistics.m2 = npzfile["mean"], npzfile["m2"]
+        return statistics, npzfile["done"]
 
     def write_to_file(self, filepath: str):
         """Write the mean and std to the file"""
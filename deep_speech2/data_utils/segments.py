@@ -2,12 +2,61 @@
 """Contains the several segment class"""
 
 import numpy as np
-import resampy
 import random
 import copy
+import functools
+from math import gcd
 from scipy.io import wavfile
 from scipy import signal
-from typing import Optional
+from typing import List, Optional, Tuple
+
+# the half length in zero crossings, the cutoff rolloff and the kaiser beta of the resampling filter of each quality,
+# the ones of resampy's `kaiser_best` and `kaiser_fast` filters
+_RESAMPLE_QUALITIES = {"best": (64, 0.9475937167399596, 14.769656459379492),
+                       "fast": (16, 0.85, 8.555504641634386)}
+_RESAMPLE_FILTER_ALIAS = {"kaiser_best": "best", "kaiser_fast": "fast"}
+
+
+def _read_wav(file, mmap: bool=False):
+    """
+    Read the sample rate and samples of a wav file.
+    If `mmap`, the data chunk is memory-mapped copy-on-write instead of read, unless its bit depth can't be mapped,
+    e.g. 24-bit, or the file is not a real one.
+    """
+    if mmap:
+        try:
+            return wavfile.read(file, mmap=True)
+        except ValueError:
+            if hasattr(file, "seek"):
+                file.seek(0)
+    return wavfile.read(file)
+
+
+@functools.lru_cache(maxsize=64)
+def _resample_kernel(source_rate: int, target_rate: int, quality: str) -> Tuple[int, int, np.ndarray]:
+    """
+    Design the polyphase low-pass filter of resampling from `source_rate` to `target_rate`, cached by the rates and
+    quality, so each rate pair of the data pipeline is designed once per process.
+
+    :return: The (up, down) factors of the reduced rate ratio, and the float32 filter taps.
+    """
+    if quality not in _RESAMPLE_QUALITIES:
+        raise ValueError("Unknown resampling quality (%s), possible choices are %s"
+                         % (quality, list(_RESAMPLE_QUALITIES)))
+    divisor = gcd(source_rate, target_rate)
+    up, down = target_rate // divisor, source_rate // divisor
+    zero_crossings, rolloff, beta = _RESAMPLE_QUALITIES[quality]
+    max_rate = max(up, down)
+    taps = signal.firwin(2 * zero_crossings * max_rate + 1, rolloff / max_rate, window=("kaiser", beta))
+    return up, down, taps.astype(np.float32)
+
+
+def _resample_poly(samples: np.ndarray, source_rate: int, target_rate: int, quality: str) -> np.ndarray:
+    """Resample float32 samples by the cached polyphase filter, the output is float32 as well."""
+    up, down, taps = _resample_kernel(source_rate, target_rate, _RESAMPLE_FILTER_ALIAS.get(quality, quality))
+    if up == down:
+        return samples
+    return signal.resample_poly(samples.astype(np.float32, copy=False), up, down, window=taps)
 
 
 class AudioSegment(object):
@@ -19,13 +68,36 @@ class AudioSegment(object):
     :raises TypeError: If the sample data type is not float or int.
     """
     def __init__(self, samples: np.ndarray, sample_rate: int):
-        self.samples: np.ndarray = self._convert_samples_to_float32(samples)
-        if self.samples.ndim > 1:
-            self.samples = np.mean(self.samples, axis=1)
+        if isinstance(samples, np.memmap):
+            # backed by the file, converted on the first access of the samples
+            self._samples, self._raw_samples = None, samples
+        else:
+            self.samples = self._convert_samples_to_mono_float32(samples)
         self.sample_rate = sample_rate
         self.num_samples: int = len(samples)
         self.duration: float = self.num_samples / sample_rate
 
+    @property
+    def samples(self) -> np.ndarray:
+        """
+        :return: Return the float32 samples, the memory-mapped ones are read and converted here once.
+        """
+        if self._samples is None:
+            self._samples = self._convert_samples_to_mono_float32(self._raw_samples)
+            self._raw_samples = None
+        return self._samples
+
+    @samples.setter
+    def samples(self, samples: np.ndarray):
+        self._samples, self._raw_samples = samples, None
+
+    @property
+    def is_mapped(self) -> bool:
+        """
+        :return: Whether the samples are still memory-mapped from the file, not read yet.
+        """
+        return self._samples is None
+
     @property
     def rms_db(self) -> float:
         """
@@ -56,21 +128,23 @@ class AudioSegment(object):
                (type(self), self.num_samples, self.sample_rate, self.duration, self.rms_db)
 
     @classmethod
-    def from_file(cls, file: str) -> "AudioSegment":
+    def from_file(cls, file: str, mmap: bool=False) -> "AudioSegment":
         """
         Create audio segment from audio file.
         :param file: Filepath to audio file.
+        :param mmap: Whether to memory-map the data chunk of the file instead of reading it. The samples are read and
+                     converted to float32 when first used, and only the range left by `subsegment` is read.
         :return: Audio segment instance.
         :rtype: AudioSegment
         """
-
-        sample_rate, samples = wavfile.read(file)
+        sample_rate, samples = _read_wav(file, mmap=mmap)
         return cls(samples, sample_rate)
 
     @classmethod
     def from_slice_file(cls, file, start: Optional[float]=None, end: Optional[float]=None) -> "AudioSegment":
         """
         Loads a small section of an audio without having to load the entire file.
+        The data chunk of the file is memory-mapped, only the bytes of the section are read and converted.
         :param file: Input audio filepath or file object.
         :param start: Start time in seconds. If start is negative, it wraps around from the end.
                       If not provided, this function reads from the very beginning.
@@ -80,10 +154,10 @@ class AudioSegment(object):
         :rtype: AudioSegment
         :raises ValueError: If the start and end is invalid to slice from file.
         """
-        sample_rate, samples = wavfile.read(file)
+        sample_rate, samples = _read_wav(file, mmap=True)
         duration = float(len(samples) / sample_rate)
         start = 0. if start is None else start
-        end = 0. if end is None else end
+        end = duration if end is None else end
         if start < 0.:
             start += duration
         if end < 0.:
@@ -99,7 +173,7 @@ class AudioSegment(object):
 
         start_frame = int(start * sample_rate)
         end_frame = int(end * sample_rate)
-        data = samples[start_frame: end_frame]
+        data = np.asarray(samples[start_frame: end_frame])  # reads the section from the mapping
         return cls(data, sample_rate)
 
     @classmethod
@@ -133,7 +207,7 @@ class AudioSegment(object):
         :return: Silent AudioSegment instance of the given duration.
         :rtype: AudioSegment
         """
-        samples = np.zeros(int(duration * sample_rate))
+        samples = np.zeros(int(duration * sample_rate), dtype=np.float32)
         return cls(samples, sample_rate)
 
     def to_wav_file(self, filepath: str, dtype: str="float32") -> None:
@@ -153,16 +227,24 @@ class AudioSegment(object):
         Audio sample type is usually integer or float-point.
         Integers will be scaled to [-1, 1] in float32.
         """
-        float32_samples = samples.astype("float32")
-        if samples.dtype in np.sctypes["int"]:
+        float32_samples = np.array(samples, dtype="float32")
+        if np.issubdtype(samples.dtype, np.signedinteger):
             bits = np.iinfo(samples.dtype).bits
             float32_samples /= 2**(bits - 1)
-        elif samples.dtype in np.sctypes["float"]:
+        elif np.issubdtype(samples.dtype, np.floating):
             pass
         else:
             raise TypeError("Unsupported sample type: %s" % samples.dtype)
         return float32_samples
 
+    @classmethod
+    def _convert_samples_to_mono_float32(cls, samples: np.ndarray) -> np.ndarray:
+        """Convert sample type to float32, and average the channels if more than one."""
+        float32_samples = cls._convert_samples_to_float32(samples)
+        if float32_samples.ndim > 1:
+            float32_samples = np.mean(float32_samples, axis=1)
+        return float32_samples
+
     @staticmethod
     def _convert_samples_from_float32(samples: np.ndarray, dtype: str) -> np.ndarray:
         """
@@ -173,12 +255,12 @@ class AudioSegment(object):
         """
         dtype = np.dtype(dtype)
         output_samples = samples.copy()
-        if dtype in np.sctypes["int"]:
+        if np.issubdtype(dtype, np.signedinteger):
             bits = np.iinfo(dtype).bits
             output_samples *= (2**(bits - 1))
             min_val = np.iinfo(dtype).min
             max_val = np.iinfo(dtype).max
-        elif dtype in np.sctypes["float"]:
+        elif np.issubdtype(dtype, np.floating):
             min_val = np.finfo(dtype).min
             max_val = np.finfo(dtype).max
         else:
@@ -223,9 +305,9 @@ class AudioSegment(object):
         """
         self.samples *= 10.**(gain / 20.)
 
-    def change_speed(self, speed_rate: float) -> None:
+    def change_speed(self, speed_rate: float, rate_step: Optional[float]=0.01, quality: str="fast") -> None:
         """
-        Change the audio speed by linear interpolation.
+        Change the audio speed by polyphase resampling.
         Note that this is an in-place transformation.
 
         :param speed_rate: Rate of speed change:
@@ -234,15 +316,23 @@ class AudioSegment(object):
                            speed_rate < 1.0, slow down the audio;
                            speed_rate <= 0.0, not allowed, raise ValueError.
         :type speed_rate: float
+        :param rate_step: The speed rate is rounded to a multiple of it, so the filter of each rate on the grid is
+                          designed once. If None, the exact rate is applied by linear interpolation instead.
+        :param quality: The resampling filter quality, one of {'best', 'fast'}.
         :raises ValueError: If speed_rate <= 0.0.
         """
         if speed_rate <= 0:
             raise ValueError("speed rate should be greater than zero.")
-        old_length = len(self.samples)
-        new_length = int(old_length / speed_rate)
-        old_indices = np.arange(old_length)
-        new_indices = np.linspace(start=0, stop=old_length, num=new_length)
-        self.samples = np.interp(x=new_indices, xp=old_indices, fp=self.samples)
+        if rate_step is None:
+            old_length = len(self.samples)
+            new_length = int(old_length / speed_rate)
+            old_indices = np.arange(old_length, dtype=np.float32)
+            new_indices = np.linspace(start=0, stop=old_length, num=new_length, dtype=np.float32)
+            self.samples = np.interp(x=new_indices, xp=old_indices, fp=self.samples).astype(np.float32)
+            return
+        # speeding up by `speed_rate` is resampling from `speed_rate * grid` to `grid`
+        grid = int(round(1. / rate_step))
+        self.samples = _resample_poly(self.samples, max(int(round(speed_rate * grid)), 1), grid, quality)
 
     def normalize(self, target_db: float = -20., max_gain_db: float = 300.) -> None:
         """
@@ -290,13 +380,14 @@ class AudioSegment(object):
 
     def resample(self, target_sample_rate: int, filter: str="kaiser_best") -> None:
         """
-        Resample the audio to a target sample rate.
+        Resample the audio to a target sample rate, by the polyphase filter cached for the two rates.
         Note that this is an in-place transformation.
 
         :param target_sample_rate: Target sample rate.
-        :param filter: The resampling filter to use one of {'kaiser_best', 'kaiser_fast'}.
+        :param filter: The resampling filter quality, one of {'best', 'fast'},
+                       or their former names {'kaiser_best', 'kaiser_fast'}.
         """
-        self.samples = resampy.resample(self.samples, sr_orig=self.sample_rate, sr_new=target_sample_rate, filter=filter)
+        self.samples = _resample_poly(self.samples, self.sample_rate, target_sample_rate, filter)
         self.sample_rate = target_sample_rate
 
     def pad_silence(self, duration: float, sides: str="both") -> None:
@@ -322,7 +413,7 @@ class AudioSegment(object):
                 padded = cls.concatenate(silence, self, silence)
             else:
                 raise ValueError("Unknown value for the sides %s" % sides)
-            self.samples = padded
+            self.samples = padded.samples
 
     def shift(self, shift_ms: float) -> None:
         """
@@ -374,7 +465,10 @@ class AudioSegment(object):
 
         start_sample = int(round(start_sec * self.sample_rate))
         end_sample = int(round(end_sec * self.sample_rate))
-        self.samples = self.samples[start_sample: end_sample]
+        if self.is_mapped:
+            self._raw_samples = self._raw_samples[start_sample: end_sample]
+        else:
+            self.samples = self.samples[start_sample: end_sample]
 
     def random_subsegment(self, subsegment_length: float, rng: Optional[random.Random]=None) -> None:
         """
@@ -425,7 +519,8 @@ class AudioSegment(object):
         self.normalize(target_db)
 
     def add_noise(self, noise: "AudioSegment", snr_dB: float, allow_downsampling: bool=False,
-                  max_gain_db: float=300., rng: Optional[random.Random]=None) -> None:
+                  max_gain_db: float=300., rng: Optional[random.Random]=None,
+                  noise_rms_db: Optional[float]=None) -> None:
         """
         Add the given noise segment at a specific signal-to-noise ratio.
         If the noise segment is longer than this segment, a random subsegment of matching length is sampled from it
@@ -439,6 +534,8 @@ class AudioSegment(object):
         :param max_gain_db: Maximum amount of gain to apply to noise signal before adding it in.
                             This is to prevent attempting to apply infinite gain to a zero signal.
         :param rng: Random number generator state.
+        :param noise_rms_db: The RMS energy of the noise in dB if known, e.g. precomputed by a `NoiseBank`,
+                             else it is computed from the noise samples.
         :raises ValueError: If the sample rate does not match between noise and base signal and downsampling is not allowed,
                             or if the duration of noise segments is shorter than original audio segments.
         """
@@ -457,11 +554,13 @@ class AudioSegment(object):
             raise ValueError("Noise signal (%d sec) must be not shorter than base siganl (%d sec)" %
                              (noise.duration, self.duration))
 
-        noise_gain_db = min(self.rms_db - noise.rms_db - snr_dB, max_gain_db)
+        noise_rms_db = noise.rms_db if noise_rms_db is None else noise_rms_db
+        noise_gain_db = min(self.rms_db - noise_rms_db - snr_dB, max_gain_db)
         noise_new = copy.deepcopy(noise)
         noise_new.random_subsegment(self.duration, rng=rng)
         noise_new.gain_db(noise_gain_db)
-        self.superimpose(noise_new)
+        # added by samples, `superimpose` refuses the audio segment noise if this is a speech segment
+        self.samples += noise_new.samples
 
 
 class SpeechSegment(AudioSegment):
@@ -555,3 +654,309 @@ class SpeechSegment(AudioSegment):
         """
         audio = AudioSegment.make_silence(duration, sample_rate)
         return cls.from_audio(audio, transcript="")
+
+
+class AudioBatch(object):
+    """
+    Batch of monaural audio sharing a sample rate, each audio is a row of one zero padded float32 buffer.
+    The transformations apply to all the rows at once in place, with per-row parameters, and keep the padding zero.
+
+    :param samples: Zero padded audio samples [batch_size x max_len].
+    :param lengths: Number of samples of each row.
+    :param sample_rate: Audio sample rate.
+    :raises ValueError: If the lengths don't match the samples.
+    """
+    def __init__(self, samples: np.ndarray, lengths: np.ndarray, sample_rate: int):
+        samples = np.asarray(samples, dtype=np.float32)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if samples.ndim != 2 or lengths.shape != (len(samples),):
+            raise ValueError("The samples should be [batch_size x max_len] with one length per row, got %s and %s"
+                             % (samples.shape, lengths.shape))
+        if np.any(lengths < 0) or np.any(lengths > samples.shape[1]):
+            raise ValueError("The lengths should be in [0, %d]" % samples.shape[1])
+        self.samples = samples
+        self.lengths = lengths
+        self.sample_rate = sample_rate
+        self.samples[~self.mask] = 0.
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __str__(self):
+        """Return readable representation of object"""
+        return "%s: batch_size=%d, max_len=%d, sample_rate=%d" % (type(self), len(self), self.max_len, self.sample_rate)
+
+    @property
+    def max_len(self) -> int:
+        """
+        :return: Return the number of samples the buffer holds per row.
+        """
+        return self.samples.shape[1]
+
+    @property
+    def durations(self) -> np.ndarray:
+        """
+        :return: Return the duration of each row in seconds.
+        """
+        return self.lengths / self.sample_rate
+
+    @property
+    def mask(self) -> np.ndarray:
+        """
+        :return: Return whether each sample of the buffer belongs to its row, [batch_size x max_len].
+        """
+        return np.arange(self.max_len)[None, :] < self.lengths[:, None]
+
+    @property
+    def rms_db(self) -> np.ndarray:
+        """
+        :return: Return root mean square energy of each row in dB, NaN for the empty rows as for an empty segment.
+        """
+        empty = self.lengths == 0
+        mean_square = np.einsum("ij,ij->i", self.samples, self.samples) / np.maximum(self.lengths, 1)
+        mean_square[empty] = 1.
+        rms_db = 10 * np.log10(mean_square)
+        rms_db[empty] = np.nan
+        return rms_db
+
+    @classmethod
+    def from_segments(cls, segments: List[AudioSegment], max_len: int=0) -> "AudioBatch":
+        """
+        Create audio batch from audio segments.
+
+        :param segments: Audio segments of the same sample rate.
+        :param max_len: The buffer is made at least this long, to leave room for lengthening transformations.
+        :return: Audio batch instance.
+        :raises ValueError: If the number of segments is zero, or if the sample_rate of any segments does not match.
+        """
+        if not segments:
+            raise ValueError("No audio segments are given.")
+        sample_rate = segments[0].sample_rate
+        if any(seg.sample_rate != sample_rate for seg in segments):
+            raise ValueError("Can't batch segments with different sample rate.")
+        lengths = np.array([len(seg.samples) for seg in segments], dtype=np.int64)
+        samples = np.zeros((len(segments), max(max_len, lengths.max())), dtype=np.float32)
+        for row, seg in zip(samples, segments):
+            row[:len(seg.samples)] = seg.samples
+        return cls(samples, lengths, sample_rate)
+
+    def get_segment(self, index: int) -> AudioSegment:
+        """Return a copy of a row as audio segment."""
+        return AudioSegment(self.samples[index, :self.lengths[index]], self.sample_rate)
+
+    def set_segment(self, index: int, segment: AudioSegment) -> None:
+        """
+        Replace a row by the samples of an audio segment, the buffer is lengthened if needed.
+
+        :raises ValueError: If the sample rate of the segment doesn't match the batch.
+        """
+        if segment.sample_rate != self.sample_rate:
+            raise ValueError("Segment's rate (%d Hz) doesn't match the batch's rate (%d Hz)."
+                             % (segment.sample_rate, self.sample_rate))
+        length = len(segment.samples)
+        self._reserve(length)
+        self.samples[index, :length] = segment.samples
+        self.samples[index, length:] = 0.
+        self.lengths[index] = length
+
+    def to_segments(self) -> List[AudioSegment]:
+        """Return a copy of each row as audio segment."""
+        return [self.get_segment(i) for i in range(len(self))]
+
+    def _reserve(self, max_len: int) -> None:
+        """Lengthen the buffer to hold at least `max_len` samples per row."""
+        if max_len > self.max_len:
+            samples = np.zeros((len(self), max_len), dtype=np.float32)
+            samples[:, :self.max_len] = self.samples
+            self.samples = samples
+
+    def _per_row(self, values, dtype=np.float64) -> np.ndarray:
+        return np.broadcast_to(np.asarray(values, dtype=dtype), (len(self),))
+
+    def _move(self, offsets: np.ndarray) -> None:
+        """Move each row so that sample j gets sample j + offset of the row, filling the out of row ones with zero."""
+        # a copy within each row costs less than gathering the whole buffer
+        for i in np.flatnonzero(offsets).tolist():
+            offset, length, row = int(offsets[i]), int(self.lengths[i]), self.samples[i]
+            if offset > 0:
+                row[:length - offset] = row[offset:length]
+                row[length - offset:length] = 0.
+            else:
+                row[-offset:length] = row[:length + offset]
+                row[:-offset] = 0.
+
+    def gain_db(self, gain) -> None:
+        """
+        Apply gain in decibels to samples of each row.
+        Note that this is an in-place transformation.
+
+        :param gain: Gain in decibels to apply, a scalar or one per row.
+        """
+        self.samples *= (10. ** (self._per_row(gain) / 20.)).astype(np.float32)[:, None]
+
+    def normalize(self, target_db=-20., max_gain_db: float=300.) -> None:
+        """
+        Normalize each row to be of the desired RMS value in decibels.
+        Note that this is an in-place transformation.
+
+        :param target_db: Target RMS value in decibels, a scalar or one per row.
+        :param max_gain_db: Max amount of gain in dB that can be applied for normalization.
+        :raises ValueError: If the required gain to normalize any row to the target_db value exceeds max_gain_db.
+        """
+        # the empty rows have nothing to normalize
+        gain = np.where(self.lengths == 0, 0., self._per_row(target_db) - self.rms_db)
+        if np.any(gain > max_gain_db):
+            raise ValueError("Unable to normalize rows %s because the probable gain exceeds max_gain_db(%f dB)"
+                             % (np.flatnonzero(gain > max_gain_db).tolist(), max_gain_db))
+        self.gain_db(gain)
+
+    def shift(self, shift_ms) -> None:
+        """
+        Shift each row in time, silence are padded to keep the durations unchanged.
+        Note that this is an in-place transformation.
+
+        :param shift_ms: Shift time in milliseconds, a scalar or one per row.
+                         If positive, shift with time advance;
+                         If negative, shift with time delay.
+        :raises ValueError: If shift_ms is longer than the duration of the row.
+        """
+        shift_ms = self._per_row(shift_ms)
+        if np.any(np.abs(shift_ms) / 1000. > self.durations):
+            raise ValueError("Abs value of shift_ms should be smaller than audio duration.")
+        self._move((shift_ms * self.sample_rate / 1000).astype(np.int64))
+
+    def pad_silence(self, duration, sides: str="both") -> None:
+        """
+        Pad each row with a period of silence, the buffer is lengthened if needed.
+        Note that this is an in-place transformation.
+
+        :param duration: Length of silence in seconds to pad, a scalar or one per row.
+        :param sides: Position for padding:
+                     'beginning' - adds silence in the beginning;
+                     'end' - adds silence in the end;
+                     'both' - adds silence in both the beginning and the end.
+        :raises ValueError: If sides is not supported.
+        """
+        if sides not in ("beginning", "end", "both"):
+            raise ValueError("Unknown value for the sides %s" % sides)
+        pad = np.maximum(self._per_row(duration) * self.sample_rate, 0).astype(np.int64)
+        lengths = self.lengths + (2 * pad if sides == "both" else pad)
+        self._reserve(int(lengths.max()))
+        if sides != "end":
+            self.lengths = self.lengths + pad  # the rows move behind the leading silence
+            self._move(-pad)
+        self.lengths = lengths
+
+    def add_noise(self, noise: "AudioBatch", snr_dB, max_gain_db: float=300.,
+                  rows: Optional[np.ndarray]=None, rng: Optional[random.Random]=None,
+                  noise_rms_db: Optional[np.ndarray]=None) -> None:
+        """
+        Add a noise to each row at a specific signal-to-noise ratio. If a noise is longer than its row, a random
+        window of matching length is used instead.
+        Note that this is an in-place transformation.
+
+        :param noise: The noises, one per row of `rows`.
+        :param snr_dB: Signal-to-Noise Ratio, in dB, a scalar or one per row of `rows`.
+        :param max_gain_db: Maximum amount of gain to apply to noise signal before adding it in.
+        :param rows: The rows to add noise to, default all of them.
+        :param rng: Random number generator state.
+        :param noise_rms_db: The RMS energy of each noise in dB if known, else it is computed from the noises.
+        :raises ValueError: If the sample rate does not match between noise and this batch,
+                            or if any noise is shorter than its row.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        if len(noise) != len(rows):
+            raise ValueError("Got %d noises for %d rows." % (len(noise), len(rows)))
+        if noise.sample_rate != self.sample_rate:
+            raise ValueError("Noise sample rate (%d Hz) doesn't match base signal's rate (%d Hz)" %
+                             (noise.sample_rate, self.sample_rate))
+        lengths = self.lengths[rows]
+        if np.any(noise.lengths < lengths):
+            raise ValueError("Noise signals must be not shorter than base signals.")
+
+        rng = random.Random() if rng is None else rng
+        noise_rms_db = noise.rms_db if noise_rms_db is None else noise_rms_db
+        noise_gain = 10. ** (np.minimum(self.rms_db[rows] - noise_rms_db - snr_dB, max_gain_db) / 20.)
+        noise_gain[lengths == 0] = 0.  # no noise is added to the empty rows
+        for j, (i, length) in enumerate(zip(rows.tolist(), lengths.tolist())):
+            offset = int(rng.uniform(0., noise.lengths[j] - length))
+            self.samples[i, :length] += noise.samples[j, offset:offset + length] * np.float32(noise_gain[j])
+
+
+class OnlineBayesianNormalizer(object):
+    """
+    Streaming version of `AudioSegment.normalize_online_bayesian`, for audio arriving in chunks.
+    The running sum of squares and sample count are carried between the chunks, so each call costs O(chunk), and the
+    concatenated outputs are exactly the samples the batch method gives for the concatenated chunks.
+    If `startup_delay` is given, the samples of the first `startup_delay` seconds are held back until the statistics
+    over them are accrued, as the batch method normalizes them by these.
+
+    :param sample_rate: Audio sample rate.
+    :param target_db: Target RMS value in dB.
+    :param prior_db: Prior RMS estimate in dB.
+    :param prior_samples: Prior strength in number of samples.
+    :param startup_delay: Default 0.0s. If provided, this function will accrue statistics for the first startup_delay
+                          seconds before applying online normalization.
+    """
+    def __init__(self, sample_rate: int, target_db: float, prior_db: float, prior_samples: float,
+                 startup_delay: float=0.0):
+        self._target_db = target_db
+        self._prior_samples = prior_samples
+        self._prior_sum_of_squares = 10.**(prior_db / 10.) * prior_samples
+        self._startup_sample_idx = int(sample_rate * startup_delay)
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new audio."""
+        self._sum_of_squares = np.zeros(1, dtype=np.float32)
+        self._num_samples = 0
+        self._pending: List[np.ndarray] = []
+        self._num_pending = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        Normalize the next chunk of float32 samples.
+
+        :return: The normalized samples, of the chunk and the held back ones if the startup delay is over,
+                 empty if still in the startup delay.
+        """
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if self._num_samples > 0 or self._startup_sample_idx == 0:
+            return self._normalize(chunk, 0)
+        self._pending.append(chunk)
+        self._num_pending += len(chunk)
+        if self._num_pending <= self._startup_sample_idx:
+            return np.zeros(0, dtype=np.float32)
+        return self._flush_pending(self._startup_sample_idx)
+
+    def flush(self) -> np.ndarray:
+        """
+        End the audio, the samples held back in the startup delay are normalized by the statistics over them all.
+
+        :return: The normalized samples held back, empty if none.
+        """
+        samples = self._flush_pending(self._num_pending - 1) if self._num_pending else np.zeros(0, dtype=np.float32)
+        self.reset()
+        return samples
+
+    def _flush_pending(self, startup_sample_idx: int) -> np.ndarray:
+        samples = np.concatenate(self._pending)
+        self._pending, self._num_pending = [], 0
+        return self._normalize(samples, startup_sample_idx)
+
+    def _normalize(self, samples: np.ndarray, startup_sample_idx: int) -> np.ndarray:
+        # accumulated from the carried sum, in the order and precision of the batch cumsum
+        cumsum_of_squares = np.cumsum(np.concatenate([self._sum_of_squares, samples ** 2]))[1:]
+        sample_count = np.arange(self._num_samples, self._num_samples + len(samples)) + 1
+        if len(samples):
+            self._sum_of_squares = cumsum_of_squares[-1:].copy()
+        self._num_samples += len(samples)
+        if startup_sample_idx > 0:
+            cumsum_of_squares[:startup_sample_idx] = cumsum_of_squares[startup_sample_idx]
+            sample_count[:startup_sample_idx] = sample_count[startup_sample_idx]
+        mean_squared_estimate = (cumsum_of_squares + self._prior_sum_of_squares) / (sample_count + self._prior_samples)
+        rms_estimate_db = 10 * np.log10(mean_squared_estimate)
+        gain = self._target_db - rms_estimate_db
+        normalized = samples.copy()
+        normalized *= 10.**(gain / 20.)
+        return normalized
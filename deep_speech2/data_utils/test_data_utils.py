@@ -0,0 +1,557 @@
+"""Test data utils."""
+import os
+import json
+import random
+import pickle
+import tempfile
+import tracemalloc
+import unittest
+import warnings
+import importlib.util
+import numpy as np
+import python_speech_features as psf
+from scipy import fft, signal
+from deep_speech2.data_utils.segments import AudioSegment, AudioBatch, OnlineBayesianNormalizer
+from deep_speech2.data_utils.augmentor import AugmentationPipeline, AugmentationPool, ImpulseResponseAugmentor, \
+    FrequencyMaskAugmentor, TimeMaskAugmentor, TimeWarpAugmentor, _overlap_add
+from deep_speech2.data_utils.noise_bank import NoiseBank, build_noise_bank
+from deep_speech2.data_utils.featurizer import mfcc
+from deep_speech2.data_utils.featurizer.audio_featurizer import AudioFeaturizer, StreamingAudioFeaturizer
+from deep_speech2.data_utils.normalizer import FeatureNormalizer
+from utils import stft, benchmark_stft
+from utils.feature_store import FeatureStore
+
+
+def _make_segment(duration: float=5., sample_rate: int=16000, seed: int=0) -> AudioSegment:
+    """Noisy chirp, the spectrogram has both loud and near silent bins."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    samples = 0.3 * np.sin(2 * np.pi * (200 + 300 * t) * t) + 0.01 * rng.standard_normal(len(t))
+    return AudioSegment(samples.astype(np.float32), sample_rate)
+
+
+def _peak_memory(func):
+    """Return the result and the peak memory in bytes of a call."""
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak
+
+
+class TestDataUtils(unittest.TestCase):
+    def test_float32_policy(self):
+        segment = _make_segment()
+        self.assertEqual(AudioSegment.make_silence(1., 16000).samples.dtype, np.float32)
+        speed = _make_segment()
+        speed.change_speed(1.05)
+        self.assertEqual(speed.samples.dtype, np.float32)
+
+        featurizers = {dtype: AudioFeaturizer(dtype=dtype, use_dB_normalization=False)
+                       for dtype in ["float64", "float32", "float16"]}
+        measures = {dtype: _peak_memory(lambda: featurizer.featurize(segment))
+                    for dtype, featurizer in featurizers.items()}
+        reference, reference_peak = measures["float64"]
+        specgram, peak = measures["float32"]
+        self.assertEqual(reference.dtype, np.float64)
+        self.assertEqual(specgram.dtype, np.float32)
+        self.assertEqual(measures["float16"][0].dtype, np.float16)
+        self.assertEqual(specgram.shape, reference.shape)
+        # log spectra, the float32 rounding only shows in the near silent bins
+        loud = reference > np.percentile(reference, 10)
+        np.testing.assert_allclose(specgram[loud], reference[loud], atol=1e-3)
+        np.testing.assert_allclose(measures["float16"][0][loud], reference[loud], atol=2e-2)
+        self.assertLess(peak, 0.6 * reference_peak)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mean_std_file = os.path.join(tmp_dir, "mean_std.npz")
+            mean, std = reference.mean(axis=0, keepdims=True), reference.std(axis=0, keepdims=True)
+            np.savez(mean_std_file, mean=mean, std=std)
+            normalized = FeatureNormalizer(mean_std_file, dtype="float32").apply(specgram)
+        self.assertEqual(normalized.dtype, np.float32)
+        np.testing.assert_allclose(normalized[loud], ((reference - mean) / (std + 1e-14))[loud], atol=1e-3)
+
+    def test_featurize_batch(self):
+        durations = [0.03, 1., 2.5, 0.7, 9.]  # a batch larger than a block, with a two-window utterance
+        for kwargs in [{}, {"max_freq": 4000}, {"dtype": "float64"}]:
+            featurizer = AudioFeaturizer(**kwargs)
+            expected = [featurizer.featurize(_make_segment(d, seed=i)) for i, d in enumerate(durations)]
+            features = featurizer.featurize_batch([_make_segment(d, seed=i) for i, d in enumerate(durations)])
+            self.assertEqual(len(features), len(durations))
+            for feature, expected_feature in zip(features, expected):
+                self.assertEqual(feature.dtype, expected_feature.dtype)
+                np.testing.assert_allclose(feature, expected_feature, rtol=1e-6, atol=1e-6)
+        self.assertEqual(AudioFeaturizer().featurize_batch([]), [])
+
+    def test_mfcc(self):
+        self.assertIs(mfcc.mel_filterbank(16000, 512, 26), mfcc.mel_filterbank(16000, 512, 26))
+        self.assertIs(mfcc.dct_matrix(26, 13, 22), mfcc.dct_matrix(26, 13, 22))
+        samples = [_make_segment(d, sample_rate, seed=i).samples
+                   for i, (d, sample_rate) in enumerate([(0.01, 16000), (1.3, 16000), (2., 8000), (4., 16000)])]
+        for x in samples[1:]:
+            sample_rate = 8000 if len(x) == 16000 else 16000
+            for kwargs in [{}, {"fmax": 3000}]:
+                np.testing.assert_array_equal(
+                    mfcc.mel_filterbank(sample_rate, 512, 26, kwargs.get("fmax")),
+                    psf.get_filterbanks(26, 512, sample_rate, 0, kwargs.get("fmax")))
+                expected = psf.mfcc(x, sample_rate, 0.02, 0.01, highfreq=kwargs.get("fmax"))
+                first = psf.delta(expected, 2)
+                expected = np.concatenate([expected, first, psf.delta(first, 2)], axis=1)
+                np.testing.assert_allclose(mfcc.mfcc(x, sample_rate, 20, 10, num_deltas=2, **kwargs), expected,
+                                           rtol=1e-9, atol=1e-9)
+                np.testing.assert_allclose(mfcc.mfcc(x, sample_rate, 20, 10, num_deltas=2, dtype="float32", **kwargs),
+                                           expected, atol=1e-4 * np.abs(expected).max())
+                np.testing.assert_allclose(mfcc.log_fbank(x, sample_rate, 20, 10, **kwargs),
+                                           psf.logfbank(x, sample_rate, 0.02, 0.01, highfreq=kwargs.get("fmax")),
+                                           rtol=1e-9, atol=1e-9)
+
+        # a batch gives the features of each utterance, the ones shorter than a window too
+        batch = mfcc.mfcc(samples[:2] + samples[3:], 16000, num_deltas=1)
+        for feature, x in zip(batch, samples[:2] + samples[3:]):
+            np.testing.assert_allclose(feature, mfcc.mfcc(x, 16000, num_deltas=1), rtol=1e-12, atol=1e-12)
+        features = AudioFeaturizer(specgram_type="mfcc").featurize_batch([_make_segment(d) for d in [1., 2.5]])
+        self.assertEqual([f.shape for f in features], [(99, 39), (249, 39)])
+
+    def test_streaming_featurizer(self):
+        samples = _make_segment(3.).samples
+        rng = np.random.RandomState(0)
+        chunks = np.split(samples, np.sort(rng.randint(0, len(samples), 50)))  # empty and sub-window chunks too
+        for kwargs in [{}, {"max_freq": 4000}, {"dtype": "float64"}]:
+            expected = AudioFeaturizer(use_dB_normalization=False, **kwargs).featurize(_make_segment(3.))
+            featurizer = StreamingAudioFeaturizer(**kwargs)
+            for _ in range(2):  # a new audio after reset
+                features = [featurizer.process(chunk) for chunk in chunks]
+                self.assertTrue(all(f.dtype == expected.dtype for f in features))
+                np.testing.assert_array_equal(np.concatenate(features), expected)
+                featurizer.reset()
+
+        # each frame normalized by the statistics of the frames up to it
+        normalized = StreamingAudioFeaturizer(normalize=True, dtype="float64").process(samples)
+        expected = AudioFeaturizer(use_dB_normalization=False, dtype="float64").featurize(_make_segment(3.))
+        for t in [1, 10, len(expected) - 1]:
+            np.testing.assert_allclose(
+                normalized[t], (expected[t] - expected[:t + 1].mean(axis=0)) / (expected[:t + 1].std(axis=0) + 1e-14),
+                rtol=1e-8, atol=1e-8)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mean_std_file = os.path.join(tmp_dir, "mean_std.npz")
+            np.savez(mean_std_file, mean=expected.mean(axis=0, keepdims=True), std=expected.std(axis=0, keepdims=True))
+            featurizer = StreamingAudioFeaturizer(normalize=True, mean_std_filepath=mean_std_file, prior_frames=1e9,
+                                                  dtype="float64")
+            features = np.concatenate([featurizer.process(chunk) for chunk in chunks])
+        np.testing.assert_allclose(features, (expected - expected.mean(axis=0)) / (expected.std(axis=0) + 1e-14),
+                                   atol=1e-5)
+
+    def test_stft(self):
+        samples = _make_segment(1.).samples.astype(np.float64)
+        int16 = (samples * 32767).astype(np.int16)
+        # every pipeline on the kernel against its former implementation
+        for pipeline, (legacy, current) in benchmark_stft.make_cases(samples, 16000).items():
+            expected, features = legacy(), current()
+            self.assertEqual(features.shape, expected.shape)
+            self.assertEqual(features.dtype, expected.dtype)
+            np.testing.assert_allclose(features, expected, rtol=1e-5 if pipeline == "deep_speech2" else 1e-10,
+                                       err_msg=pipeline)
+        # the frames of a non integral stride start at int(i * stride), as the audier ones of 22050 Hz
+        np.testing.assert_allclose(benchmark_stft.audier(int16, 22050), benchmark_stft.legacy_audier(int16, 22050),
+                                   rtol=1e-10)
+        frames = stft.frame(np.arange(1000), 400, 220.5)
+        self.assertEqual(frames[:, 0].tolist(), [0, 220, 441])
+        self.assertEqual(stft.frame(samples[:100], 400, 160).shape, (0, 400))
+        self.assertFalse(stft.window("hanning", 320).flags.writeable)
+        full = stft.spectrum(stft.frame(samples, 320, 160), scaling="magnitude", onesided=False)
+        np.testing.assert_allclose(full[:, :161], stft.spectrogram(samples, 320, 160, scaling="magnitude"), atol=1e-12)
+
+    def test_normalizer_statistics(self):
+        featurizer = AudioFeaturizer(dtype="float64")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_file = os.path.join(tmp_dir, "data.txt")
+            with open(data_file, "w", encoding="utf-8") as f:
+                for i in range(7):
+                    audio_file = os.path.join(tmp_dir, "%d.wav" % i)
+                    _make_segment(0.5 + 0.25 * i, seed=i).to_wav_file(audio_file)
+                    f.write("%s\t0\ta\ta\ttrain\tsynthetic\n" % audio_file)
+            features = np.vstack([featurizer.featurize(AudioSegment.from_file(os.path.join(tmp_dir, "%d.wav" % i)))
+                                  for i in range(7)])
+            normalizers = {
+                "serial": FeatureNormalizer(data_path=data_file, featurize_func=featurizer.featurize,
+                                            num_samples=None, chunk_size=2),
+                "parallel": FeatureNormalizer(data_path=data_file, featurize_func=featurizer.featurize,
+                                              num_samples=None, num_processes=3, chunk_size=2),
+                "spawn": FeatureNormalizer(data_path=data_file, featurize_func=featurizer.featurize,
+                                           num_samples=None, num_processes=2, chunk_size=2, start_method="spawn")}
+            # interrupted in the last chunk, then resumed from the checkpoint of the first 2 chunks, without
+            # featurizing them again
+            checkpoint_file = os.path.join(tmp_dir, "checkpoint.npz")
+            calls = []
+
+            def featurize_func(segment, interrupt=True):
+                calls.append(segment)
+                if interrupt and len(calls) == 7:
+                    raise KeyboardInterrupt
+                return featurizer.featurize(segment)
+
+            with self.assertRaises(KeyboardInterrupt):
+                FeatureNormalizer(data_path=data_file, featurize_func=featurize_func, num_samples=None,
+                                  checkpoint_path=checkpoint_file, chunk_size=2, checkpoint_interval=2)
+            calls.clear()
+            normalizers["resumed"] = FeatureNormalizer(
+                data_path=data_file, featurize_func=lambda segment: featurize_func(segment, interrupt=False),
+                num_samples=None, checkpoint_path=checkpoint_file, chunk_size=2, checkpoint_interval=2)
+            self.assertEqual(len(calls), 3)
+            for name, normalizer in normalizers.items():
+                output_file = os.path.join(tmp_dir, name + ".npz")
+                normalizer.write_to_file(output_file)
+                with np.load(output_file) as npzfile:
+                    self.assertEqual(npzfile["mean"].shape, (1, features.shape[1]))
+                    self.assertEqual(npzfile["std"].dtype, np.float64)
+                    np.testing.assert_allclose(npzfile["mean"], features.mean(axis=0, keepdims=True), rtol=1e-10)
+                    np.testing.assert_allclose(npzfile["std"], features.std(axis=0, keepdims=True), rtol=1e-10)
+                    # merged in the same order
+                    np.testing.assert_array_equal(npzfile["mean"], normalizers["serial"]._mean)
+                    np.testing.assert_array_equal(npzfile["std"], normalizers["serial"]._std)
+
+    def test_feature_store(self):
+        featurizer = AudioFeaturizer()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            audio_files = []
+            for i, duration in enumerate([1., 2., 0.5, 1.5]):
+                audio_files.append(os.path.join(tmp_dir, "%d.wav" % i))
+                _make_segment(duration, seed=i).to_wav_file(audio_files[-1])
+            calls = []
+
+            def featurize(audio_file):
+                calls.append(audio_file)
+                return featurizer.featurize(AudioSegment.from_file(audio_file))
+
+            store_path = os.path.join(tmp_dir, "store")
+            store = FeatureStore(store_path, featurizer.config, shard_bytes=200000)
+            expected = [store.get_or_compute(f, featurize) for f in audio_files]
+            features = [store.get_or_compute(f, featurize) for f in audio_files]
+            self.assertEqual(calls, audio_files)  # featurized once
+            for feature, expected_feature, audio_file in zip(features, expected, audio_files):
+                self.assertIsInstance(feature, np.memmap)
+                self.assertFalse(feature.flags.writeable)
+                np.testing.assert_array_equal(feature, featurize(audio_file))
+
+            # another process sees the features, not another config nor a modified file
+            self.assertEqual(len(pickle.loads(pickle.dumps(store))), len(audio_files))
+            self.assertIsNone(FeatureStore(store_path, AudioFeaturizer(stride_ms=5.).config).get(audio_files[0]))
+            _make_segment(1., seed=9).to_wav_file(audio_files[0])
+            os.utime(audio_files[0], ns=(0, 0))
+            self.assertIsNone(store.get(audio_files[0]))
+
+            # the oldest shards are evicted down to the bound, the current one is kept
+            nbytes = store.nbytes
+            store.evict(nbytes // 2)
+            self.assertLessEqual(store.nbytes, max(nbytes // 2, os.path.getsize(
+                os.path.join(store_path, sorted(n for n in os.listdir(store_path) if n.startswith("shard"))[-1]))))
+            self.assertIsNone(store.get(audio_files[1]))
+            np.testing.assert_array_equal(store.get(audio_files[-1]), expected[-1])
+
+    def test_mapped_slices(self):
+        segment = _make_segment(2.)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for dtype in ["int16", "float32"]:
+                audio_file = os.path.join(tmp_dir, "%s.wav" % dtype)
+                segment.to_wav_file(audio_file, dtype=dtype)
+                full = AudioSegment.from_file(audio_file)
+                for start, end in [(0.25, 1.5), (None, 0.5), (-0.7, None), (1., 1.)]:
+                    begin = 0 if start is None else int((start % 2.) * 16000)
+                    stop = len(full.samples) if end is None else int(end * 16000)
+                    np.testing.assert_array_equal(AudioSegment.from_slice_file(audio_file, start, end).samples,
+                                                  full.samples[begin: stop])
+                    # only the range left by `subsegment` is read from the mapping
+                    mapped, read = AudioSegment.from_file(audio_file, mmap=True), AudioSegment.from_file(audio_file)
+                    self.assertTrue(mapped.is_mapped)
+                    mapped.subsegment(start, end)
+                    read.subsegment(start, end)
+                    self.assertTrue(mapped.is_mapped)
+                    self.assertEqual(mapped.samples.dtype, np.float32)
+                    np.testing.assert_array_equal(mapped.samples, read.samples)
+                    self.assertFalse(mapped.is_mapped)
+
+    @unittest.skipUnless(importlib.util.find_spec("resampy"), "resampy is not installed")
+    def test_resample(self):
+        import resampy
+        from deep_speech2.data_utils.segments import _resample_kernel
+        # a band limited signal, the filters differ at the bounds and in the transition band only
+        t = np.arange(32000) / 16000
+        samples = (0.3 * np.sin(2 * np.pi * (200 + 300 * t) * t)).astype(np.float32)
+        _resample_kernel.cache_clear()
+        for target_rate, quality, atol in [(8000, "best", 1e-6), (22050, "kaiser_best", 1e-6), (8000, "fast", 5e-6)]:
+            segment = AudioSegment(samples.copy(), 16000)
+            segment.resample(target_rate, quality)
+            expected = resampy.resample(samples.astype(np.float64), 16000, target_rate,
+                                        filter=quality if quality.startswith("kaiser") else "kaiser_" + quality)
+            self.assertEqual(segment.samples.dtype, np.float32)
+            self.assertEqual(len(segment.samples), len(expected))
+            np.testing.assert_allclose(segment.samples[200: -200], expected[200: -200], atol=atol)
+        AudioSegment(samples.copy(), 16000).resample(8000, "best")
+        self.assertEqual(_resample_kernel.cache_info().misses, 3)  # designed once per rates and quality
+
+        for speed_rate in [0.9, 1.1, 1.234]:
+            segment = AudioSegment(samples.copy(), 16000)
+            segment.change_speed(speed_rate)
+            # resampling from the rate on the 0.01 grid to the grid
+            expected = resampy.resample(samples.astype(np.float64), int(round(speed_rate * 100)), 100,
+                                        filter="kaiser_fast")
+            self.assertLessEqual(abs(len(segment.samples) - len(expected)), 1)
+            n = min(len(segment.samples), len(expected))
+            np.testing.assert_allclose(segment.samples[200: n - 200], expected[200: n - 200], atol=5e-4)
+            # the exact rate by linear interpolation, at float32 positions
+            segment = AudioSegment(samples.copy(), 16000)
+            segment.change_speed(speed_rate, rate_step=None)
+            new_length = int(len(samples) / speed_rate)
+            np.testing.assert_allclose(
+                segment.samples, np.interp(np.linspace(0, len(samples), new_length), np.arange(len(samples)), samples),
+                atol=1e-3)
+
+    def test_audio_batch(self):
+        segments = [_make_segment(duration, seed=i) for i, duration in enumerate([0.5, 1., 0.25, 0.8])]
+        rng = np.random.RandomState(0)
+
+        def check(batch_op, segment_op, max_len=0, **kwargs):
+            # each row of the batch transformed at once as its segment alone, the padding kept zero
+            batch = AudioBatch.from_segments(segments, max_len=max_len)
+            batch_op(batch)
+            for i, segment in enumerate(segments):
+                expected = AudioSegment(segment.samples.copy(), segment.sample_rate)
+                segment_op(expected, i)
+                self.assertEqual(batch.lengths[i], len(expected.samples))
+                np.testing.assert_allclose(batch.get_segment(i).samples, expected.samples, **kwargs)
+            self.assertFalse(np.any(batch.samples[~batch.mask]))
+
+        gains = rng.uniform(-10, 10, len(segments))
+        check(lambda batch: batch.gain_db(gains), lambda segment, i: segment.gain_db(gains[i]), rtol=1e-6)
+        targets = rng.uniform(-30, -10, len(segments))
+        check(lambda batch: batch.normalize(targets), lambda segment, i: segment.normalize(targets[i]), rtol=1e-5)
+        shifts = np.array([100., -50., 0., -250.])
+        check(lambda batch: batch.shift(shifts), lambda segment, i: segment.shift(shifts[i]))
+        durations = np.array([0.1, 0., 0.25, 0.05])
+        for sides in ["beginning", "end", "both"]:
+            check(lambda batch: batch.pad_silence(durations, sides),
+                  lambda segment, i: segment.pad_silence(durations[i], sides))
+        # the buffer room left for lengthening is reused
+        check(lambda batch: batch.pad_silence(0.1), lambda segment, i: segment.pad_silence(0.1), max_len=32000)
+        noises = [_make_segment(segment.duration, seed=10 + i) for i, segment in enumerate(segments)]
+        snrs = rng.uniform(5, 20, len(segments))
+        check(lambda batch: batch.add_noise(AudioBatch.from_segments(noises), snrs),
+              lambda segment, i: segment.add_noise(noises[i], snrs[i]), rtol=1e-5, atol=1e-7)
+
+        # an empty row has no energy to normalize nor add noise to, as an empty segment
+        batch = AudioBatch.from_segments(segments[:1] + [AudioSegment(np.zeros(0, dtype=np.float32), 16000)])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.assertTrue(np.isnan(batch.rms_db[1]))
+            batch.normalize(-20.)
+            self.assertAlmostEqual(batch.rms_db[0], -20., places=4)
+            batch.add_noise(AudioBatch.from_segments(noises[:2]), 10.)
+        self.assertTrue(np.all(np.isfinite(batch.samples)))
+        self.assertEqual(batch.lengths.tolist(), [len(segments[0].samples), 0])
+
+    def test_impulse_response(self):
+        rng = np.random.RandomState(0)
+        impulses = [(rng.standard_normal(n) * np.exp(-np.arange(n) / (n / 5.))).astype(np.float32) for n in (300, 800)]
+        # blocks shorter, as long as, and not a divisor of the samples, one sample and a single block
+        for n_samples, (impulse, fft_size) in zip([1, 100, 5000, 3297, 16000], [(impulses[0], 512), (impulses[0], 512),
+                                                  (impulses[1], 4096), (impulses[1], 4096), (impulses[1], 2048)]):
+            samples = rng.standard_normal(n_samples).astype(np.float32)
+            convolved = _overlap_add(samples, fft.rfft(impulse, n=fft_size), len(impulse), fft_size)
+            np.testing.assert_allclose(convolved, signal.fftconvolve(samples, impulse), atol=1e-4)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            impulse_file = os.path.join(tmp_dir, "impulse.txt")
+            with open(impulse_file, "w", encoding="utf-8") as f:
+                for i, impulse in enumerate(impulses):
+                    audio_file = os.path.join(tmp_dir, "%d.wav" % i)
+                    AudioSegment(impulse, 16000).to_wav_file(audio_file, dtype="float32")
+                    f.write("%s\t%f\tsynthetic\n" % (audio_file, len(impulse) / 16000))
+            max_cache_mb = 2.5 * fft.rfft(impulses[0], n=4096).nbytes / (1 << 20)  # two spectra of 4096
+            augmentor = ImpulseResponseAugmentor(random.Random(0), impulse_file, max_cache_mb=max_cache_mb)
+            choices = random.Random(0)
+            # one block for the segments shorter than the impulses too
+            for duration in [1., 0.02, 0.005, 1., 0.5]:
+                segment = _make_segment(duration, seed=1)
+                expected = signal.fftconvolve(segment.samples, impulses[choices.randrange(len(impulses))])
+                augmentor.transform_audio(segment)
+                np.testing.assert_allclose(segment.samples, expected, atol=1e-4)
+
+            # the spectra are reused, the least recently used evicted beyond the budget
+            augmentor = ImpulseResponseAugmentor(random.Random(0), impulse_file, max_cache_mb=max_cache_mb)
+            spectrum = augmentor._get_spectrum(0, 16000, 4096)
+            self.assertIs(augmentor._get_spectrum(0, 16000, 4096), spectrum)
+            np.testing.assert_allclose(spectrum, fft.rfft(impulses[0], n=4096), rtol=1e-6)
+            augmentor._get_spectrum(1, 16000, 4096)
+            self.assertEqual(list(augmentor._spectra), [(0, 16000, 4096), (1, 16000, 4096)])
+            augmentor._get_spectrum(0, 16000, 4096)
+            augmentor._get_spectrum(0, 16000, 8192)
+            self.assertEqual(list(augmentor._spectra), [(0, 16000, 8192)])
+            augmentor._get_spectrum(1, 16000, 2048)
+            self.assertEqual(list(augmentor._spectra), [(0, 16000, 8192), (1, 16000, 2048)])
+            self.assertEqual(augmentor._cache_bytes, sum(s.nbytes for s in augmentor._spectra.values()))
+
+    def test_noise_bank(self):
+        # lengths off the window grid, one recording resampled to the bank rate
+        noises = [_make_segment(0.3, seed=1), _make_segment(0.5 + 37 / 16000, seed=2), _make_segment(0.4, 8000, seed=3)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            noise_file = os.path.join(tmp_dir, "noise.txt")
+            with open(noise_file, "w", encoding="utf-8") as f:
+                for i, noise in enumerate(noises):
+                    audio_file = os.path.join(tmp_dir, "%d.wav" % i)
+                    noise.to_wav_file(audio_file)
+                    f.write("%s\t%f\tsynthetic\n" % (audio_file, noise.duration))
+            noises[2].resample(16000)
+            for dtype in ["int16", "float32"]:
+                bank_path = os.path.join(tmp_dir, dtype)
+                build_noise_bank(noise_file, bank_path, dtype=dtype)
+                bank = NoiseBank(bank_path)
+                self.assertEqual(len(bank), len(noises))
+                self.assertEqual(bank.window_size, 160)
+                for i, noise in enumerate(noises):
+                    samples = AudioSegment._convert_samples_to_float32(bank[i]).astype(np.float64)
+                    self.assertEqual(len(samples), len(noise.samples))
+                    np.testing.assert_allclose(samples, noise.samples, atol=1e-4)
+                    n_windows = -(-len(samples) // bank.window_size)
+                    for first, last in [(0, n_windows), (1, 3), (2, n_windows), (n_windows - 1, n_windows)]:
+                        start, stop = first * bank.window_size, min(last * bank.window_size, len(samples))
+                        expected = 10 * np.log10(np.mean(samples[start: stop] ** 2))
+                        self.assertAlmostEqual(bank.window_rms_db(i, start, stop - start), expected, places=6)
+                        # off the grid, the partial windows at the bounds are counted in full
+                        if stop - start > bank.window_size:
+                            self.assertAlmostEqual(bank.window_rms_db(i, start + 10, stop - start - 20), expected,
+                                                   places=6)
+
+                rng = random.Random(0)
+                for length in [1, 160, 4000, 8000]:
+                    window, rms_db = bank.sample(length, rng)
+                    self.assertEqual(len(window), length)
+                    self.assertTrue(np.shares_memory(window, bank._samples))
+                    self.assertFalse(window.flags.writeable)
+                    offset = (window.ctypes.data - bank._samples.ctypes.data) // bank.dtype.itemsize
+                    i = int(np.searchsorted(bank.offsets, offset, side="right") - 1)
+                    start = offset - bank.offsets[i]
+                    self.assertEqual(start % bank.window_size, 0)
+                    self.assertLessEqual(start + length, bank.lengths[i])
+                    if length % bank.window_size == 0:
+                        samples = AudioSegment._convert_samples_to_float32(window).astype(np.float64)
+                        self.assertAlmostEqual(rms_db, 10 * np.log10(np.mean(samples ** 2)), places=6)
+                with self.assertRaises(RuntimeError):
+                    bank.sample(9000, rng)
+                del bank, window
+
+    def test_augmentation_pool(self):
+        config = json.dumps([
+            {"type": "speed", "params": {"min_speed_rate": 0.9, "max_speed_rate": 1.1}, "prob": 0.5},
+            {"type": "shift", "params": {"min_shift_ms": -5, "max_shift_ms": 5}, "prob": 1.0},
+            {"type": "volume", "params": {"min_gain_dBFS": -10, "max_gain_dBFS": 10}, "prob": 0.5}])
+        segments = [_make_segment(0.3 + 0.1 * i, seed=i) for i in range(6)]
+
+        def copy(segment):
+            return AudioSegment(segment.samples.copy(), segment.sample_rate)
+
+        def augment(epoch, order):
+            # utterance i is of index 10 + i
+            pipeline, augmented = AugmentationPipeline(config, random_seed=3), [None] * len(segments)
+            for i in order:
+                augmented[i] = copy(segments[i])
+                pipeline.transform_audio(augmented[i], epoch=epoch, index=10 + i)
+            return [segment.samples for segment in augmented]
+
+        # repeatable per (seed, epoch, index) whatever the order the utterances are transformed in
+        expected = {epoch: augment(epoch, range(len(segments))) for epoch in [0, 1]}
+        for samples, reversed_samples in zip(expected[1], augment(1, reversed(range(len(segments))))):
+            np.testing.assert_array_equal(samples, reversed_samples)
+        self.assertFalse(all(len(a) == len(b) and np.array_equal(a, b) for a, b in zip(expected[0], expected[1])))
+
+        for num_processes in [1, 2]:
+            with AugmentationPool(config, random_seed=3, num_processes=num_processes) as pool:
+                for epoch in [0, 1]:
+                    augmented = list(pool.transform(map(copy, segments), epoch=epoch, start_index=10, chunksize=2))
+                    self.assertEqual(len(augmented), len(segments))
+                    for segment, samples in zip(augmented, expected[epoch]):
+                        np.testing.assert_array_equal(segment.samples, samples)
+        with self.assertRaises(RuntimeError):
+            pool.transform(segments)
+
+    def test_feature_augmentors(self):
+        features = np.random.RandomState(0).standard_normal((100, 40)).astype(np.float32) + 5.
+        changed = {"freq_mask": False, "time_mask": False, "time_warp": False}
+        for seed in range(5):
+            # the features are transformed in place, through a view of a larger buffer too
+            buffer = np.zeros((100, 50), dtype=np.float32)
+            buffer[:, :40] = features
+            view = buffer[:, :40]
+            FrequencyMaskAugmentor(random.Random(seed), 8, num_masks=2, mask_value=-1.).transform_feature(view)
+            masked = np.all(view == -1., axis=0)
+            self.assertLessEqual(masked.sum(), 16)
+            np.testing.assert_array_equal(view[:, ~masked], features[:, ~masked])
+            self.assertFalse(np.any(buffer[:, 40:]))
+            changed["freq_mask"] |= bool(masked.any())
+
+            transformed = features.copy()
+            TimeMaskAugmentor(random.Random(seed), 40, num_masks=3, max_ratio=0.1).transform_feature(transformed)
+            masked = np.all(transformed == 0., axis=1)
+            self.assertLessEqual(masked.sum(), 30)
+            np.testing.assert_array_equal(transformed[~masked], features[~masked])
+            changed["time_mask"] |= bool(masked.any())
+
+            # the frames of a ramp stay ordered and bounded, the bounds don't move
+            ramp = np.tile(np.arange(100, dtype=np.float32)[:, None], (1, 3))
+            view = ramp[:, 1:]
+            TimeWarpAugmentor(random.Random(seed), 10).transform_feature(view)
+            self.assertEqual((view[0, 0], view[-1, 0]), (0., 99.))
+            self.assertTrue(np.all(np.diff(view[:, 0]) >= 0))
+            np.testing.assert_array_equal(view[:, 0], view[:, 1])
+            np.testing.assert_array_equal(ramp[:, 0], np.arange(100))
+            changed["time_warp"] |= not np.array_equal(view[:, 0], ramp[:, 0])
+        self.assertEqual(changed, {"freq_mask": True, "time_mask": True, "time_warp": True})
+
+        # the shape is kept for masks wider than the features, and nothing is changed by the empty masks and warps,
+        # nor by a warp of too few frames
+        rng = random.Random(0)
+        for augmentor, n_frames, unchanged in [
+                (FrequencyMaskAugmentor(rng, 100), 5, False), (TimeMaskAugmentor(rng, 100), 5, False),
+                (FrequencyMaskAugmentor(rng, 0), 5, True), (TimeMaskAugmentor(rng, 10), 0, True),
+                (TimeMaskAugmentor(rng, 10, max_ratio=0.1), 5, True), (TimeWarpAugmentor(rng, 0), 100, True),
+                (TimeWarpAugmentor(rng, 5), 12, True)]:
+            transformed = features[:n_frames].copy()
+            augmentor.transform_feature(transformed)
+            self.assertEqual((transformed.shape, transformed.dtype), ((n_frames, 40), np.float32))
+            if unchanged:
+                np.testing.assert_array_equal(transformed, features[:n_frames])
+
+    def test_online_bayesian_normalizer(self):
+        rng = np.random.RandomState(0)
+        normalizer = OnlineBayesianNormalizer(16000, target_db=-20., prior_db=-25., prior_samples=1000)
+        delayed = OnlineBayesianNormalizer(16000, target_db=-20., prior_db=-25., prior_samples=1000, startup_delay=0.05)
+        # longer and shorter than the startup delay, the normalizers are reused across the audios
+        for duration, seed in [(0.5, 1), (0.03, 2), (0.3, 3)]:
+            segment = _make_segment(duration, seed=seed)
+            bounds = np.sort(rng.randint(0, len(segment.samples), 12))
+            chunks = np.split(segment.samples, bounds)  # some empty
+            for startup_delay, online in [(0., normalizer), (0.05, delayed)]:
+                expected = AudioSegment(segment.samples.copy(), segment.sample_rate)
+                expected.normalize_online_bayesian(-20., -25., 1000, startup_delay=startup_delay)
+                outputs = [online.process(chunk) for chunk in chunks] + [online.flush()]
+                self.assertTrue(all(output.dtype == np.float32 for output in outputs))
+                np.testing.assert_array_equal(np.concatenate(outputs), expected.samples)
+                # the samples are held back until the end of the startup delay, all if the audio is shorter
+                held_back = len(segment.samples) if duration < startup_delay else 0
+                self.assertEqual(len(outputs[-1]), held_back)
+
+    @unittest.skipUnless(importlib.util.find_spec("librosa"), "librosa is not installed")
+    def test_mfcc_librosa(self):
+        import librosa
+        x = _make_segment(3.).samples
+        pad_mode = "constant" if librosa.__version__ >= "0.10" else "reflect"
+        for n_mfcc, fmax in [(13, None), (20, 6000.)]:
+            np.testing.assert_allclose(mfcc.mel_filterbank(16000, 2048, 128, fmax, style="librosa"),
+                                       librosa.filters.mel(sr=16000, n_fft=2048, n_mels=128, fmax=fmax), atol=1e-6)
+            expected = librosa.feature.mfcc(y=x, sr=16000, n_mfcc=n_mfcc, fmax=fmax)
+            feature = mfcc.mfcc_librosa(x, 16000, n_mfcc=n_mfcc, fmax=fmax, pad_mode=pad_mode)
+            self.assertEqual(feature.shape, expected.shape)
+            np.testing.assert_allclose(feature, expected, atol=1e-3 * np.abs(expected).max())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,335 @@
+"""Array-backed CTC prefix beam search engine working in log space."""
+
+import numpy as np
+from deep_speech2.decoders.lexicon import Lexicon
+from typing import Dict, Callable, Optional, List, Union, Tuple
+
+NEG_INF = -float("inf")
+
+
+class PrefixTree(object):
+    """
+    Prefix tree over token ids, every decoded prefix is an integer node.
+    Node 0 is the empty prefix (root), each other node stores its parent node and its last token,
+    so a prefix is only materialized to tokens or text when it is emitted.
+    The children are looked up by (parent, token), so each token sequence is exactly one node, even if its prefix
+    is pruned from the beam and decoded again later.
+
+    :param capacity: Initial number of nodes to allocate, the storage grows by doubling.
+    """
+    ROOT = 0
+
+    def __init__(self, capacity: int=1024):
+        self._parent = np.empty(max(capacity, 1), dtype=np.int32)
+        self._token = np.empty(max(capacity, 1), dtype=np.int32)
+        self._parent[self.ROOT] = -1
+        self._token[self.ROOT] = -1
+        self._size = 1
+        # (parent << 32 | token) -> child node
+        self._children: Dict[int, int] = {}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def parent(self) -> np.ndarray:
+        """The parent node of each node, -1 for the root."""
+        return self._parent[:self._size]
+
+    @property
+    def token(self) -> np.ndarray:
+        """The last token id of each node, -1 for the root."""
+        return self._token[:self._size]
+
+    def extend(self, parents: np.ndarray, tokens: np.ndarray) -> np.ndarray:
+        """
+        Return the nodes extending `parents` by `tokens`, the ones not in the tree yet are appended.
+
+        :param parents: Parent nodes, 1-D int array.
+        :param tokens: Token ids to append to each parent, same shape as `parents`.
+        :return: The ids of the child nodes.
+        """
+        n = len(parents)
+        if self._size + n > len(self._parent):
+            capacity = max(2 * len(self._parent), self._size + n)
+            self._parent = np.resize(self._parent, capacity)
+            self._token = np.resize(self._token, capacity)
+        nodes = np.empty(n, dtype=np.int32)
+        for i, (parent, token) in enumerate(zip(parents.tolist(), tokens.tolist())):
+            key = parent << 32 | token
+            node = self._children.get(key)
+            if node is None:
+                node = self._children[key] = self._size
+                self._parent[node] = parent
+                self._token[node] = token
+                self._size += 1
+            nodes[i] = node
+        return nodes
+
+    def tokens(self, node: int) -> List[int]:
+        """Return the token ids of the prefix represented by `node`."""
+        res = []
+        while node > self.ROOT:
+            res.append(int(self._token[node]))
+            node = int(self._parent[node])
+        return res[::-1]
+
+
+class PrefixBeamSearch(object):
+    """
+    Stateful CTC prefix beam search, the engine behind `decoders.ctc_beam_search_decoder`.
+
+    Prefixes are nodes of a `PrefixTree`, the beam is kept as parallel NumPy arrays of node, last token and
+    log probabilities ending in blank / non-blank. Each frame scores all `beam x kept tokens` extensions at once,
+    merges the extensions that reproduce a prefix already in the beam and keeps the best `beam_size` candidates
+    by partial selection, no full sort is needed until the results are emitted.
+
+    :param beam_size: Width for beam search.
+    :param vocabulary: Vocabulary list or dict, the blank id is `len(vocabulary)`.
+    :param cutoff_prob: Cutoff probability in pruning, default 1.0, no pruning.
+    :param cutoff_top_n: Cutoff length in pruning, default 40.
+    :param ext_scoring_func: External scoring function for partially decoded sentence, e.g. word count or
+                             language model. It returns a score in linear space as `Scorer.__call__` does.
+                             If it is stateful (has `score_extension`, e.g. `scorer.Scorer`), each beam only scores
+                             its newly completed word from the cached state of its history prefix.
+    :param blank_skip_threshold: If given, the frames whose blank probability is not smaller than it are elided:
+                                 a run of such frames is collapsed into one blank-only update of the beam,
+                                 dropping the non-blank paths of these frames. Default None, no frame skipped.
+                                 The number of elided frames is counted in `num_skipped_frames`.
+    :param lexicon: If given, only the prefixes made of the lexicon words are expanded, and the results ending
+                    inside a word are ranked after the complete ones. Default None, no constraint.
+    """
+    def __init__(self, beam_size: int, vocabulary: Union[List[str], Dict[int, str]],
+                 cutoff_prob: float=1.0, cutoff_top_n: int=40, ext_scoring_func: Optional[Callable]=None,
+                 blank_skip_threshold: Optional[float]=None, lexicon: Optional[Lexicon]=None):
+        if beam_size < 1:
+            raise ValueError("beam_size should be a positive integer.")
+        if blank_skip_threshold is not None and not 0. < blank_skip_threshold <= 1.:
+            raise ValueError("blank_skip_threshold should be in (0, 1].")
+        if lexicon is not None and lexicon.vocab_size != len(vocabulary):
+            raise ValueError("lexicon is compiled with another vocabulary.")
+        self.beam_size = beam_size
+        self.vocabulary = vocabulary
+        self.cutoff_prob = cutoff_prob
+        self.cutoff_top_n = cutoff_top_n
+        self.blank_skip_threshold = blank_skip_threshold
+        self.ext_scoring_func = ext_scoring_func
+        self.lexicon = lexicon
+        self._stateful_scorer = hasattr(ext_scoring_func, "score_extension")
+        self.blank_id = len(vocabulary)
+        self.space_id = self._find_token(vocabulary, " ")
+        self.reset()
+
+    @staticmethod
+    def _find_token(vocabulary: Union[List[str], Dict[int, str]], token: str) -> int:
+        """Return the id of `token` in vocabulary, -1 if not exists."""
+        items = vocabulary.items() if isinstance(vocabulary, dict) else enumerate(vocabulary)
+        for i, v in items:
+            if v == token:
+                return i
+        return -1
+
+    def reset(self) -> None:
+        """Reset the beam to the empty prefix."""
+        self.tree = PrefixTree()
+        self._nodes = np.array([PrefixTree.ROOT], dtype=np.int32)
+        self._last = np.array([-1], dtype=np.int32)
+        self._log_pb = np.array([0.])
+        self._log_pnb = np.array([NEG_INF])
+        # the prefix node before the last word of each beam, the key of the cached scorer state
+        self._history = np.array([PrefixTree.ROOT], dtype=np.int32)
+        # the lexicon state of each beam
+        self._lex_states = np.array([Lexicon.INITIAL], dtype=np.int32)
+        self.num_frames = 0
+        self.num_skipped_frames = 0
+        if self._stateful_scorer:
+            self.ext_scoring_func.reset_cache()
+
+    def text(self, node: int) -> str:
+        """Return the text of prefix `node`."""
+        return "".join([self.vocabulary[t] for t in self.tree.tokens(node)])
+
+    def _last_word(self, node: int) -> Tuple[str, int]:
+        """Return the text of the last word of prefix `node` and the number of spaces before it."""
+        parent, token = self.tree.parent, self.tree.token
+        tokens = []
+        while node > PrefixTree.ROOT and token[node] != self.space_id:
+            tokens.append(token[node])
+            node = parent[node]
+        num_spaces = 0
+        while node > PrefixTree.ROOT and token[node] == self.space_id:
+            num_spaces += 1
+            node = parent[node]
+        return "".join([self.vocabulary[t] for t in tokens[::-1]]), num_spaces
+
+    def _log_ext_score(self, i: int) -> float:
+        """Return the log external score of beam `i` with its last word completed."""
+        node = self._nodes[i]
+        if self._stateful_scorer:
+            word, num_spaces = self._last_word(node)
+            score = self.ext_scoring_func.score_extension(self._history[i], node, word, num_spaces)
+        else:
+            score = self.ext_scoring_func(self.text(node))
+        return np.log(score) if score > 0 else NEG_INF
+
+    def _prune(self, probs: np.ndarray) -> np.ndarray:
+        """Return the token ids kept in the frame, following `cutoff_prob` and `cutoff_top_n`."""
+        total_len = len(probs)
+        if self.cutoff_prob >= 1.0 and self.cutoff_top_n >= total_len:
+            return np.arange(total_len)
+        top_n = min(self.cutoff_top_n, total_len)
+        ids = np.argpartition(-probs, top_n - 1)[:top_n] if top_n < total_len else np.arange(total_len)
+        if self.cutoff_prob < 1.0:
+            ids = ids[np.argsort(-probs[ids], kind="stable")]
+            cutoff_len = np.searchsorted(np.cumsum(probs[ids]), self.cutoff_prob) + 1
+            ids = ids[:cutoff_len]
+        return ids
+
+    def _score_space(self, ext: np.ndarray, col: int) -> None:
+        """Add the log external score to the extensions by space. Note that this is an in-place transformation."""
+        rows = np.nonzero((self._nodes != PrefixTree.ROOT) & (self._last != self.space_id))[0]
+        for i in rows:
+            ext[i, col] += self._log_ext_score(i)
+
+    def skip_blanks(self, log_blank_probs: np.ndarray) -> None:
+        """
+        Advance the beam over a run of frames by their blank probabilities only.
+        All prefixes end in blank afterwards, so the run costs one update whatever its length.
+
+        :param log_blank_probs: Log probabilities of blank in the frames to skip.
+        """
+        self._log_pb = np.logaddexp(self._log_pb, self._log_pnb) + np.sum(log_blank_probs)
+        self._log_pnb = np.full(len(self._log_pnb), NEG_INF)
+        self.num_frames += len(log_blank_probs)
+        self.num_skipped_frames += len(log_blank_probs)
+
+    def step(self, probs: np.ndarray, log_probs: Optional[np.ndarray]=None) -> None:
+        """
+        Advance the beam by one frame.
+
+        :param probs: Probabilities over vocabulary and blank of this frame.
+        :param log_probs: The log of `probs`, computed if not given.
+        """
+        if log_probs is None:
+            with np.errstate(divide="ignore"):
+                log_probs = np.log(probs)
+        if self.blank_skip_threshold is not None and probs[self.blank_id] >= self.blank_skip_threshold:
+            self.skip_blanks(log_probs[self.blank_id: self.blank_id + 1])
+            return
+        ids = self._prune(probs)
+        blank_kept = np.any(ids == self.blank_id)
+        tokens = ids[ids != self.blank_id]
+        if self.lexicon is not None:
+            # drop the tokens no beam can take, but the last tokens of the beams, which a beam repeats in place
+            allowed = self.lexicon.allowed(self._lex_states, tokens)
+            kept = np.any(allowed, axis=0) | np.isin(tokens, self._last)
+            tokens, allowed = tokens[kept], allowed[:, kept]
+        lp = log_probs[tokens]
+
+        nodes, last, log_pb, log_pnb, history = self._nodes, self._last, self._log_pb, self._log_pnb, self._history
+        n_beams, n_tokens = len(nodes), len(tokens)
+        log_total = np.logaddexp(log_pb, log_pnb)
+
+        # the column of each token id in `tokens`, -1 if pruned
+        token_col = np.full(self.blank_id + 2, -1, dtype=np.int64)
+        token_col[tokens] = np.arange(n_tokens)
+        last_col = token_col[last]  # last == -1 maps to the extra tail slot
+
+        # extensions: [n_beams, n_tokens], prefix + token ending in non-blank
+        ext = log_total[:, None] + lp[None, :]
+        stay_pnb = np.full(n_beams, NEG_INF)
+        rep = np.nonzero(last_col >= 0)[0]
+        if len(rep):
+            # a repeated token only extends the prefix through a blank, otherwise it collapses
+            rep_lp = lp[last_col[rep]]
+            ext[rep, last_col[rep]] = log_pb[rep] + rep_lp
+            stay_pnb[rep] = log_pnb[rep] + rep_lp
+        if self.lexicon is not None:
+            # only the extensions are constrained, not the repeats collapsing into the prefix in `stay_pnb`
+            ext[~allowed] = NEG_INF
+
+        if self.ext_scoring_func is not None and self.space_id >= 0 and token_col[self.space_id] >= 0:
+            self._score_space(ext, token_col[self.space_id])
+
+        # merge the extensions which reproduce a prefix already in the beam
+        order = np.argsort(nodes)
+        sorted_nodes = nodes[order]
+        parents = self.tree.parent[nodes]
+        pos = np.minimum(np.searchsorted(sorted_nodes, parents), n_beams - 1)
+        merge = np.nonzero((sorted_nodes[pos] == parents) & (last_col >= 0))[0]
+        if len(merge):
+            src_rows, src_cols = order[pos[merge]], last_col[merge]
+            stay_pnb[merge] = np.logaddexp(stay_pnb[merge], ext[src_rows, src_cols])
+            ext[src_rows, src_cols] = NEG_INF
+
+        stay_pb = log_probs[self.blank_id] + log_total if blank_kept else np.full(n_beams, NEG_INF)
+        scores = np.concatenate([np.logaddexp(stay_pb, stay_pnb), ext.ravel()])
+
+        # partial selection of the best `beam_size` candidates
+        if len(scores) > self.beam_size:
+            selected = np.argpartition(-scores, self.beam_size - 1)[:self.beam_size]
+        else:
+            selected = np.arange(len(scores))
+        finite = selected[scores[selected] > NEG_INF]
+        if len(finite):
+            selected = finite
+
+        is_stay = selected < n_beams
+        stay = selected[is_stay]
+        rows, cols = np.divmod(selected[~is_stay] - n_beams, n_tokens)
+        self._nodes = np.concatenate([nodes[stay], self.tree.extend(nodes[rows], tokens[cols])])
+        self._last = np.concatenate([last[stay], tokens[cols].astype(np.int32)])
+        self._log_pb = np.concatenate([stay_pb[stay], np.full(len(rows), NEG_INF)])
+        self._log_pnb = np.concatenate([stay_pnb[stay], ext[rows, cols]])
+        # a space after a word moves the history to the prefix ending with that word
+        word_end = (tokens[cols] == self.space_id) & (last[rows] != self.space_id)
+        self._history = np.concatenate([history[stay], np.where(word_end, nodes[rows], history[rows])])
+        if self.lexicon is not None:
+            lex_states = self._lex_states
+            self._lex_states = np.concatenate(
+                [lex_states[stay], self.lexicon.transition(lex_states[rows], tokens[cols])])
+        if self._stateful_scorer:
+            self.ext_scoring_func.evict(self._history)
+        self.num_frames += 1
+
+    def advance(self, probs_seq: np.ndarray) -> None:
+        """Advance the beam over all frames of the 2-D `probs_seq`."""
+        with np.errstate(divide="ignore"):
+            log_probs_seq = np.log(probs_seq)
+        if self.blank_skip_threshold is None:
+            for probs, log_probs in zip(probs_seq, log_probs_seq):
+                self.step(probs, log_probs)
+            return
+
+        # split the frames into runs of skipped / decoded frames
+        skip = probs_seq[:, self.blank_id] >= self.blank_skip_threshold
+        bounds = np.flatnonzero(np.diff(skip.astype(np.int8))) + 1
+        for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(skip)]])):
+            if skip[start]:
+                self.skip_blanks(log_probs_seq[start: end, self.blank_id])
+            else:
+                for probs, log_probs in zip(probs_seq[start: end], log_probs_seq[start: end]):
+                    self.step(probs, log_probs)
+
+    def results(self) -> List[Tuple[float, str]]:
+        """
+        Return the decoding results of the current beam, the last word is scored by the external scorer.
+
+        :return: List of tuples of log probability and sentence, in descending order of the probability.
+                 With a lexicon, the results ending at a word boundary come first.
+        """
+        beam_result = []
+        log_total = np.logaddexp(self._log_pb, self._log_pnb)
+        for i, (node, last, log_prob) in enumerate(zip(self._nodes, self._last, log_total)):
+            if log_prob > NEG_INF and node != PrefixTree.ROOT:
+                result = self.text(node)
+                if self.ext_scoring_func is not None and last != self.space_id:
+                    log_prob += self._log_ext_score(i)
+                beam_result.append((float(log_prob), result))
+            else:
+                beam_result.append((NEG_INF, ""))
+        if self.lexicon is not None:
+            is_final = self.lexicon.is_final(self._lex_states)
+            ranked = sorted(zip(is_final.tolist(), beam_result), key=lambda x: (x[0], x[1][0]), reverse=True)
+            return [result for _, result in ranked]
+        return sorted(beam_result, key=lambda asd: asd[0], reverse=True)
@@ -0,0 +1,183 @@
+"""
+Micro benchmark of the CTC decoders on reproducible synthetic posteriors.
+
+The greedy, beam search and batch beam search decoders are timed over vocabularies of the english, pinyin and han
+sizes, several utterance lengths, beam sizes and cutoffs, with and without an external scorer.
+The results are written as json, pass a former output as `--compare_path` to print the speedups between commits.
+
+    python -m deep_speech2.decoders.benchmark --output_path after.json --compare_path before.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import subprocess
+import numpy as np
+from deep_speech2.decoders import decoders_deprecated
+from deep_speech2.decoders import decoders
+from deep_speech2.decoders.scorer import Scorer
+from typing import Dict, List, Optional, Callable, Tuple, Any
+
+# the sizes of the vocabularies without blank, as `tools/build_vocab.py` builds them
+VOCAB_SIZES = {"eng": 28, "pny": 1635, "han": 3500}
+# the configs identifying a benchmark result, the rest are measurements
+RESULT_KEYS = ["decoder", "vocab", "n_frames", "beam_size", "cutoff_prob", "cutoff_top_n", "scorer", "batch_size"]
+
+
+def make_vocabulary(vocab_type: str) -> List[str]:
+    """Build a synthetic vocabulary of the size of `vocab_type`, english has the space and the apostrophe."""
+    if vocab_type == "eng":
+        return [" "] + [chr(i) for i in range(ord("a"), ord("z") + 1)] + ["'"]
+    if vocab_type == "pny":
+        return ["p%d" % i for i in range(VOCAB_SIZES["pny"])]
+    if vocab_type == "han":
+        return [chr(0x4e00 + i) for i in range(VOCAB_SIZES["han"])]
+    raise ValueError("Unknown vocab type (%s), possible choices are %s" % (vocab_type, list(VOCAB_SIZES)))
+
+
+def make_posteriors(n_frames: int, n_classes: int, seed: int=0, blank_ratio: float=0.6) -> np.ndarray:
+    """
+    Generate peaky CTC-like softmax outputs, the last class is blank.
+    Each frame is dominated either by blank, with probability `blank_ratio`, or by a random token.
+
+    :return: float32 array of shape [n_frames, n_classes].
+    """
+    rng = np.random.RandomState(seed)
+    logits = rng.standard_normal((n_frames, n_classes)).astype(np.float32)
+    peaks = np.where(rng.random_sample(n_frames) < blank_ratio, n_classes - 1, rng.randint(0, n_classes - 1, n_frames))
+    logits[np.arange(n_frames), peaks] += 6.
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def word_count_scorer(sentence: str) -> float:
+    """A cheap stateless external scorer, the scoring overhead of the decoder without any language model."""
+    return 1. + len(sentence.split(" "))
+
+
+def _best_time(func: Callable, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        tic = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(__file__),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": sys.version.split()[0], "numpy": np.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def run_benchmark(vocab_types: List[str], frame_counts: List[int], beam_sizes: List[int],
+                  cutoffs: List[Tuple[float, int]], scorers: Dict[str, Optional[Callable]],
+                  batch_size: int=8, num_processes: int=4, repeats: int=3, seed: int=0) -> List[Dict[str, Any]]:
+    """
+    Time the decoders over the grid of configs.
+
+    :param vocab_types: The vocabularies to decode with, keys of `VOCAB_SIZES`.
+    :param frame_counts: The utterance lengths in frames.
+    :param beam_sizes: The beam sizes of the beam search decoders.
+    :param cutoffs: The (cutoff_prob, cutoff_top_n) pairs of the beam search decoders.
+    :param scorers: The external scorers by name, None for no scorer.
+    :param batch_size: Number of utterances of the batch decoders.
+    :param num_processes: Number of processes of the batch beam search decoder.
+    :param repeats: Number of runs of each config, the best time is kept.
+    :param seed: The random seed of the posteriors.
+    :return: List of results, each one a dict of the `RESULT_KEYS` configs and the measurements.
+    """
+    results = []
+
+    def record(seconds: float, **configs):
+        result = dict.fromkeys(RESULT_KEYS)
+        result.update(configs, seconds=seconds)
+        result["frames_per_second"] = result["n_frames"] * (result["batch_size"] or 1) / seconds
+        results.append(result)
+        print(", ".join("%s: %s" % (k, v) for k, v in result.items() if v is not None and k != "frames_per_second"))
+
+    for vocab_type, n_frames in itertools.product(vocab_types, frame_counts):
+        vocabulary = make_vocabulary(vocab_type)
+        blank_id = len(vocabulary)
+        batch = [make_posteriors(n_frames, blank_id + 1, seed=seed + i) for i in range(batch_size)]
+        probs_seq = batch[0]
+
+        record(_best_time(lambda: decoders_deprecated.ctc_greedy_decoder(probs_seq, blank_id, vocabulary), repeats),
+               decoder="greedy", vocab=vocab_type, n_frames=n_frames)
+        record(_best_time(lambda: decoders.ctc_greedy_decoder_batch(batch, blank_id, vocabulary), repeats),
+               decoder="greedy_batch", vocab=vocab_type, n_frames=n_frames, batch_size=batch_size)
+
+        for beam_size, (cutoff_prob, cutoff_top_n), (scorer_name, scorer) in \
+                itertools.product(beam_sizes, cutoffs, scorers.items()):
+            params = dict(beam_size=beam_size, vocabulary=vocabulary, cutoff_prob=cutoff_prob,
+                          cutoff_top_n=cutoff_top_n, ext_scoring_func=scorer)
+            configs = dict(vocab=vocab_type, n_frames=n_frames, beam_size=beam_size, cutoff_prob=cutoff_prob,
+                           cutoff_top_n=cutoff_top_n, scorer=scorer_name)
+            record(_best_time(lambda: decoders.ctc_beam_search_decoder(probs_seq, **params), repeats),
+                   decoder="beam", **configs)
+            # the pool is long-lived in practice, its start-up is not timed
+            with decoders.DecoderPool(num_processes=num_processes, **params) as pool:
+                record(_best_time(lambda: pool.decode(batch), repeats),
+                       decoder="beam_batch", batch_size=batch_size, **configs)
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Match the results with the baseline ones of the same configs, and compute the speedup of each."""
+    baseline_seconds = {tuple(r[k] for k in RESULT_KEYS): r["seconds"] for r in baseline}
+    comparisons = []
+    for result in results:
+        key = tuple(result[k] for k in RESULT_KEYS)
+        if key in baseline_seconds:
+            comparisons.append(dict(zip(RESULT_KEYS, key), baseline_seconds=baseline_seconds[key],
+                                    seconds=result["seconds"], speedup=baseline_seconds[key] / result["seconds"]))
+    return comparisons
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vocab_types", type=str, nargs="+", choices=list(VOCAB_SIZES), default=list(VOCAB_SIZES),
+                        help="The vocabularies to benchmark.")
+    parser.add_argument("--frame_counts", type=int, nargs="+", default=[100, 1000, 3000], help="Utterance lengths.")
+    parser.add_argument("--beam_sizes", type=int, nargs="+", default=[10, 100], help="Beam search widths.")
+    parser.add_argument("--cutoff_probs", type=float, nargs="+", default=[1.0, 0.99], help="Cutoff probabilities.")
+    parser.add_argument("--cutoff_top_ns", type=int, nargs="+", default=[40], help="Cutoff numbers.")
+    parser.add_argument("--lang_model_path", type=str, default=None,
+                        help="Filepath of a language model to benchmark the `Scorer` with, besides no scorer and "
+                             "the word count scorer.")
+    parser.add_argument("--alpha", type=float, default=2.5, help="Parameter associated with language model.")
+    parser.add_argument("--beta", type=float, default=0.3, help="Parameter associated with word count.")
+    parser.add_argument("--batch_size", type=int, default=8, help="Number of utterances of the batch decoders.")
+    parser.add_argument("--num_proc", type=int, default=4, help="Number of processes of the batch beam decoder.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs of each config, the best is kept.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed of the synthetic posteriors.")
+    parser.add_argument("--output_path", type=str, help="Filepath to write the results (.json)", required=True)
+    parser.add_argument("--compare_path", type=str, default=None, help="Former results to compare with (.json)")
+    args = parser.parse_args()
+
+    scorers = {"none": None, "word_count": word_count_scorer}
+    if args.lang_model_path:
+        scorers["lm"] = Scorer(args.alpha, args.beta, args.lang_model_path)
+
+    results = run_benchmark(
+        vocab_types=args.vocab_types, frame_counts=args.frame_counts, beam_sizes=args.beam_sizes,
+        cutoffs=list(itertools.product(args.cutoff_probs, args.cutoff_top_ns)), scorers=scorers,
+        batch_size=args.batch_size, num_processes=args.num_proc, repeats=args.repeats, seed=args.seed)
+    with open(args.output_path, "w") as f:
+        json.dump({"environment": _environment(), "results": results}, f, indent=2)
+
+    if args.compare_path:
+        with open(args.compare_path, "r") as f:
+            baseline = json.load(f)["results"]
+        for c in compare(results, baseline):
+            print(", ".join("%s: %s" % (k, c[k]) for k in RESULT_KEYS if c[k] is not None) +
+                  ", {:.4f}s -> {:.4f}s, speedup x{:.2f}".format(c["baseline_seconds"], c["seconds"], c["speedup"]))
@@ -0,0 +1,304 @@
+""" Contains CTC beam search decoders based on the array-backed prefix beam search engine. """
+
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from deep_speech2.decoders.beam_search import PrefixBeamSearch
+from deep_speech2.decoders.lexicon import Lexicon
+from utils.ctc import ctc_greedy_decode_batch, ids_to_text
+from typing import Dict, Callable, Optional, List, Union, Tuple, Any
+
+# global func, the scorer loaded by the initializer of each `DecoderPool` worker
+ext_nproc_scorer: Optional[Callable] = None
+# the searcher and shared buffer attachment of each `DecoderPool` worker
+_worker_state: Dict[str, Any] = {}
+
+
+def ctc_greedy_decoder_batch(probs_split, blank_index: int, vocabulary=None,
+                             lengths: Optional[np.ndarray]=None) -> Union[List[str], List[List[int]]]:
+    """
+    CTC Greedy (best path) decoder over a whole batch, the vectorized counterpart of `ctc_greedy_decoder`.
+
+    :param probs_split: Padded 3-D array [batch, time, classes] or list of 2-D probabilities (or logits).
+    :param blank_index: The index indicating the blank.
+    :param vocabulary: Vocabulary.
+    :param lengths: The valid number of frames of each utterance, default all the frames.
+    :return: Decoding result strings if `vocabulary` is given, else lists of token indexes.
+    """
+    decoded, decoded_lengths = ctc_greedy_decode_batch(probs_split, lengths=lengths, blank_index=blank_index)
+    if vocabulary:
+        return ids_to_text(decoded, decoded_lengths, vocabulary)
+    return [ids[:length] for ids, length in zip(decoded.tolist(), decoded_lengths)]
+
+
+def ctc_beam_search_decoder(probs_seq, beam_size: int, vocabulary: Union[List[str], Dict[int, str]],
+                            cutoff_prob: float=1.0, cutoff_top_n: int=40,
+                            ext_scoring_func: Optional[Callable]=None, nproc: bool=False,
+                            blank_skip_threshold: Optional[float]=None, lexicon: Optional[Lexicon]=None) -> List:
+    """
+    CTC Beam search decoder.
+
+    Same API and results as `decoders_deprecated.ctc_beam_search_decoder`, but prefixes are integer nodes of a
+    prefix tree, beam scores are kept in NumPy arrays in log space (no underflow on long utterances)
+    and the top candidates are picked by partial selection. See `beam_search.PrefixBeamSearch`.
+
+    :param probs_seq: 2-D list of probability distributions over each time step, with each element being a list of normalized
+                      probabilities over vocabulary and blank.
+    :param beam_size: Width for beam search.
+    :param vocabulary: Vocabulary Dict.
+    :param cutoff_prob: Cutoff probability in pruning,  default 1.0, no pruning.
+    :param cutoff_top_n: Cutoff length in pruning, default 40.
+    :param ext_scoring_func: External scoring function for partially decoded sentence, e.g. word count or language model.
+    :param nproc: Whether the decoder used in multiprocesses.
+    :param blank_skip_threshold: If given, collapse runs of frames whose blank probability is not smaller than it
+                                 into one blank update, default None. See `beam_search.PrefixBeamSearch`.
+    :param lexicon: If given, constrain the prefixes to sequences of the lexicon words, default None.
+                    See `lexicon.Lexicon`.
+    :return: List of tuples of log probability and sentence as decoding results, in descending order of the probability.
+    """
+    # dimension verification
+    try:
+        probs_seq = np.asarray(probs_seq, dtype=np.float64)
+    except Exception as e:
+        raise ValueError("probs_seq is invalid, expected 2d array-like list.")
+
+    total_len = probs_seq.shape[1]
+    if total_len != len(vocabulary) + 1:
+        raise ValueError("probs_seq dimension mismatched with vocabulary")
+
+    # If the decoder called in the multiprocesses, then use the global scorer
+    # loaded by the initializer of `DecoderPool` workers.
+    if nproc is True:
+        global ext_nproc_scorer
+        ext_scoring_func = ext_nproc_scorer
+
+    searcher = PrefixBeamSearch(beam_size=beam_size, vocabulary=vocabulary, cutoff_prob=cutoff_prob,
+                                cutoff_top_n=cutoff_top_n, ext_scoring_func=ext_scoring_func,
+                                blank_skip_threshold=blank_skip_threshold, lexicon=lexicon)
+    searcher.advance(probs_seq)
+    return searcher.results()
+
+
+class StreamingDecoder(object):
+    """
+    Streaming CTC beam search decoder consuming probability chunks incrementally.
+    The beam is kept between chunks, so the total work is linear in the utterance length and the final results are
+    the same as `ctc_beam_search_decoder` on the concatenated chunks.
+
+    .. code-block::
+
+        decoder = StreamingDecoder(beam_size, vocabulary, ext_scoring_func=scorer)
+        for chunk in posterior_chunks:
+            decoder.push(chunk)
+            print(decoder.partial_results()[0][1])
+        results = decoder.finalize()
+
+    :param beam_size: Width for beam search.
+    :param vocabulary: Vocabulary list.
+    :param cutoff_prob: Cutoff probability in pruning, default 1.0, no pruning.
+    :param cutoff_top_n: Cutoff length in pruning, default 40.
+    :param ext_scoring_func: External scoring function for partially decoded sentence, e.g. word count or language model.
+                             A stateful `Scorer` must not be shared with another decoder running at the same time.
+    :param blank_skip_threshold: If given, collapse runs of frames whose blank probability is not smaller than it
+                                 into one blank update, default None.
+    :param lexicon: If given, constrain the prefixes to sequences of the lexicon words, default None.
+                    See `lexicon.Lexicon`.
+    """
+    def __init__(self, beam_size: int, vocabulary: Union[List[str], Dict[int, str]], cutoff_prob: float=1.0,
+                 cutoff_top_n: int=40, ext_scoring_func: Optional[Callable]=None,
+                 blank_skip_threshold: Optional[float]=None, lexicon: Optional[Lexicon]=None):
+        self._n_classes = len(vocabulary) + 1
+        self._searcher = PrefixBeamSearch(beam_size=beam_size, vocabulary=vocabulary, cutoff_prob=cutoff_prob,
+                                          cutoff_top_n=cutoff_top_n, ext_scoring_func=ext_scoring_func,
+                                          blank_skip_threshold=blank_skip_threshold, lexicon=lexicon)
+
+    @property
+    def num_frames(self) -> int:
+        """Number of frames consumed since the utterance began."""
+        return self._searcher.num_frames
+
+    def push(self, chunk) -> None:
+        """
+        Advance the beam over a chunk of frames.
+
+        :param chunk: 2-D list of probability distributions over vocabulary and blank, one row per frame.
+        :raises ValueError: If the chunk dimension mismatched with vocabulary.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.ndim != 2 or chunk.shape[1] != self._n_classes:
+            raise ValueError("chunk dimension mismatched with vocabulary")
+        self._searcher.advance(chunk)
+
+    def partial_results(self) -> List:
+        """
+        Return the decoding results of the frames pushed so far, the beam is not changed.
+
+        :return: List of tuples of log probability and sentence, in descending order of the probability.
+        """
+        return self._searcher.results()
+
+    def finalize(self) -> List:
+        """
+        Return the final decoding results and reset the decoder for the next utterance.
+
+        :return: List of tuples of log probability and sentence, in descending order of the probability.
+        """
+        results = self._searcher.results()
+        self.reset()
+        return results
+
+    def reset(self) -> None:
+        """Drop the beam and start a new utterance."""
+        self._searcher.reset()
+
+
+def _init_worker(beam_size: int, vocabulary: Union[List[str], Dict[int, str]], cutoff_prob: float, cutoff_top_n: int,
+                 ext_scoring_func: Optional[Callable], scorer_factory: Optional[Callable[[], Callable]],
+                 blank_skip_threshold: Optional[float], lexicon: Optional[Lexicon]) -> None:
+    """Initializer of the `DecoderPool` workers, load the scorer only once per worker."""
+    global ext_nproc_scorer
+    ext_nproc_scorer = scorer_factory() if scorer_factory is not None else ext_scoring_func
+    _worker_state["searcher"] = PrefixBeamSearch(
+        beam_size=beam_size, vocabulary=vocabulary, cutoff_prob=cutoff_prob,
+        cutoff_top_n=cutoff_top_n, ext_scoring_func=ext_nproc_scorer, blank_skip_threshold=blank_skip_threshold,
+        lexicon=lexicon)
+    _worker_state["shm"] = None
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach the worker to the shared buffer of the pool, the attachment is kept until the buffer changes."""
+    shm: Optional[shared_memory.SharedMemory] = _worker_state["shm"]
+    if shm is None or shm.name != name:
+        if shm is not None:
+            shm.close()
+        # the buffer is owned and unlinked by the pool.
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_state["shm"] = shm
+    return shm
+
+
+def _decode_task(task: Tuple[str, str, int, int, int]) -> List:
+    """Decode one utterance from the shared buffer of the pool."""
+    name, dtype, offset, n_frames, n_classes = task
+    shm = _attach_shared_memory(name)
+    probs_seq = np.ndarray((n_frames, n_classes), dtype=dtype, buffer=shm.buf, offset=offset)
+    searcher: PrefixBeamSearch = _worker_state["searcher"]
+    searcher.reset()
+    searcher.advance(probs_seq.astype(np.float64))
+    return searcher.results()
+
+
+class DecoderPool(object):
+    """
+    Long-lived pool of beam search decoder processes, reusable across eval batches and epochs.
+
+    The external scorer is loaded once per worker by the pool initializer, e.g. pass
+    `scorer_factory=functools.partial(Scorer, alpha, beta, model_path)` so each worker loads the language model
+    only once. The probability matrices of a batch are packed into one shared memory buffer which the workers
+    read in place, only the buffer offsets are sent to them.
+
+    :param beam_size: Width for beam search.
+    :param vocabulary: Vocabulary list.
+    :param num_processes: Number of parallel processes.
+    :param cutoff_prob: Cutoff probability in pruning, default 1.0, no pruning.
+    :param cutoff_top_n: Cutoff length in pruning, default 40.
+    :param ext_scoring_func: External scoring function for partially decoded sentence, passed to the workers once.
+    :param scorer_factory: Callable without arguments building the external scorer in each worker.
+                           If given, `ext_scoring_func` is ignored.
+    :param blank_skip_threshold: If given, collapse runs of frames whose blank probability is not smaller than it
+                                 into one blank update, default None.
+    :param lexicon: If given, constrain the prefixes to sequences of the lexicon words, default None.
+                    See `lexicon.Lexicon`.
+    """
+    def __init__(self, beam_size: int, vocabulary: Union[List[str], Dict[int, str]], num_processes: int,
+                 cutoff_prob: float=1.0, cutoff_top_n: int=40, ext_scoring_func: Optional[Callable]=None,
+                 scorer_factory: Optional[Callable[[], Callable]]=None, blank_skip_threshold: Optional[float]=None,
+                 lexicon: Optional[Lexicon]=None):
+        self._n_classes = len(vocabulary) + 1
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        # start the resource tracker before forking so workers share it instead of each tracking (and unlinking)
+        # the shared buffer on their own.
+        resource_tracker.ensure_running()
+        self._pool = multiprocessing.Pool(
+            processes=num_processes, initializer=_init_worker,
+            initargs=(beam_size, vocabulary, cutoff_prob, cutoff_top_n, ext_scoring_func, scorer_factory,
+                      blank_skip_threshold, lexicon))
+
+    def _buffer(self, nbytes: int) -> shared_memory.SharedMemory:
+        """Return the shared buffer with at least `nbytes`, it is reallocated only when growing."""
+        if self._shm is None or self._shm.size < nbytes:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        return self._shm
+
+    def decode(self, probs_split) -> List:
+        """
+        Decode a batch of utterances in parallel.
+
+        :param probs_split: 3D list with each element as an instance of 2-D list of probabilities used by
+                            ctc_beam_search_decoder().
+        :return: List of decoding results for each utterance, in the same order as `probs_split`.
+        """
+        if self._pool is None:
+            raise RuntimeError("The decoder pool is closed.")
+        probs_split = [np.asarray(probs_seq) for probs_seq in probs_split]
+        for probs_seq in probs_split:
+            if probs_seq.ndim != 2 or probs_seq.shape[1] != self._n_classes:
+                raise ValueError("probs_seq dimension mismatched with vocabulary")
+        if not probs_split:
+            return []
+
+        dtype = np.result_type(np.float32, *probs_split)
+        offsets = np.cumsum([0] + [len(probs_seq) for probs_seq in probs_split]) * self._n_classes * dtype.itemsize
+        shm = self._buffer(int(offsets[-1]))
+        tasks = []
+        for probs_seq, offset in zip(probs_split, offsets):
+            np.ndarray(probs_seq.shape, dtype=dtype, buffer=shm.buf, offset=offset)[:] = probs_seq
+            tasks.append((shm.name, dtype.str, int(offset), len(probs_seq), self._n_classes))
+        return self._pool.map(_decode_task, tasks)
+
+    def close(self) -> None:
+        """Stop the workers and release the shared buffer."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "DecoderPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def ctc_beam_search_decoder_batch(probs_split, beam_size: int, vocabulary: Union[List[str], Dict[int, str]],
+                                  num_processes: int, cutoff_prob: float=1.0, cutoff_top_n: int=40,
+                                  ext_scoring_func: Optional[Callable]=None,
+                                  blank_skip_threshold: Optional[float]=None, lexicon: Optional[Lexicon]=None) -> List:
+    """
+    CTC beam search decoder using multiple processes.
+    It starts a `DecoderPool` for this call only, keep a `DecoderPool` instead to decode many batches.
+
+    :param probs_split: 3D list with each element as an instance of 2-D list of probabilities used by ctc_beam_search_decoder().
+    :param beam_size: Width for beam search.
+    :param vocabulary: Vocabulary list.
+    :param num_processes: Number of parallel processes.
+    :param cutoff_prob: Cutoff probability in pruning, default 1.0, no pruning.
+    :param cutoff_top_n: Cutoff length in pruning, default 40.
+    :param ext_scoring_func: External scoring function for partially decoded sentence, e.g. word count or language model
+    :param blank_skip_threshold: If given, collapse runs of frames whose blank probability is not smaller than it
+                                 into one blank update, default None.
+    :param lexicon: If given, constrain the prefixes to sequences of the lexicon words, default None.
+                    See `lexicon.Lexicon`.
+    :return: List of tuples of log probability and sentence as decoding results, in descending order of the probability.
+    """
+    with DecoderPool(beam_size=beam_size, vocabulary=vocabulary, num_processes=num_processes, cutoff_prob=cutoff_prob,
+                     cutoff_top_n=cutoff_top_n, ext_scoring_func=ext_scoring_func,
+                     blank_skip_threshold=blank_skip_threshold, lexicon=lexicon) as pool:
+        return pool.decode(probs_split)
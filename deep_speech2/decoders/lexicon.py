@@ -0,0 +1,127 @@
+"""Contains the lexicon trie constraining the prefix beam search to sequences of lexicon words."""
+
+import numpy as np
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Union
+
+
+class Lexicon(object):
+    """
+    Lexicon compiled into a trie over vocabulary ids.
+
+    The beam search asks the lexicon which tokens may extend each prefix, so the prefixes leaving the lexicon are
+    pruned as soon as they appear instead of competing in the beam. A prefix is valid if it is a sequence of lexicon
+    words followed by the beginning of one. As the `pny` and `han` vocabularies have no word separator, a prefix can
+    be in several trie nodes at once, e.g. both inside a word and at the boundary after a shorter word. This set of
+    trie nodes is the state of the prefix, interned as an integer id, and the transitions and allowed tokens of each
+    state are cached, so the decoding only does array lookups once the states have been met.
+    If the vocabulary has a space, it is only allowed at word boundaries.
+
+    :param words: The lexicon words, each one a sequence of vocabulary tokens.
+    :param vocabulary: Vocabulary list or dict, without blank.
+    """
+    ROOT = 0
+    INITIAL = 0  # the state of the empty prefix, at the root only
+    REJECT = -1
+
+    def __init__(self, words: Iterable[Sequence[str]], vocabulary: Union[List[str], Dict[int, str]]):
+        items = vocabulary.items() if isinstance(vocabulary, dict) else enumerate(vocabulary)
+        token_ids = {token: i for i, token in items}
+        self.vocab_size = len(token_ids)
+        self.space_id = token_ids.get(" ", -1)
+
+        # the trie, children of each node by token id
+        self._children: List[Dict[int, int]] = [{}]
+        self._terminal: List[bool] = [False]
+        self.num_words, self.num_skipped_words = 0, 0
+        for word in words:
+            ids = [token_ids.get(token) for token in word]
+            if not ids or None in ids or self.space_id in ids:
+                self.num_skipped_words += 1  # empty, or out of vocabulary
+                continue
+            node = self.ROOT
+            for i in ids:
+                child = self._children[node].get(i)
+                if child is None:
+                    child = len(self._children)
+                    self._children[node][i] = child
+                    self._children.append({})
+                    self._terminal.append(False)
+                node = child
+            self.num_words += not self._terminal[node]
+            self._terminal[node] = True
+
+        # the automaton over sets of trie nodes, built lazily
+        self._states: List[FrozenSet[int]] = []
+        self._state_ids: Dict[FrozenSet[int], int] = {}
+        self._masks = np.zeros((16, self.vocab_size), dtype=bool)
+        self._final = np.zeros(16, dtype=bool)
+        self._transitions: Dict[int, int] = {}
+        self._add_state(frozenset([self.ROOT]))
+
+    @classmethod
+    def from_file(cls, lexicon_path: str, vocabulary: Union[List[str], Dict[int, str]],
+                  text_sep: Optional[str]=None) -> "Lexicon":
+        """
+        Compile a lexicon file of one word per line.
+
+        :param lexicon_path: File path of the lexicon.
+        :param vocabulary: Vocabulary list or dict, without blank.
+        :param text_sep: The sep string of the tokens of a word, e.g. "-" for pny. If `None`, each char is a token.
+        """
+        with open(lexicon_path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        return cls([line.split(text_sep) if text_sep else list(line) for line in lines if line], vocabulary)
+
+    @property
+    def num_states(self) -> int:
+        return len(self._states)
+
+    def _add_state(self, nodes: FrozenSet[int]) -> int:
+        state = self._state_ids.get(nodes)
+        if state is not None:
+            return state
+        state = len(self._states)
+        self._states.append(nodes)
+        self._state_ids[nodes] = state
+        if state >= len(self._final):
+            self._masks = np.concatenate([self._masks, np.zeros_like(self._masks)])
+            self._final = np.concatenate([self._final, np.zeros_like(self._final)])
+        for node in nodes:
+            self._masks[state, list(self._children[node])] = True
+        if self.ROOT in nodes:
+            self._final[state] = True
+            if self.space_id >= 0:
+                self._masks[state, self.space_id] = True
+        return state
+
+    def _transition(self, state: int, token: int) -> int:
+        key = state * self.vocab_size + token
+        next_state = self._transitions.get(key)
+        if next_state is None:
+            if not self._masks[state, token]:
+                next_state = self.REJECT
+            elif token == self.space_id:
+                next_state = self.INITIAL
+            else:
+                nodes = set()
+                for node in self._states[state]:
+                    child = self._children[node].get(token)
+                    if child is not None:
+                        nodes.add(child)
+                        if self._terminal[child]:
+                            nodes.add(self.ROOT)  # a word completed, the next one may begin
+                next_state = self._add_state(frozenset(nodes))
+            self._transitions[key] = next_state
+        return next_state
+
+    def allowed(self, states: np.ndarray, tokens: np.ndarray) -> np.ndarray:
+        """Return whether each token may extend the prefix in each state, shape [len(states), len(tokens)]."""
+        return self._masks[states[:, None], tokens[None, :]]
+
+    def transition(self, states: np.ndarray, tokens: np.ndarray) -> np.ndarray:
+        """Return the states of the prefixes in `states` extended by `tokens`, `REJECT` if not allowed."""
+        return np.array([self._transition(s, t) for s, t in zip(states.tolist(), tokens.tolist())], dtype=np.int32)
+
+    def is_final(self, states: np.ndarray) -> np.ndarray:
+        """Return whether the prefix in each state ends at a word boundary."""
+        return self._final[states]
@@ -0,0 +1,297 @@
+"""
+Contains a compact n-gram language model engine, an alternative to kenlm for the `Scorer`.
+
+`compile_arpa` converts an ARPA file into a binary of sorted arrays, one table per order:
+the n-grams are keyed by 64-bit hashes of their words and the log probabilities and backoffs are quantized.
+`NGramModel` memory maps the binary, so it loads in milliseconds and all the processes scoring with the same file,
+e.g. the workers of a `DecoderPool`, share one copy in the page cache.
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import argparse
+import functools
+import numpy as np
+from typing import Dict, List, Tuple, Iterator
+
+_MAGIC = b"DSNGRAM\x01"
+_ALIGNMENT = 64
+_MASK = (1 << 64) - 1
+_UNK, _BOS, _EOS = "<unk>", "<s>", "</s>"
+_UNK_LOG_PROB = -100.  # as kenlm, when the model has no <unk>
+_SUPPORTED_BITS = (8, 16)
+
+
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix(key: int, word: int) -> int:
+    """Extend the key of an n-gram by one word hash, with the splitmix64 finalizer."""
+    x = ((key * 0x9E3779B97F4A7C15) ^ word) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _ngram_key(words: Tuple[int, ...]) -> int:
+    key = words[0]
+    for word in words[1:]:
+        key = _mix(key, word)
+    return key
+
+
+def _aligned(size: int) -> int:
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+
+def _quantize(values: np.ndarray, bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize values into `2 ** bits` levels, exact if there are not more distinct values than levels,
+    otherwise by equal population bins whose centers are their means.
+
+    :return: A tuple 1) the codes of values; 2) the float32 codebook of the levels.
+    """
+    n_levels = 1 << bits
+    code_type = np.uint8 if bits == 8 else np.uint16
+    centers = np.zeros(n_levels, dtype=np.float32)
+    distinct = np.unique(values)
+    if len(distinct) <= n_levels:
+        centers[:len(distinct)] = distinct
+        return np.searchsorted(distinct, values).astype(code_type), centers
+    order = np.argsort(values, kind="stable")
+    bins = np.arange(len(values)) * n_levels // len(values)
+    codes = np.empty(len(values), dtype=code_type)
+    codes[order] = bins
+    centers[:] = np.bincount(bins, weights=values[order], minlength=n_levels) / np.bincount(bins, minlength=n_levels)
+    return codes, centers
+
+
+def _read_arpa(arpa_path: str) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Read the ARPA file into the hashed keys, log probabilities and backoffs of each order."""
+    tables: List[Tuple[List[int], List[float], List[float]]] = []
+    order = 0
+    with open(arpa_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("\\data\\") or line.startswith("ngram "):
+                continue
+            if line.startswith("\\end\\"):
+                break
+            if line.startswith("\\") and line.endswith("-grams:"):
+                order = int(line[1: -len("-grams:")])
+                if order != len(tables) + 1:
+                    raise ValueError("Invalid ARPA file %s, unexpected section %s" % (arpa_path, line))
+                tables.append(([], [], []))
+                continue
+            if order == 0:
+                raise ValueError("Invalid ARPA file %s, n-gram before any section: %s" % (arpa_path, line))
+            parts = line.split()
+            if len(parts) not in (order + 1, order + 2):
+                raise ValueError("Invalid ARPA line for %d-grams: %s" % (order, line))
+            keys, probs, backoffs = tables[-1]
+            keys.append(_ngram_key(tuple(_word_hash(w) for w in parts[1: order + 1])))
+            probs.append(float(parts[0]))
+            backoffs.append(float(parts[order + 1]) if len(parts) == order + 2 else 0.)
+    if not tables:
+        raise ValueError("Invalid ARPA file %s, no n-grams found" % arpa_path)
+
+    arrays = []
+    for n, (keys, probs, backoffs) in enumerate(tables, 1):
+        keys = np.array(keys, dtype=np.uint64)
+        index = np.argsort(keys)
+        keys = keys[index]
+        if len(keys) > 1 and np.any(keys[1:] == keys[:-1]):
+            raise ValueError("Duplicated or hash collided %d-grams in %s" % (n, arpa_path))
+        arrays.append((keys, np.array(probs)[index], np.array(backoffs)[index]))
+    return arrays
+
+
+def compile_arpa(arpa_path: str, binary_path: str, bits: int=8) -> None:
+    """
+    Compile an ARPA language model into the binary format of `NGramModel`.
+
+    :param arpa_path: Path of the ARPA file.
+    :param binary_path: Path to write the binary.
+    :param bits: Bits to quantize the log probabilities and backoffs, 8 or 16.
+                 As kenlm, the unigrams are not quantized, so the sentinels like the -99 of <s> are kept apart.
+    :raises ValueError: If the ARPA file is invalid, or bits is not supported.
+    """
+    if bits not in _SUPPORTED_BITS:
+        raise ValueError("bits should be one of %s, got %s" % (_SUPPORTED_BITS, bits))
+    tables = _read_arpa(arpa_path)
+    arrays: Dict[str, np.ndarray] = {}
+    for n, (keys, probs, backoffs) in enumerate(tables, 1):
+        arrays["keys_%d" % n] = keys
+        for name, values in [("prob", probs), ("backoff", backoffs)]:
+            if name == "backoff" and n == len(tables):  # the highest order has no backoff
+                continue
+            if n == 1:
+                arrays["%s_values_%d" % (name, n)] = values.astype(np.float32)
+            else:
+                arrays["%s_codes_%d" % (name, n)], arrays["%s_values_%d" % (name, n)] = _quantize(values, bits)
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = [offset, array.dtype.str, len(array)]
+        offset += _aligned(array.nbytes)
+    header = json.dumps({"order": len(tables), "bits": bits, "arrays": layout}).encode("utf-8")
+    data_start = _aligned(len(_MAGIC) + 8 + len(header))
+
+    with open(binary_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][0])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+
+
+class State(object):
+    """
+    The n-gram context of a scoring step, as `kenlm.State`.
+    It holds the keys of every suffix of the last `order - 1` words, longest first,
+    so a scoring step mixes each key with the new word once instead of hashing the whole context again.
+    """
+    __slots__ = ("keys", )
+
+    def __init__(self):
+        self.keys: Tuple[int, ...] = ()
+
+
+class NGramModel(object):
+    """
+    Memory mapped n-gram language model compiled by `compile_arpa`.
+    The scoring methods mirror `kenlm.Model`, so it plugs into the `Scorer` in place of kenlm,
+    and the log probabilities are in log10 as well.
+
+    :param model_path: Path of the compiled binary.
+    :param cache_size: Number of the recent (context, word) scores memoized in this process, beam search
+                       queries the same n-grams over and over. 0 to disable.
+    :raises IOError: If the file is not a compiled binary.
+    """
+    def __init__(self, model_path: str, cache_size: int=1 << 16):
+        if not self.is_binary(model_path):
+            raise IOError("Invalid n-gram binary path: %s" % model_path)
+        with open(model_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_length = int(np.frombuffer(self._mmap, dtype=np.uint64, count=1, offset=len(_MAGIC))[0])
+        header_start = len(_MAGIC) + 8
+        header = json.loads(self._mmap[header_start: header_start + header_length].decode("utf-8"))
+        data_start = _aligned(header_start + header_length)
+
+        # zero-copy views into the mapped file
+        arrays = {name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+                  for name, (offset, dtype, count) in header["arrays"].items()}
+        self.order: int = header["order"]
+        self.bits: int = header["bits"]
+        self._keys = [arrays["keys_%d" % n] for n in range(1, self.order + 1)]
+        # (codes, codebook) of each order, codes is None for the unquantized unigrams
+        self._probs = [(arrays.get("prob_codes_%d" % n), arrays["prob_values_%d" % n])
+                       for n in range(1, self.order + 1)]
+        self._backoffs = [(arrays.get("backoff_codes_%d" % n), arrays["backoff_values_%d" % n])
+                          for n in range(1, self.order)]
+        self._word_ids: Dict[str, int] = {}
+        if cache_size > 0:
+            self._score = functools.lru_cache(maxsize=cache_size)(self._score)
+
+        unk = _word_hash(_UNK)
+        index = self._find(1, unk)
+        self._unk = unk
+        self._unk_log_prob = self._prob(1, index) if index >= 0 else _UNK_LOG_PROB
+
+    @staticmethod
+    def is_binary(model_path: str) -> bool:
+        """Whether the file is a binary compiled by `compile_arpa`."""
+        if not os.path.isfile(model_path):
+            return False
+        with open(model_path, "rb") as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+
+    def _find(self, n: int, key: int) -> int:
+        """Return the index of the n-gram key in its table, -1 if not exists."""
+        keys = self._keys[n - 1]
+        i = int(keys.searchsorted(np.uint64(key)))
+        return i if i < len(keys) and keys[i] == key else -1
+
+    def _prob(self, n: int, index: int) -> float:
+        codes, values = self._probs[n - 1]
+        return float(values[index if codes is None else codes[index]])
+
+    def _backoff(self, n: int, index: int) -> float:
+        codes, values = self._backoffs[n - 1]
+        return float(values[index if codes is None else codes[index]])
+
+    def _word_id(self, word: str) -> int:
+        """The hash of the word, or of <unk> if the word is out of vocabulary."""
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = _word_hash(word)
+            if self._find(1, word_id) < 0:
+                word_id = self._unk
+            self._word_ids[word] = word_id
+        return word_id
+
+    def _score(self, context: Tuple[int, ...], word: int) -> Tuple[float, int, Tuple[int, ...]]:
+        """
+        Score word after the context with backoff.
+
+        :param context: The suffix keys of the context, longest first.
+        :param word: The word id.
+        :return: A tuple 1) the log10 probability; 2) the order of the matched n-gram;
+                         3) the suffix keys of the next context.
+        """
+        extended = tuple(_mix(key, word) for key in context) + (word, )
+        backoff = 0.
+        for i, key in enumerate(context):
+            n = len(context) - i + 1
+            index = self._find(n, extended[i])
+            if index >= 0:
+                log_prob = backoff + self._prob(n, index)
+                break
+            history_index = self._find(n - 1, key)
+            if history_index >= 0:
+                backoff += self._backoff(n - 1, history_index)
+        else:
+            n = 1
+            index = self._find(1, word)
+            log_prob = backoff + (self._prob(1, index) if index >= 0 else self._unk_log_prob)
+        return log_prob, n, extended[-(self.order - 1):] if self.order > 1 else ()
+
+    def BeginSentenceWrite(self, state: State) -> None:
+        state.keys = (_word_hash(_BOS), ) if self.order > 1 else ()
+
+    def NullContextWrite(self, state: State) -> None:
+        state.keys = ()
+
+    def BaseScore(self, in_state: State, word: str, out_state: State) -> float:
+        """Return the log10 probability of word after the context of `in_state`, and write the next context."""
+        log_prob, _, out_state.keys = self._score(in_state.keys, self._word_id(word))
+        return log_prob
+
+    def full_scores(self, sentence: str, bos: bool=True, eos: bool=True) -> Iterator[Tuple[float, int, bool]]:
+        """Yield the log10 probability, the matched n-gram order and whether oov, of each word in the sentence."""
+        state = State()
+        if bos:
+            self.BeginSentenceWrite(state)
+        context = state.keys
+        for word in sentence.split() + ([_EOS] if eos else []):
+            word_id = self._word_id(word)
+            log_prob, n, context = self._score(context, word_id)
+            yield log_prob, n, word_id == self._unk
+
+    def score(self, sentence: str, bos: bool=True, eos: bool=True) -> float:
+        """Return the log10 probability of the whole sentence."""
+        return sum(log_prob for log_prob, _, _ in self.full_scores(sentence, bos=bos, eos=eos))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--arpa_path", type=str, help="File path of the ARPA language model.", required=True)
+    parser.add_argument("--binary_path", type=str, help="File path to write the compiled binary.", required=True)
+    parser.add_argument("--bits", type=int, choices=_SUPPORTED_BITS, default=8, help="Quantization bits.")
+    args = parser.parse_args()
+    compile_arpa(args.arpa_path, args.binary_path, bits=args.bits)
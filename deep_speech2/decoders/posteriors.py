@@ -0,0 +1,96 @@
+"""Contains the on-disk cache of acoustic model posteriors, read back by memory mapping."""
+
+import os
+import numpy as np
+from typing import List, Optional
+
+
+class PosteriorCacheWriter(object):
+    """
+    Writer of the per-utterance softmax outputs of the acoustic model.
+    The outputs are appended back to back as float32 rows into `<path>.probs`,
+    and the frame offsets, lengths, transcripts and vocabulary are written to `<path>.index.npz` when closed.
+    If the writing is interrupted by an exception, the outputs are dropped, no partial cache is left.
+
+    :param path: The path prefix of the cache files.
+    :param vocabulary: Vocabulary list of the outputs, the last one is blank.
+    """
+    def __init__(self, path: str, vocabulary: List[str]):
+        self.path = path
+        self.vocabulary = vocabulary
+        self.n_classes = len(vocabulary)
+        self._file = open(path + ".probs", "wb")
+        self._lengths: List[int] = []
+        self._transcripts: List[str] = []
+
+    def append(self, probs: np.ndarray, transcript: str) -> None:
+        """
+        Append the outputs of one utterance.
+
+        :param probs: 2-D array of probability distributions, one row per frame.
+        :param transcript: The reference transcript of the utterance.
+        :raises ValueError: If the probs dimension mismatched with vocabulary.
+        """
+        probs = np.ascontiguousarray(probs, dtype=np.float32)
+        if probs.ndim != 2 or probs.shape[1] != self.n_classes:
+            raise ValueError("probs dimension mismatched with vocabulary")
+        self._file.write(probs.tobytes())
+        self._lengths.append(len(probs))
+        self._transcripts.append(transcript)
+
+    def close(self) -> None:
+        """Flush the outputs and write the index."""
+        if self._file.closed:
+            return
+        self._file.close()
+        lengths = np.array(self._lengths, dtype=np.int64)
+        offsets = np.cumsum(lengths) - lengths
+        np.savez(self.path + ".index.npz", offsets=offsets, lengths=lengths,
+                 transcripts=np.array(self._transcripts, dtype=str), vocabulary=np.array(self.vocabulary, dtype=str))
+
+    def __enter__(self) -> "PosteriorCacheWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self.path + ".probs")
+
+
+class PosteriorCache(object):
+    """
+    Reader of the outputs written by `PosteriorCacheWriter`.
+    The outputs file is memory mapped, so the processes reading the same cache share the page cache
+    and an utterance costs no copy until it is decoded.
+
+    :param path: The path prefix of the cache files.
+    :raises IOError: If the cache files don't exist.
+    """
+    def __init__(self, path: str):
+        if not self.exists(path):
+            raise IOError("Invalid posterior cache path: %s" % path)
+        with np.load(path + ".index.npz") as index:
+            self.offsets = index["offsets"]
+            self.lengths = index["lengths"]
+            self.transcripts: List[str] = index["transcripts"].tolist()
+            self.vocabulary: List[str] = index["vocabulary"].tolist()
+        self.n_classes = len(self.vocabulary)
+        total = int(self.lengths.sum())
+        self._probs: Optional[np.memmap] = \
+            np.memmap(path + ".probs", dtype=np.float32, mode="r", shape=(total, self.n_classes)) if total else None
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(path + ".probs") and os.path.isfile(path + ".index.npz")
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """The outputs of the i-th utterance, a read-only view into the mapped file."""
+        offset, length = self.offsets[i], self.lengths[i]
+        if self._probs is None:
+            return np.zeros((0, self.n_classes), dtype=np.float32)
+        return self._probs[offset: offset + length]
@@ -0,0 +1,100 @@
+"""Stateful External Scorer for Beam Search Decoder."""
+
+import os
+import kenlm
+import numpy as np
+from deep_speech2.decoders.ngram import NGramModel, State
+from typing import Dict, Tuple, Iterable, Any
+
+
+class Scorer(object):
+    """
+    External scorer to evaluate a prefix or whole sentence in beam search decoding,
+    including the score from n-gram language model and word count.
+
+    Besides the sentence-level `__call__`, the scorer caches the language model state reached by each decoded prefix,
+    keyed by the prefix node of the beam search. Extending a prefix by one word then costs one `BaseScore` call
+    instead of rescoring the whole sentence. The cache is owned by one search at a time, which resets it for every
+    utterance and evicts the states of the pruned prefixes.
+
+    :param alpha: Parameter associated with language model. Don't use language model when alpha = 0.
+    :param beta: Parameter associated with word count. Don't use word count when beta = 0.
+    :model_path: Path to load language model. A binary compiled by `ngram.compile_arpa` is memory mapped
+                 by `NGramModel`, other files are loaded by kenlm.
+    """
+    ROOT = 0
+
+    def __init__(self, alpha: float, beta: float, model_path: str):
+        self.alpha = alpha
+        self.beta = beta
+        if not os.path.isfile(model_path):
+            raise IOError("Invalid language model path: %s" % model_path)
+        if NGramModel.is_binary(model_path):
+            self.lm = NGramModel(model_path)
+            self._state_type = State
+        else:
+            self.lm = kenlm.Model(model_path)
+            self._state_type = kenlm.State
+        self.reset_cache()
+
+    def _language_model_log_score(self, sentence: str):
+        res = 0.0
+        for log_prob, ngram_length, oov in self.lm.full_scores(sentence, eos=None):
+            res = log_prob
+        return res
+
+    def reset_params(self, alpha: float, beta: float):
+        self.alpha = alpha
+        self.beta = beta
+
+    @staticmethod
+    def _word_count(sentence: str):
+        return len(sentence.strip().split(" "))
+
+    def _combine(self, lm_log_score: float, word_cnt: int, log: bool):
+        """Combine the language model log score and the word count into the final score."""
+        if log:
+            return self.alpha * lm_log_score + self.beta * np.log(word_cnt)
+        lm_score = np.power(10, lm_log_score)
+        return np.power(lm_score, self.alpha) + np.power(word_cnt, self.beta)
+
+    def __call__(self, sentence: str, log=False):
+        lm_log_score = self._language_model_log_score(sentence)
+        word_cnt = self._word_count(sentence)
+        return self._combine(lm_log_score, word_cnt, log)
+
+    def reset_cache(self) -> None:
+        """Drop all cached states, only the sentence beginning state is kept under the root prefix."""
+        state = self._state_type()
+        self.lm.BeginSentenceWrite(state)
+        self._states: Dict[int, Tuple[Any, int]] = {self.ROOT: (state, 0)}
+
+    def score_extension(self, history: int, node: int, word: str, num_spaces: int=1, log=False):
+        """
+        Score the prefix `node` which completes `word` after the prefix `history`, caching the reached state.
+        The result is the same as `__call__` on the text of `node`.
+
+        :param history: Prefix node of the words before `word`, it must have been scored (or be the root).
+        :param node: Prefix node ending with `word`.
+        :param word: The newly completed word.
+        :param num_spaces: Number of spaces between `history` and `word`. As `_word_count` splits on every single
+                           space, each of them counts as one more word after the first one.
+        :param log: Whether to return the score in log space.
+        :raises KeyError: If `history` is not in the cache.
+        """
+        in_state, word_cnt = self._states[history]
+        word_cnt = word_cnt + num_spaces if history != self.ROOT else 1
+        out_state = self._state_type()
+        lm_log_score = self.lm.BaseScore(in_state, word, out_state)
+        self._states[node] = (out_state, word_cnt)
+        return self._combine(lm_log_score, word_cnt, log)
+
+    def evict(self, keep: Iterable[int]) -> None:
+        """Drop the cached states of the prefixes not in `keep`."""
+        keep = set(keep)
+        keep.add(self.ROOT)
+        self._states = {node: value for node, value in self._states.items() if node in keep}
+
+    @property
+    def cache_size(self) -> int:
+        return len(self._states)
@@ -1,6 +1,42 @@
 """Test decoders."""
+import os
+import re
+import tempfile
 import unittest
+import kenlm
+import numpy as np
 from deep_speech2.decoders import decoders_deprecated as decoder
+from deep_speech2.decoders import decoders
+from deep_speech2.decoders import benchmark
+from deep_speech2.decoders.beam_search import PrefixBeamSearch
+from deep_speech2.decoders.lexicon import Lexicon
+from deep_speech2.decoders.ngram import NGramModel, compile_arpa
+from deep_speech2.decoders.posteriors import PosteriorCache, PosteriorCacheWriter
+from deep_speech2.decoders.scorer import Scorer
+from utils.ctc import ctc_greedy_decode_batch
+
+_ARPA = """
+\\data\\
+ngram 1=7
+ngram 2=4
+
+\\1-grams:
+-1.0\t<unk>\t0
+0\t<s>\t-0.30
+-1.0\t</s>\t0
+-0.6\t'\t-0.2
+-0.7\ta\t-0.2
+-0.8\tab\t-0.1
+-0.9\tcd\t-0.1
+
+\\2-grams:
+-0.2\t<s> a
+-0.3\ta ab
+-0.4\tab cd
+-0.5\tcd a
+
+\\end\\
+"""
 
 
 class TestDecoders(unittest.TestCase):
@@ -34,6 +70,31 @@ class TestDecoders(unittest.TestCase):
         ]
         self.assertEqual(bst_result, self.greedy_result)
 
+    def test_greedy_batch_decoder(self):
+        bst_result = decoders.ctc_greedy_decoder_batch(
+            self.probs_seq, blank_index=len(self.vocab_list), vocabulary=self.vocab_list)
+        self.assertEqual(bst_result, self.greedy_result)
+
+        # padded batch with lengths gives the same as decoding one by one
+        rng = np.random.RandomState(0)
+        lengths = rng.randint(1, 50, size=8)
+        probs = rng.dirichlet(np.ones(len(self.vocab_list) + 1) * 0.3, size=(8, 50))
+        bst_result = decoders.ctc_greedy_decoder_batch(probs, blank_index=len(self.vocab_list), lengths=lengths)
+        expected = [
+            [int(index) for index in decoder.ctc_greedy_decoder(probs_seq[:length], len(self.vocab_list))
+             if index != len(self.vocab_list)]
+            for probs_seq, length in zip(probs, lengths)
+        ]
+        self.assertEqual(bst_result, expected)
+
+        # a list of unpadded arrays with lengths shorter than them, as tf_research and audier pass
+        decoded, decoded_lengths = ctc_greedy_decode_batch(
+            [np.eye(3)[[0, 1, 2, 0, 1]], np.eye(3)[[1, 0, 0, 1]]], lengths=[3, 2], blank_index=2)
+        self.assertEqual(decoded.tolist(), [[0, 1], [1, 0]])
+        self.assertEqual(decoded_lengths.tolist(), [2, 2])
+        decoded, decoded_lengths = ctc_greedy_decode_batch(list(probs), lengths=lengths, blank_index=-1)
+        self.assertEqual([ids[:n] for ids, n in zip(decoded.tolist(), decoded_lengths)], expected)
+
     def test_beam_decoder(self):
         bst_result = [
             decoder.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list) for probs_seq in self.probs_seq
@@ -48,6 +109,224 @@ class TestDecoders(unittest.TestCase):
         bst_result = [result[0][1] for result in bst_result]
         self.assertEqual(bst_result, self.beam_search_result)
 
+    def test_prefix_beam_decoder(self):
+        bst_result = [
+            decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list) for probs_seq in self.probs_seq
+        ]
+        bst_result = [result[0][1] for result in bst_result]
+        self.assertEqual(bst_result, self.beam_search_result)
+
+    def test_prefix_beam_decoder_parity(self):
+        # small beams over long inputs prune prefixes which are decoded again later, they must merge as one
+        rng = np.random.RandomState(1)
+        for alpha, beam_size in [(0.1, 2), (0.3, 4), (1., 8), (3., 16)]:
+            for probs_seq in rng.dirichlet(np.full(len(self.vocab_list) + 1, alpha), size=(20, 80)):
+                expected = dict((text, score) for score, text in
+                                decoder.ctc_beam_search_decoder(probs_seq, beam_size, self.vocab_list))
+                result = dict((text, score) for score, text in
+                              decoders.ctc_beam_search_decoder(probs_seq, beam_size, self.vocab_list))
+                self.assertEqual(sorted(result), sorted(expected))
+                np.testing.assert_allclose([result[text] for text in expected], list(expected.values()))
+
+    def test_prefix_beam_batch_decoder(self):
+        bst_result =\
+            decoders.ctc_beam_search_decoder_batch(self.probs_seq, self.beam_size, self.vocab_list, num_processes=2)
+        bst_result = [result[0][1] for result in bst_result]
+        self.assertEqual(bst_result, self.beam_search_result)
+
+    def test_decoder_pool(self):
+        scorer = lambda sentence: 1. + len(sentence) % 3
+        expected = [
+            decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list, ext_scoring_func=scorer)
+            for probs_seq in self.probs_seq
+        ]
+        with decoders.DecoderPool(self.beam_size, self.vocab_list, num_processes=2,
+                                  scorer_factory=lambda: scorer) as pool:
+            # the same pool is reused across batches, including a growing one
+            for probs_split in [self.probs_seq, self.probs_seq[::-1], self.probs_seq * 3]:
+                results = pool.decode(probs_split)
+                self.assertEqual(len(results), len(probs_split))
+            self.assertEqual(pool.decode(self.probs_seq), expected)
+
+    def test_stateful_scorer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "lm.arpa")
+            with open(model_path, "w") as f:
+                f.write(_ARPA)
+            scorer = Scorer(alpha=0.5, beta=1.0, model_path=model_path)
+
+        rng = np.random.RandomState(0)
+        for probs_seq in rng.dirichlet(np.full(len(self.vocab_list) + 1, 0.5), size=(10, 40)):
+            # a plain function only sees the sentence, the scorer itself uses the cached states
+            expected = decoders.ctc_beam_search_decoder(
+                probs_seq, self.beam_size, self.vocab_list, ext_scoring_func=lambda sentence: scorer(sentence))
+            result = decoders.ctc_beam_search_decoder(
+                probs_seq, self.beam_size, self.vocab_list, ext_scoring_func=scorer)
+            self.assertEqual([text for _, text in result], [text for _, text in expected])
+            np.testing.assert_allclose([score for score, _ in result], [score for score, _ in expected])
+            # states of the live histories plus the last words scored by the results
+            self.assertLessEqual(scorer.cache_size, 2 * self.beam_size + 1)
+
+    def test_ngram_model(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            arpa_path = os.path.join(tmp_dir, "lm.arpa")
+            binary_path = os.path.join(tmp_dir, "lm.bin")
+            with open(arpa_path, "w") as f:
+                f.write(_ARPA)
+            compile_arpa(arpa_path, binary_path, bits=8)
+            self.assertTrue(NGramModel.is_binary(binary_path))
+            self.assertFalse(NGramModel.is_binary(arpa_path))
+            lm, reference = NGramModel(binary_path), kenlm.Model(arpa_path)
+            arpa_scorer = Scorer(alpha=0.5, beta=1.0, model_path=arpa_path)
+            binary_scorer = Scorer(alpha=0.5, beta=1.0, model_path=binary_path)
+
+        for sentence in ["a ab cd", "cd a ab ' a", "a zz ab", "", "ab ab ab cd"]:
+            for bos, eos in [(True, True), (True, False), (False, True)]:
+                expected = list(reference.full_scores(sentence, bos=bos, eos=eos))
+                result = list(lm.full_scores(sentence, bos=bos, eos=eos))
+                np.testing.assert_allclose([x[0] for x in result], [x[0] for x in expected], atol=1e-6)
+                self.assertEqual([x[1:] for x in result], [x[1:] for x in expected])
+
+        rng = np.random.RandomState(0)
+        for probs_seq in rng.dirichlet(np.full(len(self.vocab_list) + 1, 0.5), size=(5, 40)):
+            expected = decoders.ctc_beam_search_decoder(
+                probs_seq, self.beam_size, self.vocab_list, ext_scoring_func=arpa_scorer)
+            result = decoders.ctc_beam_search_decoder(
+                probs_seq, self.beam_size, self.vocab_list, ext_scoring_func=binary_scorer)
+            self.assertEqual([text for _, text in result], [text for _, text in expected])
+            np.testing.assert_allclose([score for score, _ in result], [score for score, _ in expected], atol=1e-5)
+
+    def test_lexicon_decoder(self):
+        rng = np.random.RandomState(0)
+        probs_split = rng.dirichlet(np.full(len(self.vocab_list) + 1, 0.5), size=(10, 40))
+
+        # every token as a word is no constraint
+        lexicon = Lexicon([[token] for token in self.vocab_list], self.vocab_list)
+        for probs_seq in probs_split:
+            self.assertEqual(
+                decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list, lexicon=lexicon),
+                decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lexicon_path = os.path.join(tmp_dir, "lexicon.txt")
+            with open(lexicon_path, "w") as f:
+                f.write("ab\ncd\nabd\nxy\n")
+            lexicon = Lexicon.from_file(lexicon_path, self.vocab_list)
+        self.assertEqual((lexicon.num_words, lexicon.num_skipped_words), (3, 1))
+
+        for probs_seq in probs_split:
+            results = decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list, lexicon=lexicon)
+            # sequences of words, the incomplete ones ending with a word prefix are ranked last
+            complete = [re.fullmatch(r"(ab|abd|cd| )*", text) is not None for _, text in results]
+            self.assertEqual(complete, sorted(complete, reverse=True))
+            for _, text in results:
+                self.assertRegex(text, r"^(ab|abd|cd| )*(a|c)?$")
+
+        # a beam repeating its last token stays on its prefix, even if the lexicon allows no extension by it
+        probs_seq = np.full((5, len(self.vocab_list) + 1), 0.1 / len(self.vocab_list))
+        probs_seq[np.arange(5), [2, 3, 3, 3, 3]] = 0.9
+        lexicon = Lexicon([["a", "b"]], self.vocab_list)
+        for beam_size in [1, 2]:
+            score, text = decoders.ctc_beam_search_decoder(probs_seq, beam_size, self.vocab_list, lexicon=lexicon)[0]
+            self.assertEqual(text, "ab")
+            self.assertGreater(score, 5 * np.log(0.9) - 0.1)
+
+    def test_benchmark(self):
+        posteriors = benchmark.make_posteriors(50, 30, seed=1)
+        np.testing.assert_array_equal(posteriors, benchmark.make_posteriors(50, 30, seed=1))
+        np.testing.assert_allclose(posteriors.sum(axis=1), 1., rtol=1e-5)
+
+        results = benchmark.run_benchmark(
+            vocab_types=["eng"], frame_counts=[20], beam_sizes=[4], cutoffs=[(1.0, 40)],
+            scorers={"none": None, "word_count": benchmark.word_count_scorer}, batch_size=2, num_processes=1,
+            repeats=1)
+        self.assertEqual([r["decoder"] for r in results],
+                         ["greedy", "greedy_batch", "beam", "beam_batch", "beam", "beam_batch"])
+        comparisons = benchmark.compare(results, results)
+        self.assertEqual(len(comparisons), len(results))
+        self.assertTrue(all(c["speedup"] == 1. for c in comparisons))
+
+    def test_streaming_decoder(self):
+        scorer = lambda sentence: 1. + len(sentence) % 3
+        rng = np.random.RandomState(0)
+        probs_seq = rng.dirichlet(np.ones(len(self.vocab_list) + 1), size=100)
+        expected = decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list, ext_scoring_func=scorer)
+
+        streaming_decoder = decoders.StreamingDecoder(self.beam_size, self.vocab_list, ext_scoring_func=scorer)
+        for _ in range(2):  # the decoder is reusable after finalize
+            for start, end in [(0, 7), (7, 8), (8, 50), (50, 100)]:
+                streaming_decoder.push(probs_seq[start: end])
+                self.assertEqual(streaming_decoder.num_frames, end)
+                partial = streaming_decoder.partial_results()
+                self.assertEqual(partial[0], decoders.ctc_beam_search_decoder(
+                    probs_seq[:end], self.beam_size, self.vocab_list, ext_scoring_func=scorer)[0])
+            self.assertEqual(streaming_decoder.finalize(), expected)
+            self.assertEqual(streaming_decoder.num_frames, 0)
+
+    def test_posterior_cache(self):
+        rng = np.random.RandomState(0)
+        vocabulary = self.vocab_list + ["_"]
+        utterances = [rng.dirichlet(np.ones(len(vocabulary)), size=n) for n in [5, 0, 17]]
+        transcripts = ["ab cd", "", "a"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "dev")
+            with PosteriorCacheWriter(path, vocabulary) as writer:
+                for probs, transcript in zip(utterances, transcripts):
+                    writer.append(probs, transcript)
+            cache = PosteriorCache(path)
+            self.assertEqual(len(cache), 3)
+            self.assertEqual(cache.transcripts, transcripts)
+            self.assertEqual(cache.vocabulary, vocabulary)
+            for i, probs in enumerate(utterances):
+                np.testing.assert_array_equal(cache[i], probs.astype(np.float32))
+            del cache
+
+            with self.assertRaises(ValueError):
+                with PosteriorCacheWriter(os.path.join(tmp_dir, "broken"), vocabulary) as writer:
+                    writer.append(utterances[0][:, 1:], "")
+            self.assertFalse(PosteriorCache.exists(os.path.join(tmp_dir, "broken")))
+
+    def test_blank_frame_skipping(self):
+        # interleave the toy frames with blank-dominant frames
+        blank_frame = [0.002] * len(self.vocab_list) + [1. - 0.002 * len(self.vocab_list)]
+        for probs_seq, expected in zip(self.probs_seq, self.beam_search_result):
+            probs_seq = np.array([frame for row in probs_seq for frame in [row, blank_frame, blank_frame]])
+            searcher = PrefixBeamSearch(self.beam_size, self.vocab_list, blank_skip_threshold=0.95)
+            searcher.advance(probs_seq)
+            self.assertEqual(searcher.num_skipped_frames, 2 * len(probs_seq) // 3)
+            self.assertEqual(searcher.num_frames, len(probs_seq))
+
+            # frame by frame skipping is the same as collapsing the runs
+            stepper = PrefixBeamSearch(self.beam_size, self.vocab_list, blank_skip_threshold=0.95)
+            for frame in probs_seq:
+                stepper.step(frame)
+            stepped, collapsed = dict(map(reversed, stepper.results())), dict(map(reversed, searcher.results()))
+            self.assertEqual(stepped.keys(), collapsed.keys())
+            np.testing.assert_allclose([stepped[text] for text in collapsed], list(collapsed.values()))
+
+            result = decoders.ctc_beam_search_decoder(
+                probs_seq, self.beam_size, self.vocab_list, blank_skip_threshold=0.95)
+            self.assertEqual(result[0][1], decoders.ctc_beam_search_decoder(
+                probs_seq, self.beam_size, self.vocab_list)[0][1])
+
+    def test_prefix_beam_decoder_consistency(self):
+        rng = np.random.RandomState(0)
+        scorer = lambda sentence: 1. + len(sentence) % 3
+        for probs_seq in rng.dirichlet(np.ones(len(self.vocab_list) + 1), size=(5, 20)):
+            for cutoff_prob, cutoff_top_n in [(1.0, 40), (0.9, 3)]:
+                expected = decoder.ctc_beam_search_decoder(
+                    probs_seq, self.beam_size, self.vocab_list, cutoff_prob, cutoff_top_n, scorer)
+                result = decoders.ctc_beam_search_decoder(
+                    probs_seq, self.beam_size, self.vocab_list, cutoff_prob, cutoff_top_n, scorer)
+                self.assertEqual(result[0][1], expected[0][1])
+                self.assertAlmostEqual(result[0][0], expected[0][0], places=6)
+
+    def test_prefix_beam_decoder_long_utterance(self):
+        # linear probabilities underflow here, log space keeps a finite score
+        probs_seq = np.tile(self.probs_seq1, (200, 1))
+        result = decoders.ctc_beam_search_decoder(probs_seq, self.beam_size, self.vocab_list)
+        self.assertTrue(np.isfinite(result[0][0]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,75 @@
+"""Grid search of the language model parameters over the cached acoustic model posteriors."""
+
+import itertools
+import multiprocessing
+from deep_speech2.decoders.decoders import ctc_beam_search_decoder
+from deep_speech2.decoders.posteriors import PosteriorCache
+from deep_speech2.decoders.scorer import Scorer
+from deep_speech2.tools.metrics import EditDistance
+from collections import namedtuple
+from typing import Dict, Optional, Iterable, Iterator, Tuple, Any
+
+GridPoint = namedtuple("GridPoint", ["alpha", "beta", "cer", "wer"])
+
+# the posterior cache, scorer and decoding params of each grid search worker
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(cache_path: str, model_path: str, decode_params: Dict[str, Any]):
+    """Open the posterior cache and load the language model once per worker process."""
+    cache = PosteriorCache(cache_path)
+    _worker_state["cache"] = cache
+    _worker_state["scorer"] = Scorer(alpha=0., beta=0., model_path=model_path)
+    _worker_state["decode_params"] = dict(decode_params, vocabulary=cache.vocabulary[:-1])  # without blank
+
+
+def _evaluate(params: Tuple[float, float]) -> GridPoint:
+    """Decode the whole cache with one (alpha, beta) and measure the error rates."""
+    alpha, beta = params
+    cache: PosteriorCache = _worker_state["cache"]
+    scorer: Scorer = _worker_state["scorer"]
+    scorer.reset_params(alpha, beta)
+    results = [ctc_beam_search_decoder(cache[i], ext_scoring_func=scorer, **_worker_state["decode_params"])[0][1]
+               for i in range(len(cache))]
+    return GridPoint(alpha=alpha, beta=beta,
+                     cer=EditDistance.char_error_rate(results, cache.transcripts),
+                     wer=EditDistance.word_error_rate(results, cache.transcripts))
+
+
+def grid_search(cache_path: str, model_path: str, alphas: Iterable[float], betas: Iterable[float],
+                beam_size: int, num_processes: int, cutoff_prob: float=1.0,
+                cutoff_top_n: int=40, blank_skip_threshold: Optional[float]=None,
+                start_method: Optional[str]=None) -> Iterator[GridPoint]:
+    """
+    Evaluate every (alpha, beta) of the grid on the posteriors cached by `PosteriorCacheWriter`.
+    The acoustic model is not involved, each grid point costs the beam search decoding only.
+    The grid points are distributed over the worker processes, which map the same cache file
+    and load the language model once.
+
+    :param cache_path: The path prefix of the posterior cache.
+    :param model_path: Path to load language model.
+    :param alphas: The candidates of the language model weight.
+    :param betas: The candidates of the word count weight.
+    :param beam_size: Width for beam search.
+    :param num_processes: Number of parallel processes.
+    :param cutoff_prob: Cutoff probability in pruning, default 1.0, no pruning.
+    :param cutoff_top_n: Cutoff length in pruning, default 40.
+    :param blank_skip_threshold: If given, collapse runs of frames whose blank probability is not smaller than it
+                                 into one blank update, default None.
+    :param start_method: The start method of the worker processes, default the platform default.
+                         Use 'spawn' if the caller has started threads, e.g. a tensorflow session.
+    :return: Iterator of the `GridPoint` results, in the order of the grid.
+    """
+    if not PosteriorCache.exists(cache_path):
+        raise IOError("Invalid posterior cache path: %s" % cache_path)
+    if num_processes <= 0:
+        raise ValueError("num_processes must be positive, got %d" % num_processes)
+
+    decode_params = dict(beam_size=beam_size, cutoff_prob=cutoff_prob,
+                         cutoff_top_n=cutoff_top_n, blank_skip_threshold=blank_skip_threshold)
+    grid = list(itertools.product(alphas, betas))
+    context = multiprocessing.get_context(start_method)
+    with context.Pool(processes=max(min(num_processes, len(grid)), 1), initializer=_init_worker,
+                      initargs=(cache_path, model_path, decode_params)) as pool:
+        for point in pool.imap(_evaluate, grid):
+            yield point
@@ -58,7 +58,9 @@ def get_data_params(args: Dict[str, Any]) -> Dict[str, Any]:
         data_file=args["data_file"], vocab_file=args["vocab_file"], vocab_type=args["vocab_type"],
         mean_std_file=args["mean_std_file"], stride_ms=args["stride_ms"], window_ms=args["window_ms"],
         max_freq=args["max_freq"], sample_rate=args["sample_rate"], specgram_type=args["specgram_type"],
-        use_dB_normalization=args["use_dB_normalization"], random_seed=args["random_seed"])
+        use_dB_normalization=args["use_dB_normalization"], random_seed=args["random_seed"],
+        dtype=args.get("dtype", "float32"),
+        feature_store_path=args.get("feature_store_path"), feature_store_max_gb=args.get("feature_store_max_gb"))
 
 
 def get_model_params(args: Dict[str, Any]) -> Dict[str, Any]:
@@ -89,6 +91,9 @@ if __name__ == '__main__':
     parser.add_argument("--max_freq", type=float, help="The max freq to limit the audio features.")
     parser.add_argument("--specgram_type", type=str, default="linear", choices=["linear", "mfcc"], help="The feature type to generate")
     parser.add_argument("--use_dB_normalization", type=bool, default=True, help="Whether to normalize the audio to -20 dB before extracting the features.")
+    parser.add_argument("--dtype", type=str, default="float32", choices=["float16", "float32", "float64"], help="The dtype of the features fed in.")
+    parser.add_argument("--feature_store_path", type=str, default=None, help="The directory of the feature store.")
+    parser.add_argument("--feature_store_max_gb", type=float, default=None, help="The size bound of the feature store.")
     parser.add_argument("--rnn_hidden_size", type=int, default=800, help="The hidden size of RNNs.")
     parser.add_argument("--rnn_hidden_layers", type=int, default=5, help="The num of RNN layers.")
     parser.add_argument("--rnn_type", type=str, default="gru", help="Type of RNN cell.")
@@ -89,6 +89,7 @@ class Model(object):
             # Train on multi-gpu
             tower_grads = []
             tower_decoded = []
+            tower_posteriors = []
             with tf.variable_scope("Inference", reuse=tf.AUTO_REUSE):
                 for i in range(self.gpu_num):
                     with tf.device("/GPU:%d" % i):
@@ -104,9 +105,12 @@ class Model(object):
                             with tf.name_scope("decode"):
                                 decoded = self.acoustic_model.decode(features=features, input_length=input_length)
                                 tower_decoded.append(decoded)
+                                tower_posteriors.append(
+                                    self.acoustic_model.posteriors(features=features, input_length=input_length))
 
             self.loss = tf.add_n(tf.get_collection("loss"))
             self.decoded = tower_decoded
+            self.posteriors = tower_posteriors
 
             grads = self.average_gradients(tower_grads)
             self.train_op = opt.apply_gradients(grads, global_step=global_step)
@@ -226,4 +230,16 @@ class Model(object):
         results = [unp.trim(v, -1, "b").tolist() for part in results for v in part]
         return results
 
+    def predict_posteriors(self, sess: tf.Session) -> Tuple[List[np.ndarray], List[List[int]]]:
+        """
+        Run the acoustic model only, for decoding outside the graph.
 
+        :return: A tuple 1) the softmax outputs of each utterance, shape [n_frames, num_classes];
+                         2) the label ids of each utterance.
+        """
+        posteriors, labels, label_length = \
+            sess.run([self.posteriors, tf.concat(self.labels, axis=0), tf.concat(self.label_length, axis=0)],
+                     feed_dict={self.is_train: False})
+        probs = [p[:length] for part, lengths in posteriors for p, length in zip(part, lengths)]
+        labels = [label[:length].tolist() for label, length in zip(labels, label_length.reshape(-1,))]
+        return probs, labels
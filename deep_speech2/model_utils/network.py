@@ -196,6 +196,15 @@ class DeepSpeech2(object):
         loss = self._ctc_loss(label_length=label_length, ctc_input_length=ctc_input_length, labels=labels, logits=logits)
         return loss
 
+    def posteriors(self, features: tf.Tensor, input_length: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+        """Get the softmax outputs and their valid lengths, the inputs of the external beam search decoders"""
+        logits = self.inference(inputs=features, training=False)
+        ctc_input_length = self._compute_length_after_conv(
+            max_time_steps=tf.shape(features)[1],
+            ctc_time_steps=tf.shape(logits)[1],
+            input_length=input_length)
+        return tf.nn.softmax(logits), tf.reshape(ctc_input_length, [-1])
+
     def decode(self, features: tf.Tensor, input_length: tf.Tensor) -> tf.Tensor:
         """Get the ctc decoded labels"""
         logits = self.inference(inputs=features, training=False)
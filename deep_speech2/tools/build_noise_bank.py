@@ -0,0 +1,16 @@
+"""Pack the noise recordings of a noise data file into a noise bank for `NoisePerturbAugmentor`."""
+import argparse
+from deep_speech2.data_utils.noise_bank import build_noise_bank
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--noise_file_path", type=str, help="Filepath of noise data")
+    parser.add_argument("--bank_path", type=str, help="The path prefix of the noise bank files to write")
+    parser.add_argument("--sample_rate", type=int, default=16000, help="The sample rate of the bank")
+    parser.add_argument("--dtype", type=str, choices=["int16", "float32"], default="int16", help="Sample type of the bank")
+    parser.add_argument("--window_ms", type=float, default=10., help="Window size of the energy statistics")
+
+    args = parser.parse_args()
+    build_noise_bank(args.noise_file_path, args.bank_path, sample_rate=args.sample_rate, dtype=args.dtype,
+                     window_ms=args.window_ms)
@@ -1,5 +1,6 @@
 """统计特征的 mean和 std，便于后续计算"""
 import argparse
+import functools
 from deep_speech2.data_utils.featurizer.audio_featurizer import AudioFeaturizer
 from deep_speech2.data_utils.normalizer import FeatureNormalizer
 
@@ -8,19 +9,27 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--file_path", type=str, help="Filepath of data")
     parser.add_argument("--num_samples", type=int, default=2000, help="num of samples to stat")
+    parser.add_argument("--all_samples", action="store_true", help="Stat all samples instead of `num_samples`.")
     parser.add_argument("--specgram_type", type=str, choices=["linear", "mfcc"], help="Audio feature type. Option: linear, mfcc")
+    parser.add_argument("--num_proc", type=int, default=1, help="Number of parallel featurizing processes.")
+    parser.add_argument("--checkpoint_path", type=str, default=None,
+                        help="Filepath (.npz) of the partial stats, to resume an interrupted stat from.")
+    parser.add_argument("--checkpoint_interval", type=int, default=16,
+                        help="Number of chunks of instances between two writes of the checkpoint.")
     parser.add_argument("--output_path", type=str, help="Filepath to write mean and std (.npz)")
 
     args = parser.parse_args()
     featurizer = AudioFeaturizer(specgram_type=args.specgram_type)
 
-    def feature_func(audio_segment):
-        return featurizer.featurize(audio_segment, allow_upsampling=True, allow_downsampling=True)
-
+    # picklable, for the worker processes of any start method
+    feature_func = functools.partial(featurizer.featurize, allow_upsampling=True, allow_downsampling=True)
     normalizer = FeatureNormalizer(
         mean_std_filepath=None,
         data_path=args.file_path,
         featurize_func=feature_func,
-        num_samples=args.num_samples)
+        num_samples=None if args.all_samples else args.num_samples,
+        num_processes=args.num_proc,
+        checkpoint_path=args.checkpoint_path,
+        checkpoint_interval=args.checkpoint_interval)
 
     normalizer.write_to_file(args.output_path)
@@ -18,7 +18,7 @@ class EditDistance:
         """ Calculate the WE(word error) between decode and target"""
         decode = decode.split(word_sep)
         target = target.split(word_sep)
-        word2index = {w: i for i, w in set(decode + target)}
+        word2index = {w: i for i, w in enumerate(set(decode + target))}
         decode = "".join([chr(word2index[w]) for w in decode])
         target = "".join([chr(word2index[w]) for w in target])
         return Levenshtein.distance(decode, target)
@@ -33,6 +33,10 @@ class EditDistance:
         if len(decode) != len(target):
             raise ValueError("Unmatched length between decode: %d and target: %d" % (len(decode), len(target)))
 
+        if isinstance(decode[0], str) and isinstance(target[0], str):
+            ces = [cls._char_error(x, y) / len(y) for x, y in zip(decode, target) if y != ""]
+            return sum(ces) / len(ces)
+
         if isinstance(decode[0], int) and isinstance(target[0], int):
             decode = "".join([chr(x) for x in decode])
             target = "".join([chr(x) for x in target])
@@ -43,3 +47,16 @@ class EditDistance:
             target = ["".join([chr(x) for x in v]) for v in target]
             ces = [cls._char_error(x, y) / len(y) for x, y in zip(decode, target) if y != ""]
             return sum(ces) / len(ces)
+
+    @classmethod
+    def word_error_rate(cls, decode: Union[str, Iterable[str]], target: Union[str, Iterable[str]],
+                        word_sep: str = " ") -> float:
+        """Calculate the WER(word error rate) between decode and target sentences"""
+        if isinstance(decode, str) and isinstance(target, str):
+            return cls._word_error(decode, target, word_sep) / len(target.split(word_sep))
+
+        decode, target = list(decode), list(target)
+        if len(decode) != len(target):
+            raise ValueError("Unmatched length between decode: %d and target: %d" % (len(decode), len(target)))
+        wes = [cls._word_error(x, y, word_sep) / len(y.split(word_sep)) for x, y in zip(decode, target) if y != ""]
+        return sum(wes) / len(wes)
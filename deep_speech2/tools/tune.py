@@ -0,0 +1,96 @@
+"""
+Tune the language model parameters (alpha, beta) of the beam search decoder on the dev data.
+The acoustic model runs once over the dev data and its softmax outputs are cached on disk,
+then the whole (alpha, beta) grid is decoded from the cache by parallel workers.
+"""
+
+import os
+import argparse
+import numpy as np
+from deep_speech2.decoders.posteriors import PosteriorCache, PosteriorCacheWriter
+from deep_speech2.decoders.tuning import grid_search
+
+
+def cache_posteriors(param_file: str, cache_path: str, batch_size: int):
+    """Run the acoustic model of the training config over the dev data and cache the softmax outputs."""
+    # tensorflow is only needed to fill the cache, keep it out of the decoding workers
+    import math
+    import tensorflow as tf
+    from tqdm import tqdm
+    from evan_utils.confighandler import ConfigHandler
+    from evan_utils.utensorflow.record import generate_feature_desc
+    from deep_speech2.main import get_data_params, get_model_params, build_session
+    from deep_speech2.model_utils.model import Model
+    from deep_speech2.data_utils.data import DataGenerator
+    from deep_speech2.data_utils.featurizer.text_featurizer import TextFeaturizer
+
+    args = ConfigHandler.from_xml(param_file).get_args(as_namespace=False)
+    model_dir = args["model_dir"]
+    eval_data = DataGenerator(partition="dev", keep_transcription_text=False, **get_data_params(args))
+    record_file = os.path.join(model_dir, "eval_data.record")
+    if not os.path.exists(record_file):
+        eval_data.write_to_record(record_file)
+
+    model_params = get_model_params(args)
+    model_params["gpu_num"] = 1  # no tail of the batches is dropped by splitting across towers
+    feature_descriptions = generate_feature_desc(os.path.join(model_dir, "train_data.xml"))
+    model = Model(num_classes=eval_data.num_classes, n_features=eval_data.n_features,
+                  feature_descriptions=feature_descriptions, **model_params)
+    sess = build_session(model.graph)
+    ckpt_state = tf.train.get_checkpoint_state(model_dir)
+    if not ckpt_state:
+        raise IOError("No model checkpoints found in %s" % model_dir)
+    model.restore(sess, ckpt_state.model_checkpoint_path)
+
+    vocab_list = TextFeaturizer(args["vocab_file"]).vocab_list
+    model.stage_init(sess, [record_file], batch_size)
+    with PosteriorCacheWriter(cache_path, vocabulary=vocab_list) as writer:
+        for _ in tqdm(range(int(math.ceil(len(eval_data) / batch_size))), desc="Caching posteriors"):
+            try:
+                probs, labels = model.predict_posteriors(sess)
+            except tf.errors.OutOfRangeError:
+                break
+            for p, label in zip(probs, labels):
+                writer.append(p, "".join([vocab_list[i] for i in label]))
+    sess.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--param_file", type=str, help="The config file of the trained model, see `main.py`.")
+    parser.add_argument("--cache_path", type=str, help="The path prefix of the posterior cache. Reused if exists.")
+    parser.add_argument("--batch_size", type=int, default=16, help="The batch size to run the acoustic model.")
+    parser.add_argument("--lang_model_path", type=str, help="Filepath of the language model.")
+    parser.add_argument("--alpha_from", type=float, default=1.0, help="Where alpha starts tuning from.")
+    parser.add_argument("--alpha_to", type=float, default=3.2, help="Where alpha ends tuning with.")
+    parser.add_argument("--num_alphas", type=int, default=45, help="Number of alpha candidates.")
+    parser.add_argument("--beta_from", type=float, default=0.1, help="Where beta starts tuning from.")
+    parser.add_argument("--beta_to", type=float, default=0.45, help="Where beta ends tuning with.")
+    parser.add_argument("--num_betas", type=int, default=8, help="Number of beta candidates.")
+    parser.add_argument("--beam_size", type=int, default=500, help="Beam search width.")
+    parser.add_argument("--cutoff_prob", type=float, default=1.0, help="Cutoff probability for pruning.")
+    parser.add_argument("--cutoff_top_n", type=int, default=40, help="Cutoff number for pruning.")
+    parser.add_argument("--blank_skip_threshold", type=float, default=None, help="Blank probability to skip frames.")
+    parser.add_argument("--num_proc", type=int, default=8, help="Number of parallel decoding processes.")
+    parser.add_argument("--output_path", type=str, help="Filepath to write the results of grid points (.csv)")
+
+    args = parser.parse_args()
+    if not PosteriorCache.exists(args.cache_path):
+        cache_posteriors(args.param_file, args.cache_path, args.batch_size)
+
+    points = []
+    for point in grid_search(
+            cache_path=args.cache_path, model_path=args.lang_model_path,
+            alphas=np.linspace(args.alpha_from, args.alpha_to, args.num_alphas),
+            betas=np.linspace(args.beta_from, args.beta_to, args.num_betas),
+            beam_size=args.beam_size, num_processes=args.num_proc, cutoff_prob=args.cutoff_prob,
+            cutoff_top_n=args.cutoff_top_n, blank_skip_threshold=args.blank_skip_threshold,
+            start_method="spawn"):
+        print("alpha: {:.3f}, beta: {:.3f}, cer: {:.4f}, wer: {:.4f}".format(*point))
+        points.append(point)
+
+    best = min(points, key=lambda x: x.cer)
+    print("Best grid point: alpha {:.3f}, beta {:.3f}, cer {:.4f}, wer {:.4f}".format(*best))
+    if args.output_path:
+        np.savetxt(args.output_path, np.array(points), fmt="%.6f", delimiter=",",
+                   header=",".join(best._fields), comments="")
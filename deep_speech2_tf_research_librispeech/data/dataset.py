@@ -7,6 +7,7 @@ import pandas as pd
 import soundfile as sf
 import tensorflow as tf
 import deep_speech2_tf_research_librispeech.data.featurizer as featurizer
+from typing import Optional
 
 
 class AudioConfig(object):
@@ -30,7 +31,8 @@ class AudioConfig(object):
 class DatasetConfig(object):
     """Config class for generating the DeepSpeechDataset."""
 
-    def __init__(self, audio_config: AudioConfig, data_path: str, vocab_file_path: str, sortagrad: bool):
+    def __init__(self, audio_config: AudioConfig, data_path: str, vocab_file_path: str, sortagrad: bool,
+                 feature_store_path: Optional[str] = None):
         """Initialize the configs for deep speech dataset.
 
         :param audio_config: AudioConfig object specifying the audio-related configs.
@@ -39,6 +41,7 @@ class DatasetConfig(object):
         :param sortagrad: a boolean, if set to true, audio sequences will be fed by increasing length
                           in the first training epoch, which will
                     expedite network convergence.
+        :param feature_store_path: the directory of a `FeatureStore` keeping the features across epochs and runs.
 
         Raises:
           RuntimeError: file path not exist.
@@ -52,6 +55,7 @@ class DatasetConfig(object):
         self.data_path = data_path
         self.vocab_file_path = vocab_file_path
         self.sortagrad = sortagrad
+        self.feature_store_path = feature_store_path
 
 
 class DeepSpeechDataset(object):
@@ -66,6 +70,10 @@ class DeepSpeechDataset(object):
             stride_ms=self.config.audio_config.stride_ms,
             normalize=self.config.audio_config.normalize)
         self.text_featurizer = featurizer.TextFeaturizer(vocab_file=self.config.vocab_file_path)
+        self.feature_store = None
+        if self.config.feature_store_path:
+            from utils.feature_store import FeatureStore
+            self.feature_store = FeatureStore(self.config.feature_store_path, self.audio_featurizer.config)
 
         self.speech_labels = self.text_featurizer.speech_labels
         self.entries = self._preprocess_data(self.config.data_path, partition, sortagrad=self.config.sortagrad)
@@ -74,8 +82,8 @@ class DeepSpeechDataset(object):
 
     def _gen_data(self):
         for audio_file, transcript in self.entries:
-            samples, _ = sf.read(audio_file)
-            features = self.audio_featurizer.transform(samples)
+            features = self.feature_store.get_or_compute(audio_file, self._featurize_file) if self.feature_store\
+                else self._featurize_file(audio_file)
             labels = self.text_featurizer.transform(transcript)
             input_length = [len(features)]
             label_length = [len(labels)]
@@ -87,6 +95,10 @@ class DeepSpeechDataset(object):
                 "labels": labels
             }
 
+    def _featurize_file(self, audio_file: str) -> np.ndarray:
+        samples, _ = sf.read(audio_file)
+        return self.audio_featurizer.transform(samples)
+
     @staticmethod
     def _preprocess_data(file_path: str, partition: str, sortagrad: bool) -> np.ndarray:
         """
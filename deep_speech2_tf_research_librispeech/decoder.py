@@ -4,7 +4,8 @@
 import itertools
 import Levenshtein
 import numpy as np
-from typing import Iterable
+from utils.ctc import ctc_greedy_decode_batch, ids_to_text
+from typing import Iterable, List, Optional, Union
 
 
 class DeepSpeechDecoder(object):
@@ -50,3 +51,8 @@ class DeepSpeechDecoder(object):
         # Index to char
         merge = [self.vocab[k] for k, _ in itertools.groupby(best) if k != self.blank_index]
         return "".join(merge)
+
+    def decode_batch(self, logits: Union[np.ndarray, List[np.ndarray]], lengths: Optional[np.ndarray] = None) -> List[str]:
+        """Greedy decode a padded batch [batch, time, classes] or a list of [time, classes] in one pass."""
+        decoded, decoded_lengths = ctc_greedy_decode_batch(logits, lengths=lengths, blank_index=self.blank_index)
+        return ids_to_text(decoded, decoded_lengths, self.vocab)
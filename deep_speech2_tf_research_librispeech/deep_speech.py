@@ -64,8 +64,8 @@ def evaluate_model(estimator: es.Estimator, speech_labels: List[str], entries, i
 
     total_wer, total_cer = 0., 0.
     greedy_decoder = decoder.DeepSpeechDecoder(speech_labels, blank_index=28)
-    for prob, target in zip(probs, targets):
-        decode = greedy_decoder.decode(prob)
+    decodes = greedy_decoder.decode_batch(probs)
+    for decode, target in zip(decodes, targets):
         total_cer += greedy_decoder.cer(decode, target)
         total_wer += greedy_decoder.wer(decode, target)
 
@@ -134,7 +134,8 @@ def generate_dataset(data_dir: str, partition: str) -> dataset.DeepSpeechDataset
     audio_conf = dataset.AudioConfig(
         sample_rate=FLAGS.sample_rate, window_ms=FLAGS.window_ms, stride_ms=FLAGS.stride_ms, normalize=True)
     data_conf = dataset.DatasetConfig(
-        audio_config=audio_conf, data_path=data_dir, vocab_file_path=FLAGS.vocab_file, sortagrad=FLAGS.sortagrad)
+        audio_config=audio_conf, data_path=data_dir, vocab_file_path=FLAGS.vocab_file, sortagrad=FLAGS.sortagrad,
+        feature_store_path=FLAGS.feature_store_path)
 
     speech_dataset = dataset.DeepSpeechDataset(dataset_config=data_conf, partition=partition, seed=FLAGS.seed)
     return speech_dataset
@@ -216,6 +217,7 @@ if __name__ == "__main__":
     parser.add_argument("--data_dir", type=str, help="The path where labeled data placed.")
     parser.add_argument("--model_dir", type=str, help="The path where model saved.")
     parser.add_argument("--sortagrad", type=bool, default=True, help="Whether to sort input audio by length.")
+    parser.add_argument("--feature_store_path", type=str, default=None, help="The directory of the feature store.")
     parser.add_argument("--sample_rate", type=int, default=16000, help="The sample rate for audio.")
     parser.add_argument("--window_ms", type=int, default=20, help="The frame length for spectrogram.")
     parser.add_argument("--stride_ms", type=int, default=10, help="The frame step for spectrogram.")
@@ -1,7 +1,8 @@
 """Featurize data."""
 
 import numpy as np
-from typing import Optional
+from utils import stft
+from typing import Any, Dict, Optional
 
 
 def compute_spectrogram_feature(samples: np.ndarray, sample_rate: int, stride_ms: int = 10, window_ms: int = 20,
@@ -21,41 +22,11 @@ def compute_spectrogram_feature(samples: np.ndarray, sample_rate: int, stride_ms
     stride_size = int(0.001 * sample_rate * stride_ms)
     window_size = int(0.001 * sample_rate * window_ms)
 
-    # Extracted strided windows
-    truncate_size = (len(samples) - window_size) % stride_size
-    samples = samples[: (len(samples) - truncate_size)]
-
-    nshape = (window_size, (len(samples) - window_size) // stride_size + 1)  # (window_size, step_num)
-    nbytes = samples.strides[0]  # bytes between each and next by each axis.
-    nstrides = (1 * nbytes, stride_size * nbytes)  # Row by 1 element, col by `stride_size` element
-    windows = np.lib.stride_tricks.as_strided(samples, shape=nshape, strides=nstrides)
-
-    # check the 2nd stride step
-    assert np.all(np.equal(windows[:, 1], samples[stride_size: (stride_size + window_size)]))
-
-    # Window weighting, squared Fast Fourier Transform (fft), scaling
-    weighting = np.hanning(window_size)[:, None]
-    fft = np.fft.rfft(windows * weighting, axis=0)
-    fft = np.absolute(fft)
-    fft = fft ** 2
-    scale = np.sum(weighting ** 2) * sample_rate
-    fft[1:-1, :] *= (2.0 / scale)
-    fft[(0, -1), :] /= scale
-    # Prepare fft frequency list
-    freqs = float(sample_rate) / window_size * np.arange(fft.shape[0])
-
-    if max_freq is not None:
-        ind = np.where(freqs <= max_freq)[0][-1] + 1
-        specgram = np.log(fft[: ind, :] + eps)
-    else:
-        # default `max_freq = sample_rate / 2`
-        # which is the max of freqs, the ind is precisely the length of fft(spectrum)
-        # in original scripts, due to the floating-error,
-        # the ind could be smaller than the length of fft, often `length - 1`
-        # for which the features should be padded to same in the batch generator.
-        # The method here solves the problem to free from padding.
-        specgram = np.log(fft + eps)
-    return np.transpose(specgram, (1, 0))
+    # log power spectral density of the hanning windowed frames, the bins of freqs in [0, max_freq],
+    # all of them by default `max_freq = sample_rate / 2`, so the features need no padding in the batch generator.
+    return stft.spectrogram(samples, window_size, stride_size, window_name="hanning", scaling="density",
+                            sample_rate=sample_rate, n_bins=stft.num_bins(window_size, sample_rate, max_freq),
+                            log_offset=eps)
 
 
 def _normalize_audio_feature(audio_feature: np.ndarray):
@@ -97,6 +68,12 @@ class AudioFeaturizer(object):
         feature = np.expand_dims(feature, axis=2)
         return feature
 
+    @property
+    def config(self) -> Dict[str, Any]:
+        """The params the features depend on, e.g. to key them in a `FeatureStore`."""
+        return {"featurizer": "%s.%s" % (type(self).__module__, type(self).__name__), "sample_rate": self.sample_rate,
+                "window_ms": self.window_ms, "stride_ms": self.stride_ms, "normalize": self.normalize}
+
 
 class TextFeaturizer(object):
     """Extract text feature based on char-level granularity.
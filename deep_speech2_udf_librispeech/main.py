@@ -67,7 +67,8 @@ def get_data_params(args: Dict[str, Any]) -> Dict[str, Any]:
         stride_ms=args["stride_ms"], normalize=args["is_normalize"])
     dataset_config = dataset.DatasetConfig(
         audio_config=audio_config, data_path=args["data_file"],
-        vocab_file_path=args["vocab_file"], sortagrad=args["sortagrad"])
+        vocab_file_path=args["vocab_file"], sortagrad=args["sortagrad"],
+        feature_store_path=args.get("feature_store_path"))
     return dict(dataset_config=dataset_config, batch_size=args["batch_size"], seed=args["random_seed"])
 
 
@@ -97,6 +98,7 @@ if __name__ == '__main__':
     parser.add_argument("--window_ms", type=int, default=20, help="The frame length for spectrogram.")
     parser.add_argument("--stride_ms", type=int, default=10, help="The frame step for spectrogram.")
     parser.add_argument("--is_normalize", type=bool, default=True, help="whether normalize the audio feature.")
+    parser.add_argument("--feature_store_path", type=str, default=None, help="The directory of the feature store.")
     parser.add_argument("--rnn_hidden_size", type=int, default=800, help="The hidden size of RNNs.")
     parser.add_argument("--rnn_hidden_layers", type=int, default=5, help="The num of layers of RNNs.")
     parser.add_argument("--fc_use_bias", type=bool, default=True, help="Whether use bias at the last fc layer.")
@@ -1,12 +1,12 @@
 
 import numpy as np
 import pandas as pd
-from scipy.fftpack import fft
 # from librosa.feature import mfcc
 from scipy.io import wavfile
 from python_speech_features import mfcc
+from utils import stft
 from tensorflow.python.keras.utils import Sequence
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Any
 
 
 # mfcc 特征
@@ -18,33 +18,34 @@ def compute_mfcc(file, n_features: int = 26):
 
 # 时频图
 def compute_fbank(file, time_window: int = 400, time_step: int = 10):
-    w = np.hamming(time_window)
     fs, wav_arr = wavfile.read(file)
-    #    range0_end = int(len(wav_arr) / fs * 1000) // time_step + 1 # 计算循环终止的位置，也就是最终生成的窗数
-    data_input = []
-    i = 0
-    while True:
-        p_start = int(i * fs * time_step / 1000)
-        p_end = p_start + time_window
-        if p_end > len(wav_arr) - 1:
-            break
-        data_line = wav_arr[p_start: p_end]
-        data_line = data_line * w  # 加窗
-        data_line = np.abs(fft(data_line))
-        data_input.append(data_line[:int(time_window / 2)])  # 设置为400除以2的值（即200）是取一半数据，因为是对称的
-        i += 1
-    return np.log(np.vstack(data_input) + 1)
+    # 帧起点为 int(i * fs * time_step / 1000)，帧需在最后一个采样点之前结束；加汉明窗，取幅度谱的前一半（对称）
+    return stft.spectrogram(wav_arr[:-1], time_window, fs * time_step / 1000, window_name="hamming",
+                            scaling="magnitude", n_bins=time_window // 2, log_offset=1.)
+
+
+def compute_feature(file, feature_type: str, n_features: int):
+    """The `fbank` or `mfcc` feature of the audio file, as the speech model is fed."""
+    return compute_fbank(file, time_window=n_features * 2, time_step=10) if feature_type == "fbank"\
+        else compute_mfcc(file, n_features=n_features)
+
+
+def feature_config(feature_type: str, n_features: int) -> Dict[str, Any]:
+    """The params the feature depends on, to key it in a `FeatureStore`."""
+    return {"featurizer": "%s.compute_%s" % (__name__, feature_type), "n_features": n_features}
 
 
 class DataGenerator(Sequence):
     def __init__(self, data_source: str, pinyin_sep: str, data_type: str, batch_size: int, feature_type: str, n_features: int,
                  feed_model: str, model_type: str, shuffle: bool=False, data_length: Optional[int]=None,
-                 am_vocab: Optional[Dict[str, int]]=None, lm_vocab: Optional[Dict[str, int]]=None):
+                 am_vocab: Optional[Dict[str, int]]=None, lm_vocab: Optional[Dict[str, int]]=None,
+                 feature_store_path: Optional[str]=None):
         """
         :param data_source: 结构化标注数据源位置
         :param data_type: 指明取哪部分，[train, test, dev]
         :param shuffle: 是否shuffle
         :param data_length: 限制读入的数据条数
+        :param feature_store_path: 特征缓存 `FeatureStore` 的目录，各 epoch 复用特征
         """
         self._data = pd.read_csv(
             data_source, sep="\t", encoding="utf-8", header=None, engine="python",
@@ -66,6 +67,10 @@ class DataGenerator(Sequence):
         self.am_vocab: Dict[str, int] = am_vocab if am_vocab else self._make_am_vocab(self._data["pinyin"], sep=pinyin_sep)
         self.lm_vocab: Dict[str, int] = lm_vocab if lm_vocab else self._make_lm_vocab(self._data["content"])
         self.pinyin_sep = pinyin_sep
+        self.feature_store = None
+        if feature_store_path:
+            from utils.feature_store import FeatureStore
+            self.feature_store = FeatureStore(feature_store_path, feature_config(feature_type, n_features))
 
     def __len__(self):
         return len(self.data) // self.batch_size
@@ -107,8 +112,8 @@ class DataGenerator(Sequence):
         """ 生成训练数据 """
         wav_data_list, label_data_list = [], []
         for src, pnys in batch_data:
-            features = compute_fbank(src, time_window=self.n_features * 2, time_step=10)\
-                if self.feature_type == "fbank" else compute_mfcc(src, n_features=self.n_features)
+            features = self.feature_store.get_or_compute(src, self._compute_feature) if self.feature_store\
+                else self._compute_feature(src)
             pad_num = (len(features) // 8 + 1) * 8 - len(features)
             features = np.pad(features, ((0, pad_num), (0, 0)), mode="constant", constant_values=0.)
 
@@ -123,6 +128,9 @@ class DataGenerator(Sequence):
         pad_label_data, label_length = self._label_padding(label_data_list)
         return pad_wav_data, pad_label_data, input_length, label_length
 
+    def _compute_feature(self, src: str) -> np.ndarray:
+        return compute_feature(src, self.feature_type, self.n_features)
+
     @staticmethod
     def _make_am_vocab(pny_data_list, sep=" ") -> Dict[str, int]:
         all_pny = sorted(list(set(sep.join(pny_data_list).split(sep))))
@@ -1,19 +1,24 @@
 
 import numpy as np
 import tensorflow as tf
-from typing import Dict
+from utils.ctc import ctc_greedy_decode_batch
+from typing import Dict, List, Optional
 
 
 def decode_ctc(num_result: np.ndarray, id2word: Dict[int, str]):
-    result = num_result[:, :, :]
-    in_len = [result.shape[1]]
-    r, _ = tf.keras.backend.ctc_decode(result, input_length=in_len, greedy=True, beam_width=10, top_paths=1)
-    r1 = tf.keras.backend.get_value(r[0])
-    encoded = r1[0]
+    r1, lengths = ctc_greedy_decode_batch(num_result, blank_index=-1)  # the last class is blank as keras
+    encoded = r1[0][:lengths[0]]
     text = [id2word[x] for x in encoded]
     return r1, text
 
 
+def decode_ctc_batch(num_result: np.ndarray, id2word: Dict[int, str],
+                     input_length: Optional[np.ndarray] = None) -> List[List[str]]:
+    """Greedy decode the padded outputs [batch, time, classes] of a whole batch, the last class is blank."""
+    r, lengths = ctc_greedy_decode_batch(num_result, lengths=input_length, blank_index=-1)
+    return [[id2word[x] for x in encoded[:length]] for encoded, length in zip(r.tolist(), lengths)]
+
+
 def get_session(graph=None):
     config = tf.ConfigProto()
     config.gpu_options.per_process_gpu_memory_fraction = 0.9  # 程序最多只能占用指定gpu90%的显存
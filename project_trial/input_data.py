@@ -2,7 +2,7 @@
 import numpy as np
 from project_trial.constant import LABEL_MAP, MAX_TIME
 from project_trial.preprocessing.data_generator import SPLITTER
-from librosa.feature import mfcc
+from deep_speech2.data_utils.featurizer.mfcc import mfcc_librosa
 from scipy.io import wavfile
 from typing import List
 
@@ -28,7 +28,7 @@ def _get_audio_feature(audio_file: str) -> np.ndarray:
     if len(samples) < MAX_TIME * sample_rate:  # padding
         samples = np.pad(samples, [(0, MAX_TIME * sample_rate - len(samples))], mode="constant", constant_values=0.0)
 
-    feature = mfcc(y=samples.astype(np.float32), sr=sample_rate, n_mfcc=N_FEATURES)  # [n_mfcc, time]
+    feature = mfcc_librosa(samples.astype(np.float32), sample_rate, n_mfcc=N_FEATURES)  # [n_mfcc, time]
     feature = (feature - np.mean(feature)) / np.std(feature)  # normalize
     return feature
 
@@ -0,0 +1,173 @@
+"""
+Micro benchmark of the spectrogram features on the `stft` kernel against the former implementations of the pipelines.
+
+The former implementations are kept here as they were, each is timed against its pipeline on the kernel over
+reproducible synthetic utterances of several durations, and the max difference of their features is reported.
+
+    python -m utils.benchmark_stft --durations 1 5 15 --output_path stft.json
+"""
+
+import json
+import time
+import argparse
+import functools
+import numpy as np
+from scipy import fft as sp_fft
+from scipy.fftpack import fft
+from utils import stft
+from deep_speech2.data_utils.featurizer.audio_featurizer import AudioFeaturizer as DeepSpeech2Featurizer
+from deep_speech2_udf_librispeech.data.featurizer import compute_spectrogram_feature as udf_spectrogram
+from deep_speech2_tf_research_librispeech.data.featurizer import compute_spectrogram_feature as tf_spectrogram
+from asrt_keras.data.featurizer import AudioFeaturizer as AsrtFeaturizer
+from typing import Any, Callable, Dict, List, Tuple
+
+
+@functools.lru_cache(maxsize=16)
+def _legacy_hanning(window_size: int, dtype: str) -> Tuple[np.ndarray, float]:
+    weighting = np.hanning(window_size).astype(dtype)
+    weighting.flags.writeable = False
+    return weighting, np.sum(weighting ** 2)
+
+
+def legacy_deep_speech2(samples: np.ndarray, sample_rate: int, stride_ms: float=10., window_ms: float=20.,
+                        eps: float=1e-14) -> np.ndarray:
+    """The former `AudioFeaturizer._compute_linear_specgram` of deep_speech2, with `max_freq = sample_rate / 2`."""
+    stride_size = int(0.001 * stride_ms * sample_rate)
+    window_size = int(0.001 * window_ms * sample_rate)
+    truncate_size = (len(samples) - window_size) % stride_size
+    samples = samples[: (len(samples) - truncate_size)]
+    nbytes = samples.strides[0]
+    nshape = (window_size, (len(samples) - window_size) // stride_size + 1)
+    nstrides = (nbytes, stride_size * nbytes)
+    windows = np.lib.stride_tricks.as_strided(samples, shape=nshape, strides=nstrides)
+    assert nshape[1] < 2 or np.all(np.equal(windows[:, 1], samples[stride_size: (stride_size + window_size)]))
+    weighting, sum_of_squares = _legacy_hanning(window_size, samples.dtype.name)
+    spectrum = np.abs(sp_fft.rfft(windows * weighting[:, np.newaxis], axis=0)) ** 2
+    scale = sum_of_squares * sample_rate
+    spectrum[1: -1, :] /= (scale / 2.)
+    spectrum[(0, -1), :] /= scale
+    return np.transpose(np.log(spectrum + eps), (1, 0))
+
+
+def legacy_librispeech(samples: np.ndarray, sample_rate: int, stride_ms: int=10, window_ms: int=20,
+                       eps: float=1e-14) -> np.ndarray:
+    """The former `compute_spectrogram_feature` of udf and tf_research, with `max_freq = None`."""
+    stride_size = int(0.001 * sample_rate * stride_ms)
+    window_size = int(0.001 * sample_rate * window_ms)
+    truncate_size = (len(samples) - window_size) % stride_size
+    samples = samples[: (len(samples) - truncate_size)]
+    nshape = (window_size, (len(samples) - window_size) // stride_size + 1)
+    nbytes = samples.strides[0]
+    nstrides = (1 * nbytes, stride_size * nbytes)
+    windows = np.lib.stride_tricks.as_strided(samples, shape=nshape, strides=nstrides)
+    assert np.all(np.equal(windows[:, 1], samples[stride_size: (stride_size + window_size)]))
+    weighting = np.hanning(window_size)[:, None]
+    spectrum = np.fft.rfft(windows * weighting, axis=0)
+    spectrum = np.absolute(spectrum)
+    spectrum = spectrum ** 2
+    scale = np.sum(weighting ** 2) * sample_rate
+    spectrum[1:-1, :] *= (2.0 / scale)
+    spectrum[(0, -1), :] /= scale
+    return np.transpose(np.log(spectrum + eps), (1, 0))
+
+
+def legacy_asrt(samples: np.ndarray, fs: int, time_window_ms: int=25, time_stride_ms: int=10) -> np.ndarray:
+    """The former `AudioFeaturizer.compute_fbank` of asrt_keras."""
+    window_size = int(fs * time_window_ms / 1000)
+    stride_size = int(fs * time_stride_ms / 1000)
+    w = np.hamming(window_size)
+    truncate_size = (len(samples) - window_size) % stride_size
+    samples = samples[: (len(samples) - truncate_size)]
+    n_windows = (len(samples) - window_size) // stride_size + 1
+    nbytes = samples.strides[0]
+    data = np.lib.stride_tricks.as_strided(samples, shape=(n_windows, window_size),
+                                           strides=(stride_size * nbytes, nbytes))
+    data_input = np.abs(np.fft.fft(data * w, axis=1))
+    data_input = data_input[:, :window_size // 2]
+    return np.log(data_input + 1)
+
+
+def legacy_audier(wav_arr: np.ndarray, fs: int, time_window: int=400, time_step: int=10) -> np.ndarray:
+    """The former `compute_fbank` of deep_speech_by_audier, on the samples read from the wav file."""
+    w = np.hamming(time_window)
+    data_input = []
+    i = 0
+    while True:
+        p_start = int(i * fs * time_step / 1000)
+        p_end = p_start + time_window
+        if p_end > len(wav_arr) - 1:
+            break
+        data_line = wav_arr[p_start: p_end]
+        data_line = data_line * w
+        data_line = np.abs(fft(data_line))
+        data_input.append(data_line[:int(time_window / 2)])
+        i += 1
+    return np.log(np.vstack(data_input) + 1)
+
+
+def audier(wav_arr: np.ndarray, fs: int, time_window: int=400, time_step: int=10) -> np.ndarray:
+    """`compute_fbank` of deep_speech_by_audier after the file is read, the module needs tensorflow to import."""
+    return stft.spectrogram(wav_arr[:-1], time_window, fs * time_step / 1000, window_name="hamming",
+                            scaling="magnitude", n_bins=time_window // 2, log_offset=1.)
+
+
+def make_samples(duration: float, sample_rate: int=16000, seed: int=0) -> np.ndarray:
+    """A noisy chirp of `duration` seconds, float64 in [-1, 1]."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    return 0.3 * np.sin(2 * np.pi * (200 + 300 * t) * t) + 0.01 * rng.standard_normal(len(t))
+
+
+def make_cases(samples: np.ndarray, sample_rate: int) -> Dict[str, Tuple[Callable, Callable]]:
+    """The pipelines by name, each one the former and the current featurizing of the samples."""
+    samples32 = samples.astype(np.float32)
+    int16 = (samples * 32767).astype(np.int16)
+    featurizer = DeepSpeech2Featurizer()
+    return {
+        "deep_speech2": (lambda: legacy_deep_speech2(samples32, sample_rate),
+                         lambda: featurizer._compute_linear_specgram(samples32, sample_rate)),
+        "udf": (lambda: legacy_librispeech(samples, sample_rate), lambda: udf_spectrogram(samples, sample_rate)),
+        "tf_research": (lambda: legacy_librispeech(samples, sample_rate), lambda: tf_spectrogram(samples, sample_rate)),
+        "asrt_keras": (lambda: legacy_asrt(int16, sample_rate), lambda: AsrtFeaturizer.compute_fbank(int16, sample_rate)),
+        "audier": (lambda: legacy_audier(int16, sample_rate), lambda: audier(int16, sample_rate)),
+    }
+
+
+def _best_time(func: Callable, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        tic = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+
+def run_benchmark(durations: List[float], sample_rate: int=16000, repeats: int=5) -> List[Dict[str, Any]]:
+    """Time the former and the current featurizing of each pipeline per utterance of each duration."""
+    results = []
+    for duration in durations:
+        for pipeline, (legacy, current) in make_cases(make_samples(duration, sample_rate), sample_rate).items():
+            expected, features = legacy(), current()
+            result = {"pipeline": pipeline, "duration": duration,
+                      "legacy_seconds": _best_time(legacy, repeats), "seconds": _best_time(current, repeats),
+                      "max_abs_diff": float(np.max(np.abs(features - expected))) if features.shape == expected.shape
+                      else None}
+            result["speedup"] = result["legacy_seconds"] / result["seconds"]
+            results.append(result)
+            print("pipeline: {pipeline}, duration: {duration}s, {legacy_seconds:.5f}s -> {seconds:.5f}s, "
+                  "speedup x{speedup:.2f}, max abs diff: {max_abs_diff}".format(**result))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--durations", type=float, nargs="+", default=[1., 5., 15.], help="Utterance durations (s).")
+    parser.add_argument("--sample_rate", type=int, default=16000, help="The sample rate of the utterances.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs of each featurizing, the best is kept.")
+    parser.add_argument("--output_path", type=str, default=None, help="Filepath to write the results (.json)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.durations, sample_rate=args.sample_rate, repeats=args.repeats)
+    if args.output_path:
+        with open(args.output_path, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,60 @@
+"""Vectorized CTC greedy decoding over padded batches"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple, Union
+
+
+def ctc_greedy_decode_batch(probs: Union[np.ndarray, List[np.ndarray]], lengths: Optional[np.ndarray] = None,
+                            blank_index: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    CTC greedy (best path) decoding of a whole batch at once.
+    The argmax path is collapsed by repeats and stripped of blanks with masks over the batch, no per-utterance loop.
+
+    :param probs: Probabilities or logits, a padded array of shape [B, T, V] or a list of [T_i, V] arrays.
+    :param lengths: The valid number of frames of each utterance, shape [B]. Default all the frames.
+    :param blank_index: The index of blank, negative values count from the end, default the last class.
+    :return: A tuple 1) the decoded token ids, shape [B, max_decoded_len], padded with -1;
+                     2) the decoded length of each utterance, shape [B].
+    """
+    if isinstance(probs, (list, tuple)):
+        # argmax of the valid frames before padding, only the int paths are padded
+        if lengths is not None:
+            lengths = np.asarray(lengths).reshape(-1)
+            probs = [p[:length] for p, length in zip(probs, lengths)]
+        paths = [np.argmax(p, axis=-1) for p in probs]
+        n_classes = np.shape(probs[0])[-1] if len(probs) else 0
+        lengths = np.array([len(p) for p in paths], dtype=np.int64)
+        best = np.full((len(paths), max(lengths, default=0)), -1, dtype=np.int64)
+        for i, path in enumerate(paths):
+            best[i, :len(path)] = path
+    else:
+        probs = np.asarray(probs)
+        if probs.ndim != 3:
+            raise ValueError("probs should be in shape [batch, time, classes], got %s" % (probs.shape, ))
+        n_classes = probs.shape[-1]
+        best = np.argmax(probs, axis=-1)
+        lengths = np.full(len(best), best.shape[1]) if lengths is None else np.asarray(lengths).reshape(-1)
+    if blank_index < 0:
+        blank_index += n_classes
+
+    keep = (np.arange(best.shape[1])[None, :] < lengths[:, None]) & (best != blank_index)
+    keep[:, 1:] &= best[:, 1:] != best[:, :-1]  # merge repeated, a blank in between keeps both
+    decoded_lengths = keep.sum(axis=1)
+    decoded = np.full((len(best), decoded_lengths.max(initial=0)), -1, dtype=np.int64)
+    rows, _ = np.nonzero(keep)
+    decoded[rows, (np.cumsum(keep, axis=1) - 1)[keep]] = best[keep]
+    return decoded, decoded_lengths
+
+
+def ids_to_text(decoded: np.ndarray, decoded_lengths: np.ndarray,
+                vocabulary: Union[List[str], Dict[int, str]], sep: str = "") -> List[str]:
+    """
+    Convert the decoded token ids of a batch into strings.
+
+    :param decoded: The decoded token ids, shape [B, max_decoded_len].
+    :param decoded_lengths: The decoded length of each utterance, shape [B].
+    :param vocabulary: Vocabulary list or dict from id to token.
+    :param sep: The separator between tokens, e.g. "-" for pinyin.
+    :return: List of decoded strings.
+    """
+    return [sep.join([vocabulary[i] for i in ids[:length]]) for ids, length in zip(decoded.tolist(), decoded_lengths)]
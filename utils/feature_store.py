@@ -0,0 +1,266 @@
+"""Content addressed on-disk store of the audio features, shared by the training pipelines."""
+
+import os
+import json
+import hashlib
+import platform
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_WINDOWS = platform.system().lower() == "windows"
+if _WINDOWS:
+    import msvcrt
+else:
+    import fcntl
+
+# the offsets of the features in the shards are aligned to this many bytes
+_ALIGNMENT = 64
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """The hash of a featurizer config, the features of different configs never share a key."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def file_hash(file: str, block_size: int=1 << 20) -> str:
+    """The hash of the content of a file."""
+    sha1 = hashlib.sha1()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class FeatureStore(object):
+    """
+    Store of the features of audio files, so each utterance is featurized once across epochs, runs and processes.
+
+    A feature is keyed by the identity of its audio file, the absolute path, size and mtime, or the content hash if
+    `hash_content`, and by the hash of the featurizer `config`, so a changed file or config is a miss.
+    The features are appended to the current shard file in `path` and their location to the index file. Shards are
+    never modified, a lookup maps the shard and returns a read-only view into it without copying.
+    Once the shards exceed `max_bytes`, the oldest ones are evicted with their index entries, the current is kept.
+    The writes of the processes sharing a store are serialized by a file lock, and each process reads the entries
+    written by the others when it misses a key.
+
+    :param path: The directory of the store, created if not exists.
+    :param config: The featurizer config, json serializable, e.g. `AudioFeaturizer.config`.
+    :param max_bytes: The bound of the size of the shards in bytes, None for no bound.
+    :param shard_bytes: The size in bytes from which a shard is full and the next one is started.
+    :param hash_content: Whether the audio files are identified by the hash of their content, which survives a copy
+                         or touch of the files, instead of their path, size and mtime.
+    """
+    def __init__(self, path: str, config: Dict[str, Any], max_bytes: Optional[int]=None,
+                 shard_bytes: int=256 << 20, hash_content: bool=False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.config = config
+        self.max_bytes = max_bytes
+        self.shard_bytes = shard_bytes
+        self.hash_content = hash_content
+        self._config_hash = config_hash(config)
+        self._index_file = os.path.join(path, "index.jsonl")
+        self._lock_file = os.path.join(path, "store.lock")
+        self._reset()
+
+    def _reset(self) -> None:
+        # key -> (shard, offset, dtype, shape), read from the index file up to `_index_pos`
+        self._entries: Dict[str, Tuple[int, int, str, Tuple[int, ...]]] = {}
+        self._index_pos = 0
+        self._index_inode = None
+        self._maps: Dict[int, np.memmap] = {}
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+    def __getstate__(self):
+        # the maps and entries are rebuilt by each process, e.g. the data loader workers
+        state = self.__dict__.copy()
+        for name in ["_entries", "_index_pos", "_index_inode", "_maps", "_file_hashes"]:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def __len__(self):
+        self._refresh()
+        return len(self._entries)
+
+    def __contains__(self, audio_file: str) -> bool:
+        return self.get(audio_file) is not None
+
+    def key(self, audio_file: str) -> str:
+        """The key of the features of the audio file with the config of the store."""
+        stat = os.stat(audio_file)
+        path = os.path.abspath(audio_file)
+        if self.hash_content:
+            file_id = (path, stat.st_size, stat.st_mtime_ns)
+            if file_id not in self._file_hashes:
+                self._file_hashes[file_id] = file_hash(audio_file)
+            identity = self._file_hashes[file_id]
+        else:
+            identity = "%s:%d:%d" % (path, stat.st_size, stat.st_mtime_ns)
+        return hashlib.sha1(("%s|%s" % (identity, self._config_hash)).encode("utf-8")).hexdigest()
+
+    def get(self, audio_file: str) -> Optional[np.ndarray]:
+        """Return the stored features of the audio file, a read-only view into the shard, or None if missed."""
+        key = self.key(audio_file)
+        if key not in self._entries:
+            self._refresh()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        features = self._view(*entry)
+        if features is None:  # evicted by another process
+            self._refresh()
+        return features
+
+    def put(self, audio_file: str, features: np.ndarray) -> np.ndarray:
+        """
+        Store the features of the audio file, kept if already stored by another process.
+
+        :return: The stored features, a read-only view into the shard.
+        """
+        features = np.ascontiguousarray(features)
+        key = self.key(audio_file)
+        with self._locked():
+            self._refresh()
+            if key not in self._entries:
+                shard, offset = self._append(features.tobytes())
+                entry = [key, shard, offset, features.dtype.str, list(features.shape)]
+                with open(self._index_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+                self._refresh()
+                if self.max_bytes is not None:
+                    self._evict(self.max_bytes)
+        return self.get(audio_file)
+
+    def get_or_compute(self, audio_file: str, featurize_func: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Return the stored features of the audio file, featurized by `featurize_func(audio_file)` if missed."""
+        features = self.get(audio_file)
+        if features is None:
+            features = self.put(audio_file, featurize_func(audio_file))
+        return features
+
+    def evict(self, max_bytes: int) -> None:
+        """Evict the oldest shards until the size of the shards is at most `max_bytes`, the current is kept."""
+        with self._locked():
+            self._evict(max_bytes)
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the shards in bytes."""
+        return sum(os.path.getsize(self._shard_file(shard)) for shard in self._shards())
+
+    def _locked(self):
+        return _FileLock(self._lock_file)
+
+    def _shard_file(self, shard: int) -> str:
+        return os.path.join(self.path, "shard-%06d.bin" % shard)
+
+    def _shards(self) -> List[int]:
+        return sorted(int(name[6:-4]) for name in os.listdir(self.path)
+                      if name.startswith("shard-") and name.endswith(".bin"))
+
+    def _append(self, data: bytes) -> Tuple[int, int]:
+        """Append the data to the current shard, or to a new one if full, return the shard and the offset."""
+        shards = self._shards()
+        shard = shards[-1] if shards else 0
+        size = os.path.getsize(self._shard_file(shard)) if shards else 0
+        if size and size + len(data) > self.shard_bytes:
+            shard, size = shard + 1, 0
+        offset = -(-size // _ALIGNMENT) * _ALIGNMENT
+        with open(self._shard_file(shard), "ab") as f:
+            f.write(b"\0" * (offset - size) + data)
+        return shard, offset
+
+    def _evict(self, max_bytes: int) -> None:
+        shards = self._shards()
+        sizes = [os.path.getsize(self._shard_file(shard)) for shard in shards]
+        evicted = set()
+        while len(shards) > 1 and sum(sizes) > max_bytes:
+            evicted.add(shards.pop(0))
+            sizes.pop(0)
+        if not evicted:
+            return
+        # the index is rewritten without the evicted entries and replaced, the readers notice the new inode
+        self._refresh()
+        tmp_file = self._index_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for key, (shard, offset, dtype, shape) in self._entries.items():
+                if shard not in evicted:
+                    f.write(json.dumps([key, shard, offset, dtype, list(shape)]) + "\n")
+        os.replace(tmp_file, self._index_file)
+        for shard in evicted:
+            os.remove(self._shard_file(shard))
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Read the index entries written since the last refresh, all of them if the index was replaced."""
+        try:
+            stat = os.stat(self._index_file)
+        except FileNotFoundError:
+            if self._index_inode is not None:
+                self._reset()
+            return
+        if stat.st_ino != self._index_inode or stat.st_size < self._index_pos:
+            self._entries, self._maps = {}, {}
+            self._index_pos, self._index_inode = 0, stat.st_ino
+        if stat.st_size == self._index_pos:
+            return
+        with open(self._index_file, "rb") as f:
+            f.seek(self._index_pos)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]  # a line being appended is read by the next refresh
+        for line in complete.decode("utf-8").splitlines():
+            key, shard, offset, dtype, shape = json.loads(line)
+            self._entries[key] = (shard, offset, dtype, tuple(shape))
+        self._index_pos += len(complete)
+
+    def _view(self, shard: int, offset: int, dtype: str, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        dtype = np.dtype(dtype)
+        end = offset + dtype.itemsize * int(np.prod(shape))
+        if end == offset:
+            return np.zeros(shape, dtype=dtype)
+        mapped = self._maps.get(shard)
+        if mapped is None or len(mapped) < end:
+            # the current shard grows, it is mapped again once the mapping falls short
+            try:
+                mapped = np.memmap(self._shard_file(shard), dtype=np.uint8, mode="r")
+            except (FileNotFoundError, ValueError):
+                self._maps.pop(shard, None)
+                return None
+            self._maps[shard] = mapped
+        return mapped[offset: end].view(dtype).reshape(shape)
+
+
+class _FileLock(object):
+    """
+    Exclusive lock of a file across processes, as a context manager.
+    By `flock` on POSIX, and on Windows by `msvcrt.locking` of the first byte of the file.
+    """
+    def __init__(self, file: str):
+        self._file = file
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self._file, "a")
+        if _WINDOWS:
+            self._f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 attempts a second apart, the lock is waited for
+                    continue
+        else:
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if _WINDOWS:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
@@ -0,0 +1,127 @@
+"""
+Prewarm the feature store of a training pipeline for the audio files of a manifest, in parallel.
+The featurizer params must be those of the training, the features are keyed by them.
+
+    python -m utils.prewarm_feature_store --pipeline asrt_keras --manifest train.tsv --store_path features/
+"""
+
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from utils.feature_store import FeatureStore
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PIPELINES = ["deep_speech2", "udf", "tf_research", "asrt_keras", "audier"]
+
+
+def build_featurizer(pipeline: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], Callable[[str], np.ndarray]]:
+    """
+    Build the featurizer of the pipeline as its training does, the pipeline packages are only imported here.
+
+    :return: The featurizer config keying the store, and the function featurizing an audio file.
+    """
+    if pipeline == "deep_speech2":
+        from deep_speech2.data_utils.featurizer.audio_featurizer import AudioFeaturizer
+        from deep_speech2.data_utils.segments import AudioSegment
+        featurizer = AudioFeaturizer(
+            specgram_type=params["specgram_type"], stride_ms=params["stride_ms"], window_ms=params["window_ms"],
+            max_freq=params["max_freq"], target_sample_rate=params["sample_rate"],
+            use_dB_normalization=params["use_dB_normalization"],
+            dtype="float64" if params["dtype"] == "float64" else "float32")  # as `DataGenerator` builds it
+        return featurizer.config, lambda file: featurizer.featurize(AudioSegment.from_file(file))
+    if pipeline in ("udf", "tf_research", "asrt_keras"):
+        if pipeline == "udf":
+            from deep_speech2_udf_librispeech.data.featurizer import AudioFeaturizer
+        elif pipeline == "tf_research":
+            from deep_speech2_tf_research_librispeech.data.featurizer import AudioFeaturizer
+        else:
+            from asrt_keras.data.featurizer import AudioFeaturizer
+        featurizer = AudioFeaturizer(sample_rate=params["sample_rate"], window_ms=params["window_ms"],
+                                     stride_ms=params["stride_ms"], normalize=params["is_normalize"])
+        if pipeline == "asrt_keras":
+            from utils.audio import read_audio
+            return featurizer.config, lambda file: featurizer.transform(read_audio(file)[1])
+        import soundfile as sf
+        return featurizer.config, lambda file: featurizer.transform(sf.read(file)[0])
+    if pipeline == "audier":
+        from deep_speech_by_audier.input_data import compute_feature, feature_config
+        return feature_config(params["feature_type"], params["n_features"]),\
+            lambda file: compute_feature(file, params["feature_type"], params["n_features"])
+    raise ValueError("Unknown pipeline %s, possible choices are %s" % (pipeline, PIPELINES))
+
+
+def read_sources(pipeline: str, manifest: str) -> List[str]:
+    """The audio files of the manifest, in the format the pipeline reads."""
+    if pipeline == "deep_speech2":
+        from deep_speech2.data_utils.utility import read_data
+        return read_data(manifest, data_tag="labeled_data")["src"].tolist()
+    if pipeline == "audier":
+        return pd.read_csv(manifest, sep="\t", encoding="utf-8", header=None, engine="python")[0].tolist()
+    return pd.read_csv(manifest, sep="\t")["src"].tolist()
+
+
+# the featurizer and the store of each worker
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(pipeline: str, params: Dict[str, Any], store_path: str, max_bytes: Optional[int]):
+    config, featurize_func = build_featurizer(pipeline, params)
+    _worker_state["store"] = FeatureStore(store_path, config, max_bytes=max_bytes)
+    _worker_state["featurize_func"] = featurize_func
+
+
+def _prewarm_task(audio_file: str) -> bool:
+    """Featurize the audio file if missed, return whether it was stored already."""
+    store: FeatureStore = _worker_state["store"]
+    if store.get(audio_file) is not None:
+        return True
+    store.put(audio_file, _worker_state["featurize_func"](audio_file))
+    return False
+
+
+def prewarm(pipeline: str, params: Dict[str, Any], manifest: str, store_path: str, max_bytes: Optional[int]=None,
+            num_processes: int=4, chunksize: int=16) -> Tuple[int, int]:
+    """
+    Store the features of the audio files of the manifest not stored yet, by parallel workers.
+
+    :return: The numbers of the audio files stored already, and newly stored.
+    """
+    sources = list(dict.fromkeys(read_sources(pipeline, manifest)))
+    hits = 0
+    with multiprocessing.Pool(num_processes, initializer=_init_worker,
+                              initargs=(pipeline, params, store_path, max_bytes)) as pool:
+        for hit in tqdm(pool.imap_unordered(_prewarm_task, sources, chunksize=chunksize), total=len(sources),
+                        desc="Prewarming features"):
+            hits += hit
+    return hits, len(sources) - hits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", type=str, choices=PIPELINES, help="The training pipeline to featurize for.")
+    parser.add_argument("--manifest", type=str, help="The labeled data file of the pipeline.")
+    parser.add_argument("--store_path", type=str, help="The directory of the feature store.")
+    parser.add_argument("--max_gb", type=float, default=None, help="The size bound of the feature store in GB.")
+    parser.add_argument("--num_proc", type=int, default=4, help="Number of parallel featurizing processes.")
+    parser.add_argument("--sample_rate", type=int, default=16000, help="The sample rate for audio.")
+    parser.add_argument("--window_ms", type=int, default=20, help="The frame length for spectrogram.")
+    parser.add_argument("--stride_ms", type=int, default=10, help="The frame step for spectrogram.")
+    parser.add_argument("--is_normalize", type=bool, default=True, help="whether normalize the audio feature.")
+    parser.add_argument("--specgram_type", type=str, default="linear", choices=["linear", "mfcc"],
+                        help="The feature type of deep_speech2.")
+    parser.add_argument("--max_freq", type=float, default=None, help="The max freq of the deep_speech2 features.")
+    parser.add_argument("--use_dB_normalization", type=bool, default=True,
+                        help="Whether deep_speech2 normalizes the audio to -20 dB before extracting the features.")
+    parser.add_argument("--dtype", type=str, default="float32", choices=["float16", "float32", "float64"],
+                        help="The dtype of the deep_speech2 features.")
+    parser.add_argument("--feature_type", type=str, default="fbank", choices=["fbank", "mfcc"],
+                        help="The feature type of audier.")
+    parser.add_argument("--n_features", type=int, default=200, help="The number of features of audier.")
+    args = parser.parse_args()
+
+    hits, misses = prewarm(
+        args.pipeline, vars(args), args.manifest, args.store_path,
+        max_bytes=None if args.max_gb is None else int(args.max_gb * (1 << 30)), num_processes=args.num_proc)
+    print("%d audio files featurized, %d stored already." % (misses, hits))
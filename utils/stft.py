@@ -0,0 +1,120 @@
+"""
+The short-time Fourier transform kernel of the spectrogram features, shared by the featurizers of the pipelines.
+
+The pipelines differ in their window, the scaling of the spectrum and the log offset, these are params here.
+The windows and the scales are computed once per config and cached read-only, the frames are a strided view of
+the samples, and the spectra of all the frames are computed by one multithreaded real FFT.
+"""
+
+import functools
+import numpy as np
+from scipy import fft as sp_fft
+from typing import Optional, Union
+
+WINDOWS = {"hanning": np.hanning, "hamming": np.hamming}
+# density: the power spectral density, |X|^2 / (sum(w^2) * sample_rate), doubled but at the bins 0 and N // 2
+# magnitude: |X|
+SCALINGS = ["density", "magnitude"]
+
+
+def _compute_dtype(dtype: np.dtype) -> np.dtype:
+    """The float32 samples are transformed in float32, any others in float64."""
+    return np.dtype(np.float32) if dtype == np.float32 else np.dtype(np.float64)
+
+
+@functools.lru_cache(maxsize=32)
+def window(name: str, size: int, dtype: str="float64") -> np.ndarray:
+    """The weighting of the window `name` of `size` samples, computed once per name, size and dtype."""
+    if name not in WINDOWS:
+        raise ValueError("Unknown window %s, possible choices are %s" % (name, list(WINDOWS)))
+    weighting = WINDOWS[name](size).astype(dtype)
+    weighting.flags.writeable = False
+    return weighting
+
+
+@functools.lru_cache(maxsize=32)
+def density_scale(name: str, size: int, sample_rate: int, n_bins: int, dtype: str="float64") -> np.ndarray:
+    """The factors of the `density` scaling of the first `n_bins` bins of the one-sided spectrum, [n_bins]."""
+    weighting = window(name, size, dtype)
+    scale = np.sum(weighting ** 2) * sample_rate
+    factors = np.full(n_bins, 2. / scale, dtype=dtype)
+    factors[0] = 1. / scale
+    if size // 2 < n_bins:
+        factors[size // 2] = 1. / scale
+    factors.flags.writeable = False
+    return factors
+
+
+def num_bins(window_size: int, sample_rate: int, max_freq: Optional[float]=None) -> int:
+    """The number of the bins of the one-sided spectrum with frequencies in [0, max_freq], all if None."""
+    if max_freq is None:
+        return window_size // 2 + 1
+    freqs = float(sample_rate) / window_size * np.arange(window_size // 2 + 1)
+    return int(np.where(freqs <= max_freq)[0][-1] + 1)
+
+
+def frame(samples: np.ndarray, window_size: int, stride_size: Union[int, float]) -> np.ndarray:
+    """
+    The windows of the samples as rows, [n_frames, window_size], the samples after the last window are truncated.
+    The frame i starts at `int(i * stride_size)`, the frames are a read-only strided view if `stride_size` is integral,
+    else gathered.
+    """
+    if len(samples) < window_size:
+        return np.zeros((0, window_size), dtype=samples.dtype)
+    if float(stride_size).is_integer():
+        stride_size = int(stride_size)
+        n_frames = (len(samples) - window_size) // stride_size + 1
+        nbytes = samples.strides[0]
+        return np.lib.stride_tricks.as_strided(samples, shape=(n_frames, window_size),
+                                               strides=(stride_size * nbytes, nbytes), writeable=False)
+    n_frames = int(np.ceil((len(samples) - window_size + 1) / stride_size))
+    starts = (np.arange(n_frames) * stride_size).astype(np.int64)
+    return samples[starts[:, np.newaxis] + np.arange(window_size)]
+
+
+def spectrum(frames: np.ndarray, window_name: str="hanning", scaling: str="density", sample_rate: Optional[int]=None,
+             n_bins: Optional[int]=None, onesided: bool=True, log_offset: Optional[float]=None,
+             workers: int=-1) -> np.ndarray:
+    """
+    The spectra of the frames as rows, in float32 for float32 frames, else float64.
+
+    :param frames: The windows of samples as rows, [n_frames, window_size].
+    :param window_name: The window weighting the frames, one of `WINDOWS`.
+    :param scaling: The scaling of the spectra, one of `SCALINGS`.
+    :param sample_rate: The sample rate of the frames, required by the `density` scaling.
+    :param n_bins: Number of the first bins kept, all those of the transform if None.
+    :param onesided: Whether the spectra are transformed by the real FFT, else by the full complex FFT, whose
+                     first half is the same.
+    :param log_offset: If given, the log of the scaled spectra plus it is returned.
+    :param workers: Number of the threads of the FFT, -1 for all the cpus.
+    :return: The spectra, [n_frames, n_bins].
+    """
+    if scaling not in SCALINGS:
+        raise ValueError("Unknown scaling %s, possible choices are %s" % (scaling, SCALINGS))
+    window_size = frames.shape[1]
+    dtype = _compute_dtype(frames.dtype)
+    weighted = frames * window(window_name, window_size, dtype.name)
+    if onesided:
+        transformed = sp_fft.rfft(weighted, axis=1, workers=workers)
+    else:
+        transformed = sp_fft.fft(weighted, axis=1, workers=workers)
+    if n_bins is not None:
+        transformed = transformed[:, :n_bins]
+
+    if scaling == "density":
+        if sample_rate is None:
+            raise ValueError("The density scaling requires the sample rate.")
+        spectra = np.square(transformed.real)
+        spectra += np.square(transformed.imag)
+        spectra *= density_scale(window_name, window_size, sample_rate, spectra.shape[1], dtype.name)
+    else:
+        spectra = np.abs(transformed)
+    if log_offset is not None:
+        spectra += log_offset
+        np.log(spectra, out=spectra)
+    return spectra
+
+
+def spectrogram(samples: np.ndarray, window_size: int, stride_size: Union[int, float], **kwargs) -> np.ndarray:
+    """The spectra of the frames of the samples, [n_frames, n_bins], see `frame` and `spectrum` for the params."""
+    return spectrum(frame(samples, window_size, stride_size), **kwargs)